@@ -0,0 +1,371 @@
+"""Benchmarks locais do videodl (sem rede externa).
+
+    python benchmarks/run.py                       # todos, resultado em JSON no stdout
+    python benchmarks/run.py -o atual.json --compare base.json
+    python benchmarks/run.py --only download_hls list_formats --repeat 5
+
+Cada cenário roda --repeat vezes contra o BenchServer (benchmarks/server.py) e
+reporta mediana/mín/máx. O JSON traz a configuração e o ambiente, então dois
+arquivos gerados com os mesmos parâmetros são comparáveis (--compare imprime a
+razão atual/base de cada métrica no stderr).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from server import BenchServer  # noqa: E402
+
+from videodl.cache import InfoCache  # noqa: E402
+from videodl.downloader import VideoDownloader  # noqa: E402
+from videodl.ffmpeg import ffmpeg_path, probe_ffmpeg  # noqa: E402
+from videodl.metrics import cpu_times, cpu_usage  # noqa: E402
+from videodl.postprocess import PostProcessPipeline  # noqa: E402
+from videodl.progress import ProgressBus  # noqa: E402
+from videodl.sessions import SessionPool  # noqa: E402
+
+SCENARIOS: Dict[str, Callable[['Bench'], Dict[str, Any]]] = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {'median': statistics.median(samples), 'min': min(samples), 'max': max(samples),
+            'runs': len(samples)}
+
+
+class Bench:
+    """Contexto compartilhado pelos cenários: servidor, repetições e um
+    diretório de saída novo por execução."""
+
+    def __init__(self, server: BenchServer, repeat: int):
+        self.server = server
+        self.repeat = repeat
+
+    def timed(self, func: Callable[[str], Any]) -> List[float]:
+        samples = []
+        for _ in range(self.repeat):
+            out = tempfile.mkdtemp(prefix='videodl-bench-out-')
+            try:
+                started = time.perf_counter()
+                func(out)
+                samples.append(time.perf_counter() - started)
+            finally:
+                shutil.rmtree(out, ignore_errors=True)
+        return samples
+
+    def throughput(self, func: Callable[[str], Any], nbytes: int) -> Dict[str, Any]:
+        samples = self.timed(func)
+        result = {'seconds': summarize(samples), 'bytes': nbytes}
+        result['mib_per_s'] = nbytes / statistics.median(samples) / (1 << 20)
+        return result
+
+
+def _download(url: str, out: str, format_id: Optional[str], **kwargs):
+    VideoDownloader().download(
+        url, out, format_id, False, ensure_audio=False, **kwargs)
+
+
+# ---------------- Cenários -----------------
+@scenario
+def list_formats(bench: Bench) -> Dict[str, Any]:
+    """Latência de list_formats: extração fria e com o InfoCache aquecido."""
+    result = {}
+    for name, url in (('progressive', bench.server.progressive_url(0)),
+                      ('hls', bench.server.hls_url)):
+        cold, warm = [], []
+        for _ in range(bench.repeat):
+            downloader = VideoDownloader(info_cache=InfoCache())
+            started = time.perf_counter()
+            formats = downloader.list_formats(url)
+            cold.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            downloader.list_formats(url)
+            warm.append(time.perf_counter() - started)
+        result[name] = {'cold': summarize(cold), 'warm': summarize(warm), 'formats': len(formats)}
+    return result
+
+
+@scenario
+def download_progressive(bench: Bench) -> Dict[str, Any]:
+    """download() de um arquivo progressivo com 1 e 4 conexões."""
+    url = bench.server.progressive_url(0)
+    return {f'connections_{n}': bench.throughput(
+        lambda out, n=n: _download(url, out, 'mp4', connections=n), bench.server.file_size)
+        for n in (1, 4)}
+
+
+@scenario
+def download_hls(bench: Bench) -> Dict[str, Any]:
+    """download() de um HLS VOD com fragmentos sequenciais e em paralelo."""
+    url = bench.server.hls_url
+    return {f'fragment_workers_{n}': bench.throughput(
+        lambda out, n=n: _download(url, out, None, fragment_workers=n), bench.server.hls_size)
+        for n in (1, 4)}
+
+
+@scenario
+def download_playlist(bench: Bench) -> Dict[str, Any]:
+    """Playlist (feed do extrator genérico) sequencial e com itens em paralelo."""
+    url = bench.server.playlist_url
+    total = bench.server.file_size * bench.server.files
+    return {f'playlist_workers_{n}': bench.throughput(
+        lambda out, n=n: _download(url, out, 'mp4', playlist_mode=True, playlist_workers=n),
+        total) for n in (1, bench.server.files)}
+
+
+@scenario
+def session_pool(bench: Bench) -> Dict[str, Any]:
+    """Lote de jobs em sequência (um arquivo cada) com um YoutubeDL novo por
+    job e com o SessionPool (conexões e extratores reaproveitados)."""
+    urls = [bench.server.progressive_url(i) for i in range(bench.server.files)]
+    result: Dict[str, Any] = {}
+    for name in ('new', 'pooled'):
+        def _run(out, pooled=(name == 'pooled')):
+            pool = SessionPool() if pooled else None
+            downloader = VideoDownloader(sessions=pool)
+            for url in urls:
+                downloader.download(url, out, 'mp4', False, ensure_audio=False)
+            if pool is not None:
+                pool.close()
+        result[name] = summarize(bench.timed(_run))
+    result['jobs'] = len(urls)
+    result['speedup'] = result['new']['median'] / result['pooled']['median']
+    return result
+
+
+@scenario
+def progress_overhead(bench: Bench) -> Dict[str, Any]:
+    """Custo do callback de progresso: download sem callback x publicando no
+    ProgressBus, e o custo isolado de ProgressBus.publish."""
+    url = bench.server.progressive_url(0)
+    calls: List[float] = []
+    bus = ProgressBus()
+
+    def _cb(d):
+        started = time.perf_counter()
+        bus.publish('bench', d)
+        calls.append(time.perf_counter() - started)
+
+    without = bench.timed(lambda out: _download(url, out, 'mp4'))
+    with_cb = bench.timed(lambda out: _download(url, out, 'mp4', progress_cb=_cb))
+
+    sample = {'status': 'downloading', 'filename': 'x.mp4', 'downloaded_bytes': 1,
+              'total_bytes': 1 << 30, 'speed': 1e6, 'eta': 10}
+    n = 20000
+    started = time.perf_counter()
+    for i in range(n):
+        sample['downloaded_bytes'] = i
+        bus.publish('micro', sample)
+    publish_us = (time.perf_counter() - started) / n * 1e6
+
+    return {
+        'without_callback': summarize(without),
+        'with_callback': summarize(with_cb),
+        'callbacks_per_download': len(calls) / bench.repeat,
+        'callback_us': summarize([c * 1e6 for c in calls]) if calls else None,
+        'publish_us': publish_us,
+    }
+
+
+@scenario
+def postprocess(bench: Bench) -> Dict[str, Any]:
+    """Playlist só de áudio (faixas AAC) com a conversão em linha e no
+    pipeline de processos: extração MP3 com ffmpeg (pp_workers_N) e cópia da
+    trilha sem recodificar (copy_pp_workers_N, audio_format='best'), com o
+    CPU gasto (processo, ffmpeg e workers do pipeline)."""
+    if not bench.server.audio_files:
+        return {'skipped': 'ffmpeg ausente'}
+    url = bench.server.audio_playlist_url
+    result = {}
+    for audio_format, prefix in (('mp3', ''), ('best', 'copy_')):
+        for workers in (0, os.cpu_count() or 1):
+            pipeline = PostProcessPipeline(workers) if workers else None
+            cpu: List[float] = []
+
+            def _run(out):
+                before = cpu_times()
+                pp_before = pipeline.cpu_seconds if pipeline is not None else 0.0
+                VideoDownloader(pipeline=pipeline).download(
+                    url, out, None, True, playlist_mode=True, audio_format=audio_format)
+                pp_cpu = pipeline.cpu_seconds - pp_before if pipeline is not None else 0.0
+                cpu.append(cpu_usage(before)['total'] + pp_cpu)
+            try:
+                seconds = summarize(bench.timed(_run))
+                result[f'{prefix}pp_workers_{workers}'] = {'seconds': seconds,
+                                                           'cpu_seconds': summarize(cpu)}
+            finally:
+                if pipeline is not None:
+                    pipeline.shutdown()
+    return result
+
+
+# tempo máximo de import de videodl.cli num processo novo (yt_dlp fica para o primeiro uso)
+STARTUP_BUDGET = 0.25
+
+_CHILD_TIMER = """
+import sys, time
+started = time.perf_counter()
+{code}
+print(time.perf_counter() - started)
+"""
+
+
+def _child_seconds(code: str) -> float:
+    """Tempo de code medido dentro de um interpretador novo (sem módulos em cache)."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')])))
+    out = subprocess.run([sys.executable, '-c', _CHILD_TIMER.format(code=code)], env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+@scenario
+def startup(bench: Bench) -> Dict[str, Any]:
+    """Custo de inicialização em processos novos: import dos módulos de
+    entrada (CLI, serviço, GUI sem abrir janela), o import do yt_dlp adiado
+    para o primeiro uso e a sondagem do ffmpeg (fria e em cache)."""
+    modules = {'cli': 'import videodl.cli', 'service': 'import videodl.service'}
+    try:
+        import tkinter  # noqa: F401
+        modules['gui'] = 'import videodl.main'
+    except ImportError:
+        pass
+    modules['ytdlp'] = 'from videodl.ydl import ytdlp; ytdlp()'
+    result: Dict[str, Any] = {name: summarize([_child_seconds(code) for _ in range(bench.repeat)])
+                              for name, code in modules.items()}
+    result['ffmpeg_probe'] = {
+        'cold': summarize([_child_seconds('from videodl.ffmpeg import probe_ffmpeg; probe_ffmpeg()')
+                           for _ in range(bench.repeat)]),
+        'cached': summarize([_child_seconds(
+            'from videodl.ffmpeg import probe_ffmpeg; probe_ffmpeg()\n'
+            'started = time.perf_counter(); probe_ffmpeg()') for _ in range(bench.repeat)]),
+    }
+    result['budget'] = STARTUP_BUDGET
+    result['within_budget'] = result['cli']['median'] <= STARTUP_BUDGET
+    return result
+
+
+# ---------------- Execução -----------------
+def _make_audio(count: int, seconds: int) -> List[str]:
+    """Gera faixas AAC sintéticas com ffmpeg (vazio se ffmpeg não existir)."""
+    if ffmpeg_path() is None:
+        return []
+    folder = tempfile.mkdtemp(prefix='videodl-bench-audio-')
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f'track{i}.m4a')
+        subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi',
+                        '-i', f'sine=frequency={220 * (i + 1)}:duration={seconds}',
+                        '-c:a', 'aac', path], check=True)
+        paths.append(path)
+    return paths
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        from yt_dlp.version import __version__ as ytdlp_version  # type: ignore
+    except Exception:
+        ytdlp_version = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'yt_dlp': ytdlp_version, 'commit': commit,
+            'ffmpeg': probe_ffmpeg().version}
+
+
+def _flatten(data: Any, prefix: str = '') -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(_flatten(value, f'{prefix}.{key}' if prefix else key))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix] = data
+    return flat
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Linhas 'métrica: base -> atual (razão)' para métricas presentes nos dois."""
+    old = _flatten(baseline.get('results', {}))
+    new = _flatten(current.get('results', {}))
+    lines = []
+    for key in sorted(old.keys() & new.keys()):
+        if key.endswith(('.runs', '.bytes')) or not old[key]:
+            continue
+        lines.append(f'{key}: {old[key]:.4g} -> {new[key]:.4g} ({new[key] / old[key]:.2f}x)')
+    if current.get('config') != baseline.get('config'):
+        lines.insert(0, 'aviso: configuração diferente da base')
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks locais do videodl.')
+    parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), help='cenários a rodar')
+    parser.add_argument('--repeat', type=int, default=3, help='execuções por medida')
+    parser.add_argument('--file-size', type=int, default=8 << 20, help='bytes por progressivo')
+    parser.add_argument('--segments', type=int, default=40, help='segmentos do HLS')
+    parser.add_argument('--segment-size', type=int, default=100_000, help='bytes por segmento')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='atraso por pedido no servidor (s)')
+    parser.add_argument('--conn-rate', type=float, default=8 << 20,
+                        help='limite por conexão no servidor (bytes/s, 0 = livre)')
+    parser.add_argument('--audio-seconds', type=int, default=60,
+                        help='duração das faixas do cenário de pós-processamento')
+    parser.add_argument('-o', '--output', help='grava o JSON neste arquivo')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    args = parser.parse_args(argv)
+
+    names = args.only or list(SCENARIOS)
+    config = {'repeat': args.repeat, 'file_size': args.file_size, 'segments': args.segments,
+              'segment_size': args.segment_size, 'latency': args.latency,
+              'conn_rate': args.conn_rate or None, 'audio_seconds': args.audio_seconds}
+    audio = _make_audio(3, args.audio_seconds) if 'postprocess' in names else []
+    report: Dict[str, Any] = {'config': config, 'environment': _environment(),
+                              'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': {}}
+    try:
+        with BenchServer(file_size=args.file_size, segments=args.segments,
+                         segment_size=args.segment_size, latency=args.latency,
+                         conn_rate=args.conn_rate or None, audio_files=audio) as server:
+            bench = Bench(server, max(args.repeat, 1))
+            # aquecimento: imports e extratores do yt-dlp fora da primeira medida
+            with tempfile.TemporaryDirectory(prefix='videodl-bench-out-') as out:
+                _download(server.progressive_url(0), out, 'mp4')
+            for name in names:
+                print(f'[bench] {name}...', file=sys.stderr)
+                report['results'][name] = SCENARIOS[name](bench)
+    finally:
+        if audio:
+            shutil.rmtree(os.path.dirname(audio[0]), ignore_errors=True)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            for line in compare(report, json.load(f)):
+                print(line, file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
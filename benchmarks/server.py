@@ -0,0 +1,217 @@
+"""Servidor HTTP local com mídia sintética para os benchmarks.
+
+Serve, a partir de um diretório temporário:
+  /progressive/<nome>.mp4   arquivos progressivos (aceita Range)
+  /hls/index.m3u8           playlist HLS VOD com N segmentos .ts
+  /playlist.rss             "página" de playlist (feed RSS com os progressivos,
+                            resolvido pelo extrator genérico do yt-dlp)
+
+latency simula o tempo até o primeiro byte de cada pedido e conn_rate o limite
+de velocidade por conexão de um CDN (bytes/s), o que torna mensurável o ganho
+de conexões/fragmentos paralelos mesmo em localhost.
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+_TYPES = {'.mp4': 'video/mp4', '.ts': 'video/mp2t', '.m3u8': 'application/vnd.apple.mpegurl',
+          '.rss': 'application/rss+xml', '.m4a': 'audio/mp4', '.mp3': 'audio/mpeg'}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    root = ''
+    latency = 0.0
+    conn_rate: Optional[float] = None
+    chunk_size = 16 * 1024
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _serve(self, head: bool):
+        path = os.path.normpath(os.path.join(self.root, self.path.split('?')[0].lstrip('/')))
+        if not path.startswith(self.root) or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        m = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range') or '')
+        if m:
+            start = int(m.group(1))
+            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', _TYPES.get(os.path.splitext(path)[1],
+                                                    'application/octet-stream'))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if head:
+            return
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            started = time.monotonic()
+            sent = 0
+            while remaining > 0:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                remaining -= len(chunk)
+                sent += len(chunk)
+                if self.conn_rate:
+                    ahead = sent / self.conn_rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clientes fecham conexões keep-alive ou faixas canceladas: não é erro
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class BenchServer:
+    """Gera a mídia sintética e serve numa porta livre de 127.0.0.1.
+
+    Uso:
+        with BenchServer(file_size=4 << 20, latency=0.02) as srv:
+            srv.progressive_url(0), srv.hls_url, srv.playlist_url
+    """
+
+    def __init__(self, file_size: int = 4 << 20, files: int = 3, segments: int = 40,
+                 segment_size: int = 100_000, latency: float = 0.0,
+                 conn_rate: Optional[float] = None, audio_files: Optional[List[str]] = None):
+        self.file_size = file_size
+        self.files = files
+        self.segments = segments
+        self.segment_size = segment_size
+        self.latency = latency
+        self.conn_rate = conn_rate
+        # arquivos de áudio reais (gerados com ffmpeg) para o benchmark de
+        # pós-processamento; copiados para /audio/
+        self.audio_files = audio_files or []
+        self.root = ''
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    # ---------------- URLs -----------------
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self._httpd.server_address[1]}'
+
+    def progressive_url(self, index: int = 0) -> str:
+        return f'{self.base_url}/progressive/video{index}.mp4'
+
+    @property
+    def hls_url(self) -> str:
+        return f'{self.base_url}/hls/index.m3u8'
+
+    @property
+    def playlist_url(self) -> str:
+        return f'{self.base_url}/playlist.rss'
+
+    @property
+    def audio_playlist_url(self) -> str:
+        return f'{self.base_url}/audio.rss'
+
+    @property
+    def hls_size(self) -> int:
+        return self.segments * self.segment_size
+
+    # ---------------- Ciclo de vida -----------------
+    def start(self) -> 'BenchServer':
+        self.root = tempfile.mkdtemp(prefix='videodl-bench-srv-')
+        self._generate()
+        handler = type('BenchHandler', (_Handler,), {
+            'root': self.root, 'latency': self.latency, 'conn_rate': self.conn_rate})
+        self._httpd = _Server(('127.0.0.1', 0), handler)
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        # o feed referencia a porta, então é escrito depois do bind
+        self._write_feed('playlist.rss', 'progressive',
+                         [f'video{i}.mp4' for i in range(self.files)], 'video/mp4')
+        if self.audio_files:
+            self._write_feed('audio.rss', 'audio',
+                             [os.path.basename(p) for p in self.audio_files], 'audio/mp4')
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self.root:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self.root = ''
+
+    def __enter__(self) -> 'BenchServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------------- Conteúdo -----------------
+    def _generate(self):
+        progressive = os.path.join(self.root, 'progressive')
+        os.makedirs(progressive)
+        block = os.urandom(1 << 20)
+        for i in range(self.files):
+            with open(os.path.join(progressive, f'video{i}.mp4'), 'wb') as f:
+                remaining = self.file_size
+                while remaining > 0:
+                    f.write(block[:remaining])
+                    remaining -= len(block)
+        hls = os.path.join(self.root, 'hls')
+        os.makedirs(hls)
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:2',
+                 '#EXT-X-MEDIA-SEQUENCE:0']
+        for i in range(self.segments):
+            with open(os.path.join(hls, f'seg{i}.ts'), 'wb') as f:
+                f.write(bytes([0x47]) + os.urandom(self.segment_size - 1))
+            lines += ['#EXTINF:2.0,', f'seg{i}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        with open(os.path.join(hls, 'index.m3u8'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        if self.audio_files:
+            audio = os.path.join(self.root, 'audio')
+            os.makedirs(audio)
+            for path in self.audio_files:
+                shutil.copy(path, audio)
+
+    def _write_feed(self, name: str, folder: str, files: List[str], mime: str):
+        items = ''.join(
+            f'<item><title>item {i}</title><guid>{folder}-{i}</guid>'
+            f'<enclosure url="{self.base_url}/{folder}/{fname}" type="{mime}" length="0"/></item>'
+            for i, fname in enumerate(files))
+        with open(os.path.join(self.root, name), 'w') as f:
+            f.write('<?xml version="1.0"?><rss version="2.0"><channel>'
+                    f'<title>bench {folder}</title><link>{self.base_url}/</link>'
+                    f'<description>videodl benchmark</description>{items}</channel></rss>')
@@ -0,0 +1,170 @@
+import asyncio
+import collections
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Union
+
+from .downloader import DownloadCancelled, FormatInfo, VideoDownloader
+from .formats import FormatChoice, FormatProfile
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[Dict[str, Any]], Any]
+
+
+class AsyncVideoDownloader:
+    """Fachada asyncio sobre VideoDownloader.
+
+    O yt-dlp é bloqueante, então cada download em andamento ocupa uma thread
+    de um pool compartilhado; jobs esperando vaga (max_downloads) são só
+    tasks aguardando um semáforo, sem thread. Extrações (list_formats,
+    choose_format) têm threads extras no mesmo pool para não ficarem atrás
+    dos downloads.
+
+    Cancelar a task de download() cancela o download: o evento de
+    cancelamento do job é setado e a task termina com CancelledError quando a
+    thread do yt-dlp libera (no próximo bloco recebido).
+
+    Callbacks de progresso e os eventos de iter_progress() rodam no event
+    loop, nunca na thread do download.
+    """
+
+    def __init__(self, downloader: Optional[VideoDownloader] = None, max_downloads: int = 4,
+                 extraction_workers: int = 4):
+        if max_downloads < 1:
+            raise ValueError("max_downloads deve ser >= 1")
+        self.downloader = downloader or VideoDownloader()
+        self.max_downloads = max_downloads
+        self._executor = ThreadPoolExecutor(max_workers=max_downloads + max(extraction_workers, 1),
+                                            thread_name_prefix='videodl-aio')
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._closed = False
+
+    # ---------------- Ciclo de vida -----------------
+    async def aclose(self, cancel: bool = False):
+        """Encerra o pool; com cancel=True descarta o que ainda não começou.
+        Downloads em andamento devem ser cancelados pelas próprias tasks."""
+        self._closed = True
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True, cancel_futures=cancel))
+
+    async def __aenter__(self) -> 'AsyncVideoDownloader':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose(cancel=exc[0] is not None)
+
+    # ---------------- Extração -----------------
+    async def list_formats(self, url: str) -> List[FormatInfo]:
+        return await self._call(self.downloader.list_formats, url)
+
+    async def choose_format(self, url: str, profile: Union[str, FormatProfile, None] = None
+                            ) -> Optional[FormatChoice]:
+        return await self._call(self.downloader.choose_format, url, profile)
+
+    # ---------------- Download -----------------
+    async def download(self, url: str, output_dir: str, format_id: Optional[str] = None,
+                       only_audio: bool = False,
+                       progress_cb: Optional[ProgressCallback] = None, **options):
+        """Baixa url (mesmos parâmetros de VideoDownloader.download, exceto
+        cancel_event). progress_cb pode ser função ou corrotina e roda no loop."""
+        if self._closed:
+            raise RuntimeError("AsyncVideoDownloader encerrado")
+        if 'cancel_event' in options:
+            raise TypeError("cancele a task em vez de passar cancel_event")
+        loop = asyncio.get_running_loop()
+        cancel_event = threading.Event()
+        hook = self._thread_hook(loop, progress_cb) if progress_cb is not None else None
+        async with self._get_slots():
+            future = loop.run_in_executor(self._executor, functools.partial(
+                self.downloader.download, url, output_dir, format_id, only_audio,
+                progress_cb=hook, cancel_event=cancel_event, **options))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                cancel_event.set()
+                # a vaga só é liberada quando a thread do yt-dlp sair
+                await asyncio.wait([future])
+                if not future.cancelled() and future.exception() is not None \
+                        and not isinstance(future.exception(), DownloadCancelled):
+                    logger.debug("Download cancelado terminou com erro: %s", future.exception())
+                raise
+
+    async def iter_progress(self, url: str, output_dir: str, format_id: Optional[str] = None,
+                            only_audio: bool = False, max_buffer: int = 256,
+                            **options) -> AsyncIterator[Dict[str, Any]]:
+        """Executa o download e gera os dicts de progresso à medida que chegam.
+
+        Termina quando o download acaba (exceções do download são propagadas
+        no fim). Sair do loop antes, ou cancelar a task que itera, cancela o
+        download. Um consumidor lento não segura o download: com mais de
+        max_buffer eventos pendentes os 'downloading' intermediários do mesmo
+        arquivo são descartados (o último sempre chega).
+        """
+        pending: Deque[Dict[str, Any]] = collections.deque()
+        wakeup = asyncio.Event()
+
+        def _push(d: Dict[str, Any]):
+            if len(pending) >= max_buffer and pending and d.get('status') == 'downloading' \
+                    and pending[-1].get('status') == 'downloading' \
+                    and pending[-1].get('filename') == d.get('filename'):
+                pending[-1] = d
+            else:
+                pending.append(d)
+            wakeup.set()
+
+        task = asyncio.ensure_future(self.download(url, output_dir, format_id, only_audio,
+                                                   progress_cb=_push, **options))
+        task.add_done_callback(lambda _: wakeup.set())
+        try:
+            while True:
+                while pending:
+                    yield pending.popleft()
+                if task.done():
+                    break
+                wakeup.clear()
+                if not pending and not task.done():
+                    await wakeup.wait()
+            task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    # ---------------- Internos -----------------
+    def _get_slots(self) -> asyncio.Semaphore:
+        # criado no loop em uso (o construtor pode rodar fora de um loop)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_downloads)
+        return self._slots
+
+    async def _call(self, func, *args):
+        if self._closed:
+            raise RuntimeError("AsyncVideoDownloader encerrado")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    def _thread_hook(loop: asyncio.AbstractEventLoop, progress_cb: ProgressCallback):
+        """Hook chamado na thread do download que entrega uma cópia do dict
+        ao callback no event loop."""
+        def _deliver(d: Dict[str, Any]):
+            try:
+                result = progress_cb(d)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception:
+                logger.exception("Erro no callback de progresso")
+
+        def _hook(d: Dict[str, Any]):
+            # o yt-dlp reaproveita o dict; info_dict não é necessário no loop
+            event = {k: v for k, v in d.items() if k != 'info_dict'}
+            try:
+                loop.call_soon_threadsafe(_deliver, event)
+            except RuntimeError:
+                pass  # loop encerrado
+        return _hook
+
+
+__all__ = ["AsyncVideoDownloader"]
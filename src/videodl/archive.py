@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    extractor TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    filename TEXT,
+    size INTEGER,
+    checksum TEXT,
+    url TEXT,
+    downloaded_at REAL NOT NULL,
+    PRIMARY KEY (extractor, video_id)
+)
+"""
+
+
+@dataclass
+class ArchiveEntry:
+    extractor: str
+    video_id: str
+    filename: Optional[str]
+    size: Optional[int]
+    checksum: Optional[str]
+    url: Optional[str]
+    downloaded_at: float
+
+    @property
+    def archive_id(self) -> str:
+        return f"{self.extractor} {self.video_id}"
+
+
+def file_checksum(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return 'sha256:' + h.hexdigest()
+
+
+def _split_archive_id(archive_id: str):
+    extractor, _, video_id = archive_id.partition(' ')
+    return extractor.lower(), video_id
+
+
+class DownloadArchive:
+    """Índice persistente (SQLite) de mídias já baixadas.
+
+    Chave: extrator + id do vídeo (mesmo formato "extrator id" do
+    --download-archive do yt-dlp). A instância pode ser passada direto como
+    opção download_archive do YoutubeDL: o yt-dlp consulta `in` antes de extrair
+    cada item e chama add() ao terminar.
+
+    Seguro para vários workers (uma conexão por thread) e vários processos
+    (WAL + busy timeout).
+    """
+
+    def __init__(self, path: str, checksum: bool = True, timeout: float = 30.0):
+        self.path = path
+        self.checksum = checksum
+        self.timeout = timeout
+        self._local = threading.local()
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(_SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---------------- Interface compatível com yt-dlp -----------------
+    def __contains__(self, archive_id: Optional[str]) -> bool:
+        if not archive_id:
+            # yt-dlp pode consultar itens sem id resolvido
+            return False
+        return self.contains(*_split_archive_id(archive_id))
+
+    def add(self, archive_id: str):
+        """Registro mínimo (sem dados do arquivo); não sobrescreve um existente."""
+        extractor, video_id = _split_archive_id(archive_id)
+        conn = self._conn()
+        with conn:
+            conn.execute('INSERT OR IGNORE INTO downloads (extractor, video_id, downloaded_at) VALUES (?, ?, ?)',
+                         (extractor, video_id, time.time()))
+
+    def __len__(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM downloads').fetchone()[0]
+
+    def __bool__(self) -> bool:
+        # o yt-dlp testa `if not self.archive`; arquivo vazio continua ativo
+        return True
+
+    # ---------------- API -----------------
+    def contains(self, extractor: str, video_id: str) -> bool:
+        row = self._conn().execute('SELECT 1 FROM downloads WHERE extractor = ? AND video_id = ?',
+                                   (extractor.lower(), str(video_id))).fetchone()
+        return row is not None
+
+    def record(self, extractor: str, video_id: str, filename: Optional[str] = None,
+               url: Optional[str] = None):
+        """Registra (ou atualiza) um download com tamanho e checksum do arquivo."""
+        size = checksum = None
+        if filename and os.path.isfile(filename):
+            size = os.path.getsize(filename)
+            if self.checksum:
+                try:
+                    checksum = file_checksum(filename)
+                except OSError as e:
+                    logger.warning("Falha ao calcular checksum de %s: %s", filename, e)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT INTO downloads (extractor, video_id, filename, size, checksum, url, downloaded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(extractor, video_id) DO UPDATE SET filename = excluded.filename, '
+                'size = excluded.size, checksum = excluded.checksum, url = excluded.url, '
+                'downloaded_at = excluded.downloaded_at',
+                (extractor.lower(), str(video_id), filename, size, checksum, url, time.time()))
+
+    def get(self, extractor: str, video_id: str) -> Optional[ArchiveEntry]:
+        row = self._conn().execute(
+            'SELECT extractor, video_id, filename, size, checksum, url, downloaded_at '
+            'FROM downloads WHERE extractor = ? AND video_id = ?',
+            (extractor.lower(), str(video_id))).fetchone()
+        return ArchiveEntry(*row) if row else None
+
+    def entries(self, extractor: Optional[str] = None) -> List[ArchiveEntry]:
+        sql = 'SELECT extractor, video_id, filename, size, checksum, url, downloaded_at FROM downloads'
+        args: tuple = ()
+        if extractor:
+            sql += ' WHERE extractor = ?'
+            args = (extractor.lower(),)
+        return [ArchiveEntry(*row) for row in self._conn().execute(sql + ' ORDER BY downloaded_at', args)]
+
+    def remove(self, extractor: str, video_id: str) -> bool:
+        conn = self._conn()
+        with conn:
+            cur = conn.execute('DELETE FROM downloads WHERE extractor = ? AND video_id = ?',
+                               (extractor.lower(), str(video_id)))
+        return cur.rowcount > 0
+
+    def prune(self, missing_files: bool = True, older_than: Optional[float] = None) -> int:
+        """Remove entradas cujo arquivo não existe mais e/ou mais antigas que
+        older_than segundos. Retorna quantas foram removidas."""
+        doomed = []
+        now = time.time()
+        for entry in self.entries():
+            if older_than is not None and now - entry.downloaded_at > older_than:
+                doomed.append(entry)
+            elif missing_files and entry.filename and not os.path.exists(entry.filename):
+                doomed.append(entry)
+        conn = self._conn()
+        with conn:
+            conn.executemany('DELETE FROM downloads WHERE extractor = ? AND video_id = ?',
+                             [(e.extractor, e.video_id) for e in doomed])
+        return len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        count, total = self._conn().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM downloads').fetchone()
+        return {'entries': count, 'total_bytes': total}
+
+
+def archive_postprocessor(archive: DownloadArchive):
+    """PostProcessor do yt-dlp (etapa after_move) que registra o arquivo final
+    no arquivo com tamanho e checksum."""
+    from yt_dlp.postprocessor.common import PostProcessor  # type: ignore
+
+    class ArchiveRecorderPP(PostProcessor):
+        def run(self, info):
+            extractor = info.get('extractor_key') or info.get('ie_key')
+            video_id = info.get('id')
+            if extractor and video_id:
+                try:
+                    archive.record(extractor, video_id, info.get('filepath'),
+                                   url=info.get('webpage_url') or info.get('original_url'))
+                except sqlite3.Error as e:
+                    logger.warning("Falha ao registrar no arquivo: %s", e)
+            return [], info
+
+    return ArchiveRecorderPP()
+
+
+__all__ = ["DownloadArchive", "ArchiveEntry", "archive_postprocessor", "file_checksum"]
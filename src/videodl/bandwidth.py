@@ -0,0 +1,207 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Optional
+
+
+class TokenBucket:
+    """Balde de tokens (bytes). rate em bytes/s; None = sem limite.
+
+    reserve() aceita dívida: o chamador consome já e dorme o tempo retornado,
+    então blocos grandes (ex.: 1 MiB do yt-dlp) não travam num balde pequeno.
+    """
+
+    def __init__(self, rate: Optional[float], burst: float = 1.0):
+        self.burst = burst  # capacidade em segundos de taxa
+        self._rate = rate or None
+        self._tokens = self._capacity()
+        self._stamp = time.monotonic()
+
+    @property
+    def rate(self) -> Optional[float]:
+        return self._rate
+
+    def set_rate(self, rate: Optional[float], now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self._rate = rate or None
+        self._tokens = min(self._tokens, self._capacity())
+
+    def reserve(self, nbytes: int, now: Optional[float] = None) -> float:
+        """Consome nbytes e retorna quantos segundos esperar (0 = liberado)."""
+        if self._rate is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self._tokens -= nbytes
+        return self.debt(now)
+
+    def debt(self, now: Optional[float] = None) -> float:
+        """Segundos até a dívida atual ser paga (0 = liberado)."""
+        if self._rate is None:
+            return 0.0
+        self._refill(time.monotonic() if now is None else now)
+        return -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+    def _capacity(self) -> float:
+        return self._rate * self.burst if self._rate else 0.0
+
+    def _refill(self, now: float):
+        if self._rate is not None:
+            self._tokens = min(self._tokens + (now - self._stamp) * self._rate, self._capacity())
+        self._stamp = now
+
+
+@dataclass
+class _JobShare:
+    weight: float
+    limit: Optional[float]
+    bucket: TokenBucket
+    last_active: float = 0.0
+    consumed: int = 0
+    rate: Optional[float] = None  # taxa efetiva atual
+
+
+class BandwidthScheduler:
+    """Divide a banda entre downloads concorrentes.
+
+    global_limit (bytes/s, None/0 = sem limite) vale para a soma de todos os
+    jobs. Cada job registrado tem um peso e, opcionalmente, um limite
+    próprio; com limite global, a fatia do job é global * peso / soma dos
+    pesos dos jobs ativos (que consumiram nos últimos idle_after segundos),
+    então jobs parados não seguram banda. Limites e pesos podem ser
+    alterados a qualquer momento (GUI/API) e valem no próximo bloco.
+    """
+
+    def __init__(self, global_limit: Optional[float] = None, burst: float = 1.0,
+                 idle_after: float = 2.0, wait_slice: float = 0.2):
+        self.burst = burst
+        self.idle_after = idle_after
+        self.wait_slice = wait_slice
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_limit, burst)
+        self._jobs: Dict[Hashable, _JobShare] = {}
+
+    # ---------------- Configuração -----------------
+    @property
+    def global_limit(self) -> Optional[float]:
+        return self._global.rate
+
+    def set_global_limit(self, limit: Optional[float]):
+        with self._lock:
+            self._global.set_rate(limit)
+
+    def register(self, key: Hashable, weight: float = 1.0,
+                 limit: Optional[float] = None) -> 'JobThrottle':
+        with self._lock:
+            self._jobs[key] = _JobShare(weight=max(float(weight), 0.01), limit=limit or None,
+                                        bucket=TokenBucket(limit, self.burst))
+        return JobThrottle(self, key)
+
+    def unregister(self, key: Hashable):
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def update(self, key: Hashable, weight: Optional[float] = None,
+               limit: Optional[float] = None) -> bool:
+        """Altera peso e/ou limite de um job (limit=0 remove o limite).
+        Retorna False se o job não está registrado."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return False
+            if weight is not None:
+                job.weight = max(float(weight), 0.01)
+            if limit is not None:
+                job.limit = limit or None
+            return True
+
+    # ---------------- Consumo -----------------
+    def consume(self, key: Hashable, nbytes: int,
+                cancel_event: Optional[threading.Event] = None):
+        """Registra nbytes recebidos pelo job e bloqueia o tempo necessário
+        para respeitar os limites. Retorna cedo se cancel_event for setado."""
+        if nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            job = self._jobs.get(key)
+            self._global.reserve(nbytes, now)
+            if job is not None:
+                job.last_active = now
+                job.consumed += nbytes
+                job.bucket.set_rate(self._share(job, now), now)
+                job.rate = job.bucket.rate
+                job.bucket.reserve(nbytes, now)
+        while True:
+            # a espera é recalculada a cada fatia: mudanças de limite/peso ou
+            # o fim de outro job valem também para a dívida já reservada
+            with self._lock:
+                now = time.monotonic()
+                job = self._jobs.get(key)
+                remaining = self._global.debt(now)
+                if job is not None:
+                    job.bucket.set_rate(self._share(job, now), now)
+                    job.rate = job.bucket.rate
+                    remaining = max(remaining, job.bucket.debt(now))
+            if remaining <= 0:
+                return
+            if cancel_event is not None:
+                if cancel_event.wait(min(remaining, self.wait_slice)):
+                    return
+            else:
+                time.sleep(min(remaining, self.wait_slice))
+
+    def _share(self, job: _JobShare, now: float) -> Optional[float]:
+        share = None
+        if self._global.rate:
+            active = [j for j in self._jobs.values()
+                      if j is job or now - j.last_active <= self.idle_after]
+            share = self._global.rate * job.weight / sum(j.weight for j in active)
+        if job.limit:
+            share = min(share, job.limit) if share else job.limit
+        return share
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'global_limit': self._global.rate,
+                'jobs': {key: {'weight': j.weight, 'limit': j.limit, 'rate': j.rate,
+                               'consumed': j.consumed}
+                         for key, j in self._jobs.items()},
+            }
+
+
+@dataclass
+class JobThrottle:
+    """Controle de banda de um job: entregue ao download e chamado a cada
+    bloco recebido."""
+    scheduler: BandwidthScheduler
+    key: Hashable
+    _seen: Dict[str, int] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def consume(self, nbytes: int, cancel_event: Optional[threading.Event] = None):
+        self.scheduler.consume(self.key, nbytes, cancel_event)
+
+    def account(self, d: Dict[str, Any], cancel_event: Optional[threading.Event] = None):
+        """Consome a diferença de downloaded_bytes de um dict de progresso do
+        yt-dlp (por arquivo). Dicts marcados com 'throttled' já foram
+        contabilizados pelo próprio downloader."""
+        if d.get('status') != 'downloading' or d.get('throttled'):
+            return
+        name = d.get('tmpfilename') or d.get('filename') or ''
+        done = int(d.get('downloaded_bytes') or 0)
+        with self._lock:
+            last = self._seen.get(name)
+            self._seen[name] = done
+        if last is None or done < last:
+            # primeiro evento do arquivo (inclui bytes retomados) ou reinício
+            return
+        self.consume(done - last, cancel_event)
+
+    def close(self):
+        self.scheduler.unregister(self.key)
+
+
+__all__ = ["BandwidthScheduler", "JobThrottle", "TokenBucket"]
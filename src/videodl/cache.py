@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# parâmetros de rastreamento que não alteram o conteúdo extraído
+_TRACKING_PARAMS = ('fbclid', 'gclid', 'si', 'feature')
+
+
+def normalize_url(url: str) -> str:
+    """Normaliza a URL para uso como chave de cache.
+
+    Esquema/host em minúsculas, sem fragmento, sem porta padrão, query ordenada
+    e sem parâmetros de rastreamento (utm_*, fbclid...).
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.startswith('utm_') and k not in _TRACKING_PARAMS]
+    query.sort()
+    # fragmento é descartado, exceto dados "smuggled" do yt-dlp que mudam a extração
+    fragment = parts.fragment if parts.fragment.startswith('__youtubedl_smuggle') else ''
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), fragment))
+
+
+@dataclass
+class _Entry:
+    info: Dict[str, Any]
+    stored_at: float
+    elapsed: float  # tempo gasto na extração original (s)
+
+
+class InfoCache:
+    """Cache de info dicts do yt-dlp em memória (LRU) e opcionalmente em disco.
+
+    Chave: URL normalizada + variante (ex.: 'video', 'flat'), pois a mesma URL
+    extraída com opções diferentes gera resultados diferentes.
+    As URLs de mídia dentro do info dict expiram, por isso o TTL padrão é curto.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 1800.0,
+                 cache_dir: Optional[str] = None, max_disk_entries: int = 512):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self._mem: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, url: str, variant: str = 'video') -> Optional[Dict[str, Any]]:
+        key = (normalize_url(url), variant)
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None and now - entry.stored_at > self.ttl:
+                del self._mem[key]
+                entry = None
+            if entry is not None:
+                self._mem.move_to_end(key)
+        if entry is None:
+            entry = self._disk_get(key, now)
+            if entry is not None:
+                with self._lock:
+                    self._mem_put(key, entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry.elapsed
+        return entry.info
+
+    def put(self, url: str, info: Dict[str, Any], variant: str = 'video', elapsed: float = 0.0):
+        """Armazena um info dict já sanitizado (serializável em JSON)."""
+        key = (normalize_url(url), variant)
+        entry = _Entry(info=info, stored_at=time.time(), elapsed=elapsed)
+        with self._lock:
+            self._mem_put(key, entry)
+        self._disk_put(key, entry)
+
+    def invalidate(self, url: str, variant: str = 'video'):
+        key = (normalize_url(url), variant)
+        with self._lock:
+            self._mem.pop(key, None)
+        path = self._disk_path(key)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0,
+                'saved_seconds': self.saved_seconds,
+                'entries': len(self._mem),
+            }
+
+    # ---------------- Internos -----------------
+    def _mem_put(self, key, entry: _Entry):
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _disk_path(self, key) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        digest = hashlib.sha1(f"{key[1]}\n{key[0]}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.json')
+
+    def _disk_get(self, key, now: float) -> Optional[_Entry]:
+        path = self._disk_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entry = _Entry(info=data['info'], stored_at=float(data['stored_at']),
+                           elapsed=float(data.get('elapsed') or 0.0))
+        except Exception:
+            logger.debug("Entrada de cache inválida: %s", path)
+            return None
+        if now - entry.stored_at > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path, None)  # mtime = último acesso (ordem LRU no disco)
+        except OSError:
+            pass
+        return entry
+
+    def _disk_put(self, key, entry: _Entry):
+        path = self._disk_path(key)
+        if not path:
+            return
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'url': key[0], 'variant': key[1], 'stored_at': entry.stored_at,
+                           'elapsed': entry.elapsed, 'info': entry.info}, f)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.debug("Falha ao gravar cache em disco: %s", e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._disk_evict()
+
+    def _disk_evict(self):
+        try:
+            files = [os.path.join(self.cache_dir, n) for n in os.listdir(self.cache_dir) if n.endswith('.json')]
+        except OSError:
+            return
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+__all__ = ["InfoCache", "normalize_url"]
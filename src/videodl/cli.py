@@ -0,0 +1,351 @@
+"""Interface de linha de comando (sem GUI) para servidores.
+
+Uso:
+    python -m videodl.cli URL [URL ...] -o DESTINO [-j 4] [-m manifest.json]
+    python -m videodl.cli -b lote.txt -o DESTINO
+    python -m videodl.cli serve -o DESTINO [--port 8080]   (API HTTP, ver service.py)
+
+O arquivo de lote aceita uma URL por linha ou linhas JSON com opções por job
+(mesmos nomes dos parâmetros de VideoDownloader.download), por exemplo:
+    {"url": "https://...", "only_audio": true, "playlist_mode": true}
+
+Não importa tkinter: funciona em máquinas sem display.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from .archive import DownloadArchive
+from .bandwidth import BandwidthScheduler
+from .downloader import VideoDownloader
+from .formats import AUDIO_FORMATS, PROFILES
+from .journal import JobJournal
+from .metrics import MetricsRegistry, cpu_times, cpu_usage
+from .postprocess import PostProcessPipeline
+from .retry import RetryPolicies
+from .sessions import SessionPool
+from .storage import DEFAULT_MIN_FREE, StorageManager
+from .sync import SyncStore
+from .jobs import DownloadQueue, DownloadJob, JobState
+
+logger = logging.getLogger(__name__)
+
+# opções por job aceitas no lote (JSONL) -> parâmetros de download()
+JOB_OPTIONS = ('format_id', 'only_audio', 'playlist_mode', 'playlist_workers',
+               'write_thumbnail', 'prefer_mp4', 'connections', 'fragment_workers',
+               'fragment_retries', 'fragment_buffer', 'format_profile', 'sync', 'sync_full',
+               'audio_format')
+
+# chaves da spec que não são parâmetros de download()
+SPEC_KEYS = frozenset({'url', 'output_dir', 'priority', 'weight', 'rate_limit'})
+
+
+def parse_batch(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """Converte linhas do arquivo de lote em especificações de job.
+
+    Linhas vazias e iniciadas por '#' são ignoradas. Cada spec tem 'url' e,
+    opcionalmente, output_dir, priority, weight, rate_limit e as chaves de
+    JOB_OPTIONS.
+    """
+    specs: List[Dict[str, Any]] = []
+    for lineno, raw in enumerate(lines, start=1):
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                spec = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"linha {lineno}: JSON inválido ({e})")
+            try:
+                spec = check_spec(spec)
+            except ValueError as e:
+                raise ValueError(f"linha {lineno}: {e}")
+        else:
+            spec = {'url': line}
+        specs.append(spec)
+    return specs
+
+
+def check_spec(spec: Any) -> Dict[str, Any]:
+    """Valida uma spec de job (linha JSONL do lote ou corpo do POST da API)
+    e normaliza rate_limit. Levanta ValueError com a mensagem para o usuário."""
+    if not isinstance(spec, dict) or not spec.get('url') or not isinstance(spec['url'], str):
+        raise ValueError("campo 'url' obrigatório")
+    if 'rate_limit' in spec:
+        spec['rate_limit'] = parse_rate(spec['rate_limit'])
+    unknown = set(spec) - set(JOB_OPTIONS) - SPEC_KEYS
+    if unknown:
+        raise ValueError(f"opções desconhecidas: {', '.join(sorted(unknown))}")
+    return spec
+
+
+def parse_rate(value: Any) -> Optional[float]:
+    """Converte taxa em bytes/s: número ou texto com sufixo K/M/G
+    ('500K', '2.5M'). 0 ou vazio = sem limite (None)."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        rate = float(value)
+    else:
+        m = re.match(r'^([\d.]+)\s*([KMG]?)(?:I?B)?(?:/S)?$', str(value).strip().upper())
+        try:
+            rate = float(m.group(1)) * {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}.get(m.group(2), 1)
+        except (AttributeError, ValueError):
+            raise ValueError(f"taxa inválida: {value!r}")
+    if rate < 0:
+        raise ValueError(f"taxa inválida: {value!r}")
+    return rate or None
+
+
+def parse_size(value: Any) -> int:
+    """Converte tamanho em bytes: número ou texto com sufixo K/M/G ('500M')."""
+    try:
+        return int(parse_rate(value) or 0)
+    except ValueError:
+        raise ValueError(f"tamanho inválido: {value!r}")
+
+
+def run_jobs(specs: List[Dict[str, Any]], output_dir: str, concurrency: int = 2,
+             defaults: Optional[Dict[str, Any]] = None,
+             downloader: Optional[VideoDownloader] = None,
+             bandwidth: Optional[BandwidthScheduler] = None,
+             metrics: Optional[MetricsRegistry] = None,
+             retry_policies: Optional[RetryPolicies] = None) -> Dict[str, Any]:
+    """Executa os jobs no pool e retorna o manifesto (dict serializável).
+
+    'cpu' no manifesto: segundos de CPU do lote (processo, filhos aguardados
+    como o ffmpeg em linha e, em 'postprocess', os workers do pipeline), com
+    o total e a média por job concluído.
+    """
+    defaults = defaults or {}
+
+    def _on_state(job: DownloadJob):
+        if job.state == JobState.FAILED:
+            logger.error("[%s] falhou: %s (%s)", job.id, job.url, job.error)
+        elif job.state != JobState.PENDING:
+            logger.info("[%s] %s: %s", job.id, job.state, job.url)
+        if job.state == JobState.DONE and job.report is not None and job.report.skipped:
+            logger.warning("[%s] %d item(ns) pulado(s) após as novas tentativas",
+                           job.id, len(job.report.skipped))
+
+    queue = DownloadQueue(concurrency=concurrency, downloader=downloader, on_state=_on_state,
+                          bandwidth=bandwidth, metrics=metrics, retry_policies=retry_policies)
+    pipeline = getattr(queue.downloader, 'pipeline', None)
+    cpu_before = cpu_times()
+    pipeline_cpu = pipeline.cpu_seconds if pipeline is not None else 0.0
+    started = time.time()
+    try:
+        for spec in specs:
+            if spec.get('resume_key'):
+                # job retomado do journal (JournalJob.download_kwargs): mantém todas
+                # as opções originais, inclusive as fora do lote (ensure_audio,
+                # skip_archived)
+                options = {k: v for k, v in spec.items() if k not in SPEC_KEYS}
+            else:
+                options = {k: spec[k] for k in JOB_OPTIONS if k in spec}
+            for k, v in defaults.items():
+                options.setdefault(k, v)
+            dest = spec.get('output_dir') or output_dir
+            os.makedirs(dest, exist_ok=True)
+            queue.submit(spec['url'], dest, priority=int(spec.get('priority') or 0),
+                         weight=float(spec.get('weight') or 1.0), rate_limit=spec.get('rate_limit'),
+                         **options)
+        queue.join()
+    except KeyboardInterrupt:
+        logger.warning("Interrompido: cancelando jobs...")
+        queue.shutdown(wait=True, cancel_pending=True)
+    else:
+        queue.shutdown()
+    finished = time.time()
+    # antes do shutdown do pipeline: os workers ainda não contam como filhos
+    cpu = cpu_usage(cpu_before)
+    cpu['postprocess'] = (pipeline.cpu_seconds - pipeline_cpu) if pipeline is not None else 0.0
+    cpu['total'] += cpu['postprocess']
+    jobs = [j.to_dict() for j in sorted(queue.jobs(), key=lambda j: j.id)]
+    done = sum(1 for j in jobs if j['state'] == JobState.DONE)
+    cpu['per_job'] = cpu['total'] / done if done else None
+    return {
+        'started_at': started,
+        'finished_at': finished,
+        'elapsed': finished - started,
+        'concurrency': concurrency,
+        'total_bytes': sum(j['bytes'] for j in jobs),
+        'cpu': cpu,
+        'counts': {s: sum(1 for j in jobs if j['state'] == s)
+                   for s in (JobState.DONE, JobState.FAILED, JobState.CANCELLED)},
+        'skipped_entries': sum((j['failures'] or {}).get('skipped', 0) for j in jobs),
+        'storage': (queue.downloader.storage.report([output_dir])
+                    if getattr(queue.downloader, 'storage', None) is not None else None),
+        'sessions': (queue.downloader.sessions.stats()
+                     if getattr(queue.downloader, 'sessions', None) is not None else None),
+        'jobs': jobs,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog='videodl', description="Downloader yt-dlp sem interface gráfica")
+    p.add_argument('urls', nargs='*', help="URLs de vídeo ou playlist")
+    p.add_argument('-b', '--batch', help="arquivo de lote (uma URL por linha ou JSONL); '-' para stdin")
+    p.add_argument('-o', '--output', default='.', help="diretório de destino (padrão: atual)")
+    p.add_argument('-j', '--jobs', type=int, default=2, help="downloads simultâneos (padrão: 2)")
+    p.add_argument('-m', '--manifest', help="grava manifesto JSON com resultados; '-' para stdout")
+    p.add_argument('-f', '--format', dest='format_id', help="format_id padrão para todos os jobs")
+    p.add_argument('-p', '--profile', dest='format_profile', choices=sorted(PROFILES),
+                   help="escolhe o formato por perfil quando -f não é informado "
+                        "(ex.: 720p, fastest, data-saver, no-merge)")
+    p.add_argument('--audio', action='store_true',
+                   help="somente áudio, no formato de --audio-format")
+    p.add_argument('--audio-format', choices=list(AUDIO_FORMATS), default='best',
+                   help="com --audio: best mantém o codec da fonte (aac -> m4a, opus, vorbis -> ogg) "
+                        "copiando a trilha sem recodificar; m4a/opus/ogg preferem trilhas nesse "
+                        "codec; mp3 recodifica (padrão: best)")
+    p.add_argument('--playlist', action='store_true', help="baixar playlist inteira")
+    p.add_argument('--playlist-workers', type=int, default=1, help="itens de playlist em paralelo")
+    p.add_argument('--connections', type=int, default=1,
+                   help="conexões HTTP por arquivo (download segmentado via Range; padrão: 1)")
+    p.add_argument('-N', '--fragment-workers', type=int, default=1,
+                   help="fragmentos HLS/DASH baixados em paralelo (padrão: 1)")
+    p.add_argument('--fragment-retries', type=int, default=10, help="retentativas por fragmento (padrão: 10)")
+    p.add_argument('--fragment-buffer', type=int,
+                   help="máximo de fragmentos pendentes fora de ordem (padrão: 2x --fragment-workers)")
+    p.add_argument('--thumbnail', action='store_true', help="salvar thumbnail")
+    p.add_argument('--no-mp4', action='store_true', help="não priorizar MP4")
+    p.add_argument('-r', '--limit-rate', type=parse_rate,
+                   help="limite de banda somando todos os jobs (ex.: 500K, 2M)")
+    p.add_argument('--pp-workers', type=int,
+                   help="processos de pós-processamento (ffmpeg) em paralelo aos downloads "
+                        "(padrão: núcleos; 0 = na thread do download)")
+    p.add_argument('--item-retries', type=int,
+                   help="novas tentativas de um item após erro transitório (5xx, 429, timeout, "
+                        "rede, 403 com troca de formato); 0 desativa (padrão: por classe de erro)")
+    p.add_argument('--scratch-dir',
+                   help="diretório para .part e arquivos intermediários do merge; o arquivo "
+                        "pronto é movido ao destino")
+    p.add_argument('--min-free', type=parse_size, default=DEFAULT_MIN_FREE,
+                   help="espaço mantido livre em disco (ex.: 1G; padrão: 64M)")
+    p.add_argument('--sessions', type=int, default=8,
+                   help="sessões do yt-dlp (conexões HTTP/TLS, cookies, caches dos extratores) "
+                        "reaproveitadas entre jobs com as mesmas opções (padrão: 8; 0 desativa)")
+    p.add_argument('--archive', help="índice SQLite de já baixados; itens registrados são pulados")
+    p.add_argument('--sync', metavar='DIR',
+                   help="modo sync: guarda em DIR um snapshot por playlist/canal e baixa só os "
+                        "itens novos desde a última execução")
+    p.add_argument('--sync-full', action='store_true',
+                   help="com --sync, percorre as fontes inteiras (detecta itens removidos)")
+    p.add_argument('--journal', help="journal de jobs (JSONL) para retomar após queda")
+    p.add_argument('--resume', action='store_true', help="retoma os jobs interrompidos do --journal")
+    p.add_argument('--metrics-jsonl', help="acrescenta as métricas de cada job (spans, bytes, retentativas) neste JSONL")
+    p.add_argument('--metrics-prom', help="grava métricas agregadas no formato texto do Prometheus")
+    p.add_argument('-v', '--verbose', action='store_true')
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['serve']:
+        from .service import main as serve_main
+        return serve_main(argv[1:])
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s', stream=sys.stderr)
+    try:
+        specs = [{'url': u} for u in args.urls]
+        if args.batch:
+            if args.batch == '-':
+                specs.extend(parse_batch(sys.stdin))
+            else:
+                with open(args.batch, 'r', encoding='utf-8') as f:
+                    specs.extend(parse_batch(f))
+    except (OSError, ValueError) as e:
+        logger.error("Lote inválido: %s", e)
+        return 2
+    if args.sync_full and not args.sync:
+        logger.error("--sync-full requer --sync")
+        return 2
+    if args.resume and not args.journal:
+        logger.error("--resume requer --journal")
+        return 2
+    journal = JobJournal(args.journal) if args.journal else None
+    if args.resume:
+        for job in journal.pending():
+            logger.info("Retomando: %s", job.url)
+            specs.append(dict(job.download_kwargs(), url=job.url, output_dir=job.output_dir))
+    if not specs:
+        logger.error("Nenhuma URL informada")
+        return 2
+    if args.jobs < 1:
+        logger.error("--jobs deve ser >= 1")
+        return 2
+
+    defaults = {
+        'format_id': args.format_id,
+        'only_audio': args.audio,
+        'audio_format': args.audio_format,
+        'playlist_mode': args.playlist,
+        'playlist_workers': args.playlist_workers,
+        'write_thumbnail': args.thumbnail,
+        'prefer_mp4': not args.no_mp4,
+        'connections': args.connections,
+        'fragment_workers': args.fragment_workers,
+        'fragment_retries': args.fragment_retries,
+        'fragment_buffer': args.fragment_buffer,
+        'format_profile': args.format_profile,
+    }
+    sync_store = None
+    if args.sync:
+        sync_store = SyncStore(args.sync)
+        defaults.update(sync=True, sync_full=args.sync_full)
+    archive = DownloadArchive(args.archive) if args.archive else None
+    pipeline = PostProcessPipeline(args.pp_workers) if args.pp_workers != 0 else None
+    sessions = SessionPool(args.sessions) if args.sessions > 0 else None
+    # jobs que não cabem no disco esperam ou falham antes de baixar
+    storage = StorageManager(args.scratch_dir, args.min_free)
+    # sempre presente: pesos/limites por job do lote valem mesmo sem limite global
+    bandwidth = BandwidthScheduler(args.limit_rate)
+    metrics = None
+    if args.metrics_jsonl or args.metrics_prom:
+        metrics = MetricsRegistry(jsonl_path=args.metrics_jsonl, prometheus_path=args.metrics_prom)
+    try:
+        manifest = run_jobs(specs, args.output, concurrency=args.jobs, defaults=defaults,
+                            downloader=VideoDownloader(archive=archive, journal=journal,
+                                                       pipeline=pipeline, storage=storage,
+                                                       sync_store=sync_store, sessions=sessions),
+                            bandwidth=bandwidth, metrics=metrics,
+                            retry_policies=(RetryPolicies().with_retries(args.item_retries)
+                                            if args.item_retries is not None else None))
+    finally:
+        if pipeline is not None:
+            pipeline.shutdown()
+        if sessions is not None:
+            sessions.close()
+    if journal is not None:
+        journal.compact()
+
+    if args.manifest == '-':
+        json.dump(manifest, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    elif args.manifest:
+        with open(args.manifest, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    counts = manifest['counts']
+    logger.info("Concluídos: %d, falhas: %d, cancelados: %d, itens pulados: %d, %.1f MB em %.1fs "
+                "(CPU %.1fs)", counts['done'], counts['failed'], counts['cancelled'],
+                manifest['skipped_entries'], manifest['total_bytes'] / 1_000_000,
+                manifest['elapsed'], manifest['cpu']['total'])
+    if sync_store is not None:
+        synced = [j['sync'] for j in manifest['jobs'] if j['sync']]
+        logger.info("Sync: %d fonte(s), %d item(ns) novo(s), %d removido(s)", len(synced),
+                    sum(s['new'] for s in synced), sum(s['removed'] or 0 for s in synced))
+    if counts['cancelled'] and not counts['failed']:
+        return 130
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,55 @@
+import copy
 import threading
 import logging
 import os
 import re
-import shutil
-from typing import List, Dict, Callable, Optional, Any
+import time
+from typing import List, Dict, Callable, Optional, Any, Iterator, Set, Tuple, Union
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-try:
-    from yt_dlp import YoutubeDL  # type: ignore
-except Exception:  # cobertura ampla: ImportError + outros problemas de ambiente
-    YoutubeDL = None  # type: ignore
+from .archive import DownloadArchive, archive_postprocessor
+from .bandwidth import JobThrottle
+from .cache import InfoCache
+from .journal import JobJournal, JournalJob, journal_postprocessor
+from .metrics import EXTRACTION, JobMetrics
+from .postprocess import PostProcessPipeline, wait_postprocessing
+from .progress import PlaylistProgress
+from .retry import CANCELLED, EntryFailure, FailureReport, RetryPolicies, classify
+from .fragments import backoff_sleep
+from .formats import (FormatChoice, FormatProfile, FormatSelector, PROFILES, expected_bytes,
+                      get_audio_format, get_profile, select_audio, without_merge)
+from .storage import Reservation, StorageManager
+from .sessions import SessionPool
+from .sync import SourceSnapshot, SyncPlan, SyncStore, failed_keys
+from .ffmpeg import ffmpeg_path, probe_ffmpeg
+from .ydl import tuned_youtubedl, ytdlp
 
 logger = logging.getLogger(__name__)
 
+
+def _youtubedl():
+    """Classe YoutubeDL (o yt_dlp só é importado no primeiro uso)."""
+    module = ytdlp()
+    if module is None:
+        raise RuntimeError("yt_dlp não está instalado ou falhou ao importar.")
+    return module.YoutubeDL
+
+
+def _download_error():
+    module = ytdlp()
+    return module.utils.DownloadError if module is not None else RuntimeError
+
+
+def __getattr__(name: str):
+    # compatibilidade: downloader.YoutubeDL / downloader.DownloadError
+    if name == 'YoutubeDL':
+        module = ytdlp()
+        return module.YoutubeDL if module is not None else None
+    if name == 'DownloadError':
+        return _download_error()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 @dataclass
 class FormatInfo:
     itag: str
@@ -23,65 +60,216 @@ class FormatInfo:
     acodec: str
     filesize: Optional[int]
     note: str
+    height: Optional[int] = None
+    tbr: Optional[float] = None  # kbit/s
+    protocol: str = ''
+    duration: Optional[float] = None  # do vídeo (estimativa de tamanho por bitrate)
 
 class DownloadCancelled(Exception):
     pass
 
 class VideoDownloader:
-    def __init__(self):
-        self._cancel_flag = False
-        self._lock = threading.Lock()
+    def __init__(self, info_cache: Optional[InfoCache] = None,
+                 archive: Optional[DownloadArchive] = None,
+                 journal: Optional[JobJournal] = None,
+                 pipeline: Optional[PostProcessPipeline] = None,
+                 storage: Optional[StorageManager] = None,
+                 sync_store: Optional[SyncStore] = None,
+                 sessions: Optional[SessionPool] = None):
+        # Evento padrão usado quando o chamador não fornece um próprio (ex.: GUI
+        # com um único download). Jobs da fila usam um evento por job.
+        self._cancel_event = threading.Event()
+        # list_formats e download compartilham o cache: a extração (etapa mais
+        # lenta, dependente de rede) não é repetida para a mesma URL.
+        self.info_cache = info_cache if info_cache is not None else InfoCache()
+        # índice persistente de mídias já baixadas (opcional)
+        self.archive = archive
+        # journal de jobs para retomar após queda (opcional)
+        self.journal = journal
+        # pós-processamento (ffmpeg) fora da thread de download (opcional): a
+        # rede segue para o próximo item enquanto o anterior é convertido
+        self.pipeline = pipeline
+        # espaço em disco: reserva por job, verificação por item e scratch (opcional)
+        self.storage = storage
+        # snapshots das fontes para o modo sync (só itens novos; opcional)
+        self.sync_store = sync_store
+        # YoutubeDL reaproveitados entre jobs com as mesmas opções: conexões
+        # HTTP/TLS, cookies e caches dos extratores (opcional)
+        self.sessions = sessions
+        # seletores por perfil: ranking memorizado entre chamadas
+        self._selectors: Dict[FormatProfile, FormatSelector] = {}
 
     def cancel(self):
-        with self._lock:
-            self._cancel_flag = True
+        self._cancel_event.set()
 
     def reset_cancel(self):
-        with self._lock:
-            self._cancel_flag = False
+        self._cancel_event.clear()
 
-    def _check_cancel(self):
-        with self._lock:
-            if self._cancel_flag:
-                raise DownloadCancelled("Download cancelado pelo usuário")
+    def _check_cancel(self, cancel_event: Optional[threading.Event] = None):
+        event = cancel_event if cancel_event is not None else self._cancel_event
+        if event.is_set():
+            raise DownloadCancelled("Download cancelado pelo usuário")
 
     def list_formats(self, url: str) -> List[FormatInfo]:
         """Retorna formatos do primeiro vídeo (mesmo em playlist).
         Mantemos simples para seleção única aplicada a todos os vídeos na playlist.
         """
-        if YoutubeDL is None:
-            raise RuntimeError("yt_dlp não está instalado ou falhou ao importar.")
-        ydl_opts = {"skip_download": True, "quiet": True, "no_warnings": True}
-        formats: List[FormatInfo] = []
-        with YoutubeDL(ydl_opts) as ydl:  # type: ignore
-            info = ydl.extract_info(url, download=False)
-            if not info:
-                return []
-            if isinstance(info, dict) and info.get('entries'):
-                for entry in info.get('entries', []) or []:
-                    if entry:
-                        info = entry
-                        break
-            # segurança: se ainda não for dict esperado
-            if not isinstance(info, dict):
-                return []
-            for f in (info.get('formats') or []):
-                if not isinstance(f, dict):
-                    continue
-                if not f.get('url'):
-                    continue
-                fmt = FormatInfo(
-                    itag=str(f.get('format_id')),
-                    ext=f.get('ext') or '',
-                    resolution=f.get('resolution') or (f.get('height') and f"{f.get('height')}p") or 'audio',
-                    fps=f.get('fps'),
-                    vcodec=f.get('vcodec') or 'none',
-                    acodec=f.get('acodec') or 'none',
-                    filesize=f.get('filesize') or f.get('filesize_approx'),
-                    note=f.get('format_note') or ''
-                )
-                formats.append(fmt)
-        return formats
+        return list(self.iter_formats(url))
+
+    def iter_formats(self, url: str) -> Iterator[FormatInfo]:
+        """Gera os formatos do primeiro vídeo à medida que ficam disponíveis.
+
+        Em playlists/canais resolve apenas a lista de forma "flat" e extrai
+        somente o primeiro item, em vez de extrair todos os itens.
+        """
+        info = self._first_video_info(url)
+        # segurança: se não for dict esperado
+        if not isinstance(info, dict):
+            return
+        for f in (info.get('formats') or []):
+            if not isinstance(f, dict):
+                continue
+            if not f.get('url'):
+                continue
+            yield self._format_info(f, info.get('duration'))
+
+    def choose_format(self, url: str, profile: Union[str, FormatProfile, None] = None
+                      ) -> Optional[FormatChoice]:
+        """Escolhe formato (ou combinação vídeo+áudio) do vídeo/primeiro item
+        da playlist segundo o perfil, com o tamanho esperado."""
+        profile = get_profile(profile) or PROFILES['best']
+        if ffmpeg_path() is None:
+            profile = without_merge(profile)
+        selector = self._selectors.get(profile)
+        if selector is None:
+            selector = self._selectors[profile] = FormatSelector(profile)
+        return selector.select(self.list_formats(url))
+
+    def choose_audio(self, url: str, audio_format: str = 'best') -> Optional[FormatInfo]:
+        """Melhor formato só de áudio do vídeo/primeiro item da playlist para
+        extrair em audio_format, preferindo os que dispensam recodificação."""
+        return select_audio(self.list_formats(url), audio_format)
+
+    def estimate_bytes(self, url: str, format_id: Optional[str] = None, only_audio: bool = False,
+                       format_profile: Union[str, FormatProfile, None] = None,
+                       audio_format: str = 'best') -> Tuple[Optional[int], bool]:
+        """Tamanho esperado do vídeo/primeiro item da playlist (FormatInfo.filesize
+        ou bitrate x duração) e se o download passa por merge/conversão, que
+        mantém dois arquivos no temporário até o fim."""
+        formats = self.list_formats(url)
+        audio = [f for f in formats if f.vcodec == 'none' and f.acodec != 'none']
+        best_audio = max(audio, key=lambda f: f.tbr or 0, default=None)
+        if only_audio:
+            source = (select_audio(formats, audio_format)
+                      or max(formats, key=lambda f: f.tbr or 0, default=None))
+            # a extração (cópia ou não) grava um segundo arquivo ao lado do baixado
+            return ((expected_bytes(source) if source is not None else None),
+                    ffmpeg_path() is not None)
+        if not format_id:
+            choice = self.choose_format(url, format_profile)
+            return (choice.expected_bytes, choice.needs_merge) if choice is not None else (None, False)
+        by_id = {f.itag: f for f in formats}
+        parts = [by_id.get(i) for i in format_id.split('+')]
+        if len(parts) == 1 and parts[0] is not None and parts[0].acodec == 'none' \
+                and best_audio is not None and ffmpeg_path() is not None:
+            parts.append(best_audio)  # _build_ydl_opts junta o melhor áudio
+        sizes = [expected_bytes(f) if f is not None else None for f in parts]
+        if None in sizes:
+            return None, len(parts) > 1
+        return sum(sizes), len(parts) > 1
+
+    def reserve_space(self, url: str, output_dir: str, format_id: Optional[str] = None,
+                      only_audio: bool = False,
+                      format_profile: Union[str, FormatProfile, None] = None,
+                      playlist_mode: bool = False, playlist_workers: int = 1,
+                      cancel_event: Optional[threading.Event] = None,
+                      sync: bool = False, audio_format: str = 'best') -> Optional[Reservation]:
+        """Reserva no StorageManager o espaço estimado do job (None sem
+        storage). Espera enquanto reservas de outros jobs impedem; levanta
+        InsufficientSpace se não couber. Em playlists reserva o primeiro item
+        vezes os itens em paralelo; cada item é conferido antes de baixar.
+        Em sync não há estimativa (extrairia o primeiro item mesmo sem nada
+        novo): só a verificação por item vale."""
+        if self.storage is None:
+            return None
+        if sync:
+            return self.storage.reserve(output_dir, None)
+        try:
+            nbytes, merge = self.estimate_bytes(url, format_id, only_audio, format_profile,
+                                                audio_format)
+        except Exception as e:
+            # o download reporta o erro de extração com as novas tentativas
+            logger.debug("Sem estimativa de tamanho para %s: %s", url, e)
+            nbytes, merge = None, False
+        if nbytes and playlist_mode:
+            nbytes *= max(playlist_workers, 1)
+        return self.storage.reserve(output_dir, nbytes, merge, cancel_event)
+
+    def _format_info(self, f: Dict[str, Any], duration: Optional[float] = None) -> FormatInfo:
+        return FormatInfo(
+            itag=str(f.get('format_id')),
+            ext=f.get('ext') or '',
+            resolution=f.get('resolution') or (f.get('height') and f"{f.get('height')}p") or 'audio',
+            fps=f.get('fps'),
+            vcodec=f.get('vcodec') or 'none',
+            acodec=f.get('acodec') or 'none',
+            filesize=f.get('filesize') or f.get('filesize_approx'),
+            note=f.get('format_note') or '',
+            height=f.get('height'),
+            tbr=f.get('tbr'),
+            protocol=f.get('protocol') or '',
+            duration=duration,
+        )
+
+    def _first_video_info(self, url: str) -> Optional[Dict[str, Any]]:
+        """Info completa do vídeo da URL ou do primeiro item da playlist."""
+        cached = self.info_cache.get(url, 'video') if self.info_cache else None
+        if cached is not None:
+            return copy.deepcopy(cached)
+        # noplaylist igual ao download de vídeo único: o resultado serve aos dois
+        base_opts = {"skip_download": True, "quiet": True, "no_warnings": True, "noplaylist": True}
+        flat_opts = dict(base_opts, extract_flat='in_playlist')
+        start = time.monotonic()
+        with self._session(flat_opts, tuned=False) as ydl:
+            # process=False: entradas da playlist ficam preguiçosas (não são paginadas)
+            raw = ydl.extract_info(url, download=False, process=False)
+            if not isinstance(raw, dict):
+                return None
+            result_type = raw.get('_type', 'video')
+            if result_type == 'video':
+                info = ydl.process_ie_result(raw, download=False)
+                if isinstance(info, dict) and self.info_cache is not None:
+                    self.info_cache.put(url, ydl.sanitize_info(info, remove_private_keys=True),
+                                        'video', elapsed=time.monotonic() - start)
+                return info
+            if result_type in ('playlist', 'multi_video'):
+                target = next((e for e in (raw.get('entries') or []) if e), None)
+            else:  # url / url_transparent: redirecionamento para outro extrator
+                target = raw
+        if not isinstance(target, dict):
+            return None
+        if target.get('_type', 'url') not in ('url', 'url_transparent'):
+            # item já veio completo (ex.: multi_video); só falta processar formatos
+            with self._session(base_opts, tuned=False) as ydl:
+                return ydl.process_ie_result(target, download=False)
+        target_url = target.get('url') or target.get('webpage_url')
+        if not target_url:
+            return None
+        with self._session(base_opts, tuned=False) as ydl:
+            return self._extract_info(ydl, target_url, 'video')
+
+    def _extract_info(self, ydl, url: str, variant: str) -> Optional[Dict[str, Any]]:
+        """extract_info sem download consultando o cache (variant identifica as
+        opções de extração usadas: 'video', 'flat'...)."""
+        cached = self.info_cache.get(url, variant) if self.info_cache else None
+        if cached is not None:
+            return copy.deepcopy(cached)
+        start = time.monotonic()
+        info = ydl.extract_info(url, download=False)
+        if isinstance(info, dict) and self.info_cache is not None:
+            self.info_cache.put(url, ydl.sanitize_info(info, remove_private_keys=True),
+                                variant, elapsed=time.monotonic() - start)
+        return info
 
     def _sanitize(self, name: str) -> str:
         return re.sub(r'[\\/:*?"<>|]', '_', name)
@@ -94,43 +282,454 @@ class VideoDownloader:
                  playlist_mode: bool = False, write_thumbnail: bool = False,
                  prefer_mp4: bool = True,
                  ensure_audio: bool = True,
-                 progress_cb: Optional[Callable[[Dict[str, Any]], None]] = None):
+                 progress_cb: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 playlist_workers: int = 1,
+                 skip_archived: bool = True,
+                 resume_key: Optional[str] = None,
+                 connections: int = 1,
+                 fragment_workers: int = 1,
+                 fragment_retries: int = 10,
+                 fragment_buffer: Optional[int] = None,
+                 throttle: Optional[JobThrottle] = None,
+                 metrics: Optional[JobMetrics] = None,
+                 format_profile: Union[str, FormatProfile, None] = None,
+                 retry_policies: Optional[RetryPolicies] = None,
+                 failure_report: Optional[FailureReport] = None,
+                 storage_reservation: Optional[Reservation] = None,
+                 sync: bool = False,
+                 sync_full: bool = False,
+                 audio_format: str = 'best') -> Optional[SourceSnapshot]:
         """Baixa vídeo(s).
         playlist_mode: se True não força noplaylist e usa template indexado.
         write_thumbnail: salva thumbnail (se disponível) convertida para jpg.
+        cancel_event: evento de cancelamento próprio do job; se omitido usa o
+        evento da instância (controlado por cancel()/reset_cancel()).
+        playlist_workers: com playlist_mode, quantos itens baixar em paralelo.
+        Com valor > 1 a playlist é resolvida uma única vez (extract_flat) e cada
+        item é baixado separadamente.
+        skip_archived: com um archive configurado, pula (antes de extrair) itens
+        já registrados. Downloads concluídos são sempre registrados no archive.
+        resume_key: com um journal configurado, retoma o job indicado: itens já
+        concluídos são pulados e arquivos .part continuam via HTTP Range.
+        connections: com valor > 1, formatos HTTP diretos (progressivos e as
+        partes de um merge) são baixados em faixas paralelas de bytes
+        (SegmentedDownloader); servidores sem suporte a Range usam uma conexão.
+        fragment_workers: fragmentos HLS/DASH baixados em paralelo (1 =
+        sequencial). fragment_buffer limita quantos fragmentos ficam pendentes
+        entre o pedido e a escrita em ordem (padrão: 2x workers);
+        fragment_retries é o número de retentativas por fragmento, com backoff
+        exponencial. Os dicts de progresso trazem 'fragment_timings' (índice,
+        tempo, bytes e retentativas de cada fragmento concluído).
+        throttle: controle de banda do job (BandwidthScheduler.register); cada
+        bloco recebido passa por ele, inclusive segmentos e fragmentos.
+        metrics: recebe os spans do job (extração, seleção de formato,
+        transferência, cada pós-processador, movimentação), bytes e
+        retentativas (MetricsRegistry.start).
+        format_profile: sem format_id, escolhe o formato pelo perfil (nome em
+        PROFILES ou FormatProfile) a partir dos formatos do vídeo/primeiro item;
+        a escolha vira um seletor aplicado a todos os itens da playlist.
+        retry_policies: política de novas tentativas por classe de erro
+        (padrão: DEFAULT_POLICIES de retry.py). As retentativas de requisição
+        do yt-dlp acontecem dentro de um download; estas repetem o item
+        inteiro (extração nova, URLs novas) depois de uma espera com backoff
+        exponencial e jitter, e com HTTP 403 excluem o formato que falhou.
+        failure_report: recebe as falhas de cada item e o que foi feito com
+        elas (recuperado ou pulado). Itens de playlist que continuam falhando
+        são pulados; sem playlist, a falha final é levantada.
+        storage_reservation: espaço já reservado (reserve_space, ex.: pela
+        fila antes de iniciar o job); com um storage configurado e sem
+        reserva, download() reserva (e pode esperar ou levantar
+        InsufficientSpace). A reserva é liberada ao fim. Itens cujo tamanho
+        não cabe no disco falham antes de baixar (erro de disco, sem novas
+        tentativas).
+        sync: com um sync_store configurado, baixa da playlist/canal só os
+        itens que não estavam no snapshot da fonte (implica playlist_mode). O
+        percurso das entradas (flat, sem extrair cada item) para cedo quando
+        a ordem da fonte permite; um percurso completo (sync_full, primeira
+        execução ou após SyncStore.full_interval) também detecta removidos.
+        O snapshot só é gravado se o job terminar; itens que falharam
+        continuam novos no próximo sync. Retorna o snapshot gravado
+        (last_sync com as contagens).
+        audio_format: com only_audio, o formato final (AUDIO_FORMATS). 'best'
+        mantém o codec da fonte e só troca o container (aac -> m4a, opus ->
+        opus, vorbis -> ogg); m4a, opus e ogg escolhem a melhor trilha só de
+        áudio nesse codec, copiando o stream (recodificam só se não houver).
+        'mp3' recodifica (192 kbit/s, exceto fontes já em mp3). Sem ffmpeg,
+        o arquivo só de áudio é gravado como veio (somente 'best' e 'm4a').
+
+        Em playlist os dicts de progresso recebem playlist_index, playlist_count
+        e playlist_percent (progresso agregado, correto mesmo com itens
+        terminando fora de ordem).
         """
-        if YoutubeDL is None:
-            raise RuntimeError("yt_dlp não está instalado ou falhou ao importar.")
-        self.reset_cancel()
+        _youtubedl()  # falha cedo sem yt_dlp
+        if sync and self.sync_store is None:
+            raise ValueError("sync requer um SyncStore (VideoDownloader(sync_store=...))")
+        playlist_mode = playlist_mode or sync
+        if cancel_event is None:
+            self.reset_cancel()
         os.makedirs(output_dir, exist_ok=True)
 
+        snapshot: Optional[SourceSnapshot] = None
+        plan: Optional[SyncPlan] = None
+        if sync:
+            snapshot = self.sync_store.load(url)
+            plan = self._sync_plan(url, snapshot, sync_full, metrics)
+            self._check_cancel(cancel_event)
+            if not plan.new:
+                return self._sync_commit(url, snapshot, plan, set())
+
+        ydl_opts = self._build_ydl_opts(output_dir, format_id, only_audio, playlist_mode,
+                                        write_thumbnail, prefer_mp4, ensure_audio,
+                                        self.storage.temp_dir(output_dir) if self.storage else None,
+                                        audio_format)
+        # em sync, pelo primeiro item novo (não pelo primeiro da fonte)
+        first_url = plan.new[0]['url'] if plan is not None else url
+        if only_audio:
+            self._choose_audio_format(first_url, audio_format, ydl_opts)
+        profile = get_profile(format_profile)
+        if profile is not None and not format_id and not only_audio:
+            choice = self.choose_format(first_url, profile)
+            if choice is not None:
+                # o merge (se houver) continua configurado por _build_ydl_opts
+                ydl_opts['format'] = choice.format_spec
+                logger.info("Perfil %s: formato %s (~%s bytes)", profile.name, choice.format_id,
+                            choice.expected_bytes if choice.expected_bytes is not None else '?')
+        if connections > 1:
+            ydl_opts['http_connections'] = connections
+        if self.pipeline is not None:
+            ydl_opts['postprocess_pipeline'] = self.pipeline
+        if throttle is not None:
+            ydl_opts['bandwidth_throttle'] = throttle
+        ydl_opts['fragment_retries'] = fragment_retries
+        ydl_opts['retry_sleep_functions'] = {'fragment': backoff_sleep()}
+        if fragment_workers > 1:
+            ydl_opts['concurrent_fragment_downloads'] = fragment_workers
+            ydl_opts['fragment_buffer'] = fragment_buffer or fragment_workers * 2
+        if metrics is not None:
+            ydl_opts['job_metrics'] = metrics
+            metrics_cb = progress_cb
+
+            def progress_cb(d):
+                metrics.on_progress(d)
+                if metrics_cb:
+                    metrics_cb(d)
+        if self.archive is not None and skip_archived:
+            # o yt-dlp consulta o archive antes de extrair cada item
+            ydl_opts['download_archive'] = self.archive
+
+        journal_key = None
+        skip_ids: Set[str] = set()
+        if self.journal is not None:
+            if resume_key:
+                journal_key = resume_key
+                previous = self.journal.get(resume_key)
+                skip_ids = previous.finished_entries if previous else set()
+            else:
+                journal_key = self.journal.start_job(url, output_dir, {
+                    'format_id': format_id, 'only_audio': only_audio,
+                    'playlist_mode': playlist_mode, 'write_thumbnail': write_thumbnail,
+                    'prefer_mp4': prefer_mp4, 'ensure_audio': ensure_audio,
+                    'playlist_workers': playlist_workers, 'skip_archived': skip_archived,
+                    'connections': connections, 'fragment_workers': fragment_workers,
+                    'fragment_retries': fragment_retries, 'fragment_buffer': fragment_buffer,
+                    # perfis próprios (fora de PROFILES) não são retomáveis pelo nome
+                    'format_profile': (profile.name if profile is not None
+                                       and PROFILES.get(profile.name) == profile else None),
+                    'sync': sync, 'sync_full': sync_full, 'audio_format': audio_format,
+                })
+            user_cb = progress_cb
+
+            def progress_cb(d):
+                self.journal.entry_progress(journal_key, d)
+                if user_cb:
+                    user_cb(d)
+        if skip_ids:
+            ydl_opts['match_filter'] = _skip_ids_filter(skip_ids)
+        report = failure_report if failure_report is not None else FailureReport()
+        ydl_opts['failure_report'] = report
+        ydl_opts['retry_policies'] = retry_policies or RetryPolicies()
+
+        reservation = storage_reservation
+        try:
+            if reservation is None and self.storage is not None:
+                reservation = self.reserve_space(url, output_dir, format_id, only_audio, profile,
+                                                 playlist_mode, playlist_workers, cancel_event,
+                                                 sync=sync, audio_format=audio_format)
+            if reservation is not None:
+                ydl_opts['storage_reservation'] = reservation
+            if plan is not None:
+                # só o delta, sem resolver a playlist de novo
+                self._download_playlist_parallel(url, ydl_opts, playlist_workers, progress_cb,
+                                                 cancel_event, journal_key, skip_ids,
+                                                 entries=plan.new, total=plan.total)
+            elif playlist_mode and playlist_workers > 1:
+                self._download_playlist_parallel(url, ydl_opts, playlist_workers,
+                                                 progress_cb, cancel_event, journal_key, skip_ids)
+            else:
+                self._download_single(url, ydl_opts, playlist_mode, progress_cb,
+                                      cancel_event, journal_key)
+            self._finish_report(report)
+        except DownloadCancelled:
+            if journal_key:
+                self.journal.finish_job(journal_key, 'cancelled')
+            raise
+        except Exception as e:
+            if journal_key:
+                self.journal.finish_job(journal_key, 'failed', str(e))
+            raise
+        finally:
+            if reservation is not None:
+                reservation.release()
+        if journal_key:
+            self.journal.finish_job(journal_key, 'done')
+        if plan is not None:
+            return self._sync_commit(url, snapshot, plan, failed_keys(plan, report.skipped))
+        return None
+
+    def _sync_plan(self, url: str, snapshot: Optional[SourceSnapshot], full: bool,
+                   metrics: Optional[JobMetrics]) -> SyncPlan:
+        """Percorre a fonte (flat, entradas preguiçosas) só até achar os
+        itens novos em relação ao snapshot."""
+        opts = {'extract_flat': 'in_playlist', 'quiet': True, 'no_warnings': True,
+                'skip_download': True}
+        start = time.time()
+        with self._session(opts, tuned=False) as ydl:
+            # process=False: páginas da playlist só são buscadas ao iterar
+            info = ydl.extract_info(url, download=False, process=False)
+            for _ in range(5):
+                # url / url_transparent: redirecionamento para outro extrator
+                if not isinstance(info, dict) or info.get('_type') not in ('url', 'url_transparent'):
+                    break
+                info = ydl.extract_info(info['url'], download=False, process=False,
+                                        ie_key=info.get('ie_key'))
+            if not isinstance(info, dict):
+                raise _download_error()(f"sem resultado para {url}")
+            # o percurso fica dentro do with: as entradas usam o YoutubeDL
+            plan = self.sync_store.plan(url, info, snapshot, full)
+        if metrics is not None:
+            metrics.add_span(EXTRACTION, start, time.time(), url=url, flat=True, sync=True,
+                             walked=plan.walked, full=plan.full)
+        return plan
+
+    def _sync_commit(self, url: str, snapshot: Optional[SourceSnapshot], plan: SyncPlan,
+                     failed: Set[str]) -> SourceSnapshot:
+        result = self.sync_store.commit(url, snapshot, plan, failed)
+        logger.info("Sync %s: %d novo(s), %d baixado(s), %s removido(s), %d item(ns) "
+                    "percorrido(s)%s", plan.title or url, len(plan.new),
+                    len(plan.new) - len(failed),
+                    len(plan.removed) if plan.removed is not None else '?',
+                    plan.walked, " (completo)" if plan.full else '')
+        return result
+
+    def pending_jobs(self) -> List[JournalJob]:
+        """Jobs interrompidos registrados no journal."""
+        return self.journal.pending() if self.journal is not None else []
+
+    def resume(self, job: JournalJob,
+               progress_cb: Optional[Callable[[Dict[str, Any]], None]] = None,
+               cancel_event: Optional[threading.Event] = None):
+        """Retoma um job do journal de onde parou."""
+        self.download(job.url, job.output_dir, progress_cb=progress_cb,
+                      cancel_event=cancel_event, **job.download_kwargs())
+
+    def _download_single(self, url: str, ydl_opts: Dict[str, Any], playlist_mode: bool,
+                         progress_cb: Optional[Callable[[Dict[str, Any]], None]],
+                         cancel_event: Optional[threading.Event],
+                         journal_key: Optional[str]):
+        """Um único YoutubeDL.download para a URL (vídeo ou playlist sequencial)."""
+        tracker: Dict[str, PlaylistProgress] = {}
+        throttle = ydl_opts.get('bandwidth_throttle')
+
         def _hook(d):
             if d.get('status') == 'downloading':
-                try:
-                    self._check_cancel()
-                except DownloadCancelled:
-                    raise
+                self._check_cancel(cancel_event)
+                if throttle is not None:
+                    throttle.account(d, cancel_event)
             if progress_cb:
                 # Envia dados extras de playlist se existirem
                 info_dict = d.get('info_dict') or {}
                 if 'playlist_index' in info_dict and info_dict.get('playlist_count'):
                     d['playlist_index'] = info_dict.get('playlist_index')
                     d['playlist_count'] = info_dict.get('playlist_count')
+                    if 'p' not in tracker:
+                        tracker['p'] = PlaylistProgress(d['playlist_count'])
+                    d['playlist_percent'] = tracker['p'].update(d['playlist_index'], d)
                 progress_cb(d)
 
+        ydl_opts = dict(ydl_opts, progress_hooks=[_hook])
+        cached = None
+        if not playlist_mode and self.info_cache is not None:
+            cached = self.info_cache.get(url, 'video')
+            if cached is not None and cached.get('_type', 'video') != 'video':
+                cached = None
+        metrics = ydl_opts.get('job_metrics')
+        with self._session(ydl_opts) as ydl:
+            self._attach_postprocessors(ydl, journal_key)
+            try:
+                if cached is not None:
+                    if metrics is not None:
+                        now = time.time()
+                        metrics.add_span(EXTRACTION, now, now, url=url, cached=True)
+                    # reaproveita a extração feita por list_formats (como --load-info-json)
+                    try:
+                        ydl.process_ie_result(copy.deepcopy(cached), download=True)
+                    except _download_error() as e:
+                        logger.info("Info em cache inválida (%s); extraindo novamente", e)
+                        self.info_cache.invalidate(url, 'video')
+                        ydl.download([url])
+                else:
+                    ydl.download([url])
+                report = ydl_opts['failure_report']
+                if cached is not None and report.unresolved():
+                    # URLs da extração em cache podem ter expirado
+                    self.info_cache.invalidate(url, 'video')
+                for failure in report.unresolved():
+                    self._check_cancel(cancel_event)
+                    ydl.deferred_postprocessing.extend(self._retry_failure(
+                        failure, report, ydl_opts, cancel_event, journal_key))
+                self._drain_postprocessing(getattr(ydl, 'deferred_postprocessing', None))
+                self._check_cancel(cancel_event)
+            except DownloadCancelled:
+                logger.info("Download cancelado")
+                self._drain_postprocessing(getattr(ydl, 'deferred_postprocessing', None), cancel=True)
+                raise
+
+    def _retry_failure(self, failure: EntryFailure, report: FailureReport,
+                       ydl_opts: Dict[str, Any], cancel_event: Optional[threading.Event],
+                       journal_key: Optional[str]) -> List[Any]:
+        """Repete o item da falha conforme a política da classe de erro até
+        dar certo (status 'recovered') ou esgotar as tentativas (continua
+        'failed'). Retorna os Futures do pipeline de pós-processamento."""
+        policies: RetryPolicies = ydl_opts['retry_policies']
+        metrics = ydl_opts.get('job_metrics')
+        event = cancel_event if cancel_event is not None else self._cancel_event
+        deferred: List[Any] = []
+        while failure.status == 'failed':
+            policy = policies.get(failure.error_class)
+            if failure.attempts > policy.retries:
+                break
+            delay = policies.delay(failure.error_class, failure.attempts)
+            if policy.failover:
+                failure.excluded_formats += [i for i in failure.format_ids
+                                             if i not in failure.excluded_formats]
+            logger.warning("%s (%s): nova tentativa %d de %d em %.1fs%s",
+                           failure.title or failure.url, failure.error_class, failure.attempts,
+                           policy.retries, delay,
+                           f" sem os formatos {', '.join(failure.excluded_formats)}"
+                           if failure.excluded_formats else '')
+            if event.wait(delay):
+                raise DownloadCancelled("Download cancelado pelo usuário")
+            report.count_retry()
+            if metrics is not None:
+                metrics.incr('entry_retries')
+            # sem ignoreerrors: a exceção da tentativa chega aqui
+            with self._session(dict(ydl_opts, ignoreerrors=False, noplaylist=True)) as ydl:
+                self._attach_postprocessors(ydl, journal_key)
+                try:
+                    info = ydl.extract_info(failure.url, download=False, process=False)
+                    if not isinstance(info, dict):
+                        raise _download_error()(f"sem resultado para {failure.url}")
+                    if failure.excluded_formats and info.get('formats'):
+                        info = dict(info, formats=[f for f in info['formats'] if str(
+                            f.get('format_id')) not in failure.excluded_formats])
+                    ydl.process_ie_result(info, download=True, extra_info=failure.extra_info)
+                except Exception as e:
+                    if classify(e) == CANCELLED:
+                        raise DownloadCancelled("Download cancelado pelo usuário")
+                    report.attempt_failed(failure, e, ydl.entry_context.get('format_id'))
+                else:
+                    report.resolve(failure, 'recovered')
+                    logger.info("%s: recuperado na tentativa %d", failure.title or failure.url,
+                                failure.attempts + 1)
+                deferred.extend(ydl.deferred_postprocessing)
+        return deferred
+
+    def _finish_report(self, report: FailureReport):
+        """Falhas que restaram após as novas tentativas: itens de playlist
+        são pulados; a do próprio vídeo do job vira exceção."""
+        fatal = None
+        for failure in report.unresolved():
+            if failure.is_entry:
+                report.resolve(failure, 'skipped')
+                logger.error("Item %s da playlist pulado (%s, %d tentativa(s)): %s",
+                             failure.playlist_index, failure.error_class, failure.attempts,
+                             failure.message)
+            else:
+                report.resolve(failure, 'fatal')
+                fatal = fatal or failure
+        if fatal is not None:
+            raise _download_error()(fatal.message)
+
+    def _drain_postprocessing(self, futures, cancel: bool = False):
+        """Aguarda os itens enviados ao pipeline (cancel: descarta os que
+        ainda não começaram)."""
+        if not futures:
+            return
+        for e in wait_postprocessing(futures, cancel=cancel):
+            # equivalente ao ignoreerrors do pós-processamento em linha
+            logger.error("Falha no pós-processamento: %s", e)
+
+    def _choose_audio_format(self, url: str, audio_format: str, ydl_opts: Dict[str, Any]):
+        """Fixa a trilha só de áudio escolhida (choose_audio) à frente do
+        seletor de _build_ydl_opts, que continua valendo para itens da
+        playlist com outros formatos."""
+        try:
+            audio = self.choose_audio(url, audio_format)
+        except Exception as e:
+            # o download refaz a extração, com as novas tentativas
+            logger.debug("Sem formatos para escolher o áudio de %s: %s", url, e)
+            return
+        if audio is None:
+            return
+        if ffmpeg_path() is None:
+            if audio_format == 'm4a' and audio.ext != 'm4a':
+                return  # sem troca de container
+            mode = 'sem extração'
+        else:
+            mode = ('cópia do stream' if get_audio_format(audio_format).copies(audio)
+                    else 'recodificação')
+        ydl_opts['format'] = f"{audio.itag}/{ydl_opts['format']}"
+        logger.info("Áudio: formato %s (%s, %s kbit/s) -> %s, %s", audio.itag, audio.acodec,
+                    audio.tbr or '?', audio_format, mode)
+
+    def _build_ydl_opts(self, output_dir: str, format_id: Optional[str], only_audio: bool,
+                        playlist_mode: bool, write_thumbnail: bool, prefer_mp4: bool,
+                        ensure_audio: bool, temp_dir: Optional[str] = None,
+                        audio_format: str = 'best') -> Dict[str, Any]:
+        """Monta as opções do YoutubeDL (sem hooks de progresso). Com
+        temp_dir, .part e arquivos intermediários (partes do merge) ficam nele
+        e só o arquivo pronto vai para output_dir."""
         postprocessors = []
         ydl_format = format_id or 'best'
-        ffmpeg_present = shutil.which('ffmpeg') is not None
+        ffmpeg = ffmpeg_path()
+        ffmpeg_present = ffmpeg is not None
         merging_attempted = False
         if only_audio:
-            if not ffmpeg_present:
-                raise RuntimeError("ffmpeg é necessário para extrair áudio em MP3. Instale o ffmpeg e tente novamente.")
-            ydl_format = 'bestaudio/best'
-            postprocessors.append({
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            })
+            target = get_audio_format(audio_format)
+            if target.name == 'mp3':
+                # recodificação pedida explicitamente: o único caminho que exige encoder
+                if not ffmpeg_present:
+                    raise RuntimeError("ffmpeg é necessário para extrair áudio em MP3. Instale o ffmpeg e tente novamente.")
+                if not probe_ffmpeg().has_encoder('libmp3lame'):
+                    raise RuntimeError("O ffmpeg instalado não tem o encoder MP3 (libmp3lame).")
+            ydl_format = target.spec()
+            if ffmpeg_present:
+                # cópia do stream quando o codec da trilha cabe no container
+                extract = {'key': 'FFmpegExtractAudio', 'preferredcodec': target.codec}
+                if target.name == 'mp3':
+                    extract['preferredquality'] = '192'
+                postprocessors.append(extract)
+            elif target.name == 'm4a':
+                # sem ffmpeg não há troca de container: só trilhas já em m4a
+                ydl_format = 'bestaudio[ext=m4a]'
+            elif target.name != 'best':
+                raise RuntimeError(f"ffmpeg é necessário para extrair áudio em {target.name}. "
+                                   "Instale o ffmpeg ou use o formato original (best).")
+            else:
+                # sem ffmpeg: a trilha só de áudio é gravada como veio
+                ydl_format = 'bestaudio[ext=m4a]/bestaudio/best'
+                logger.info("ffmpeg ausente: áudio gravado no container original, sem extração.")
         elif ensure_audio:
             if format_id:
                 if ffmpeg_present:
@@ -169,34 +768,201 @@ class VideoDownloader:
             postprocessors.append({'key': 'EmbedThumbnail'})
             postprocessors.append({'key': 'FFmpegMetadata'})
             postprocessors.append({'key': 'FFmpegThumbnailsConvertor', 'format': 'jpg'})
-        outtmpl = f'{output_dir}/%(title)s.%(ext)s'
+        outtmpl = '%(title)s.%(ext)s'
         if playlist_mode:
             # prefixo com índice para evitar overwrite e manter ordem
-            outtmpl = f'{output_dir}/%(playlist_index)03d - %(title)s.%(ext)s'
+            outtmpl = '%(playlist_index)03d - %(title)s.%(ext)s'
+        if not temp_dir:
+            outtmpl = f'{output_dir}/{outtmpl}'
 
         ydl_opts = {
             'format': ydl_format,
             'outtmpl': outtmpl,
-            'progress_hooks': [_hook],
             'postprocessors': postprocessors,
             'quiet': True,
             'no_warnings': True,
+            'noprogress': True,  # progresso vai só para os hooks (evita saída intercalada)
             'ignoreerrors': True,
             'noplaylist': False if playlist_mode else True,
             'writethumbnail': write_thumbnail,
             'overwrites': False,  # prevenção overwrite básica
+            'continuedl': True,  # retoma .part existente via HTTP Range
             'prefer_ffmpeg': True,
         }
+        if ffmpeg_present:
+            # caminho já resolvido: o yt-dlp não refaz a busca no PATH a cada item
+            ydl_opts['ffmpeg_location'] = ffmpeg
+        if temp_dir:
+            # o yt-dlp move o arquivo pronto (rename no mesmo sistema de arquivos)
+            ydl_opts['paths'] = {'home': output_dir, 'temp': temp_dir}
         if merging_attempted:
             # Força container popular quando merge for necessário para maximizar compatibilidade
             ydl_opts['merge_output_format'] = 'mp4'
             # Otimiza cabeçalho para início rápido em alguns players
             ydl_opts['postprocessor_args'] = ['-movflags', '+faststart']
-        with YoutubeDL(ydl_opts) as ydl:  # type: ignore
+        return ydl_opts
+
+    def _session(self, ydl_opts: Dict[str, Any], tuned: bool = True):
+        """YoutubeDL para ydl_opts, usado como gerenciador de contexto:
+        emprestado do pool de sessões ou novo (tuned=False: a classe do
+        yt-dlp, para extrações sem download)."""
+        factory = _ydl_class(ydl_opts) if tuned else _youtubedl()
+        if self.sessions is None:
+            return factory(ydl_opts)
+        return self.sessions.lease(factory, ydl_opts)
+
+    def _attach_postprocessors(self, ydl, journal_key: Optional[str] = None):
+        if self.archive is not None:
+            ydl.add_post_processor(archive_postprocessor(self.archive), when='after_move')
+        if journal_key and self.journal is not None:
+            ydl.add_post_processor(journal_postprocessor(self.journal, journal_key), when='after_move')
+
+    def _archived(self, entry: Dict[str, Any]) -> bool:
+        extractor = entry.get('ie_key') or entry.get('extractor_key')
+        return bool(extractor and entry.get('id') and self.archive.contains(extractor, entry['id']))
+
+    def _flat_playlist(self, url: str) -> List[Dict[str, Any]]:
+        """Resolve a playlist sem extrair cada item (extract_flat).
+        Retorna as entradas na ordem da playlist, cada uma com playlist_index."""
+        opts = {'extract_flat': 'in_playlist', 'quiet': True, 'no_warnings': True,
+                'skip_download': True}
+        with self._session(opts, tuned=False) as ydl:
+            info = self._extract_info(ydl, url, 'flat')
+        if not isinstance(info, dict):
+            return []
+        if not info.get('entries'):
+            # não é playlist: trata como playlist de um item
+            return [{'url': info.get('webpage_url') or url, 'playlist_index': 1}]
+        entries = []
+        for pos, entry in enumerate(info.get('entries') or [], start=1):
+            if not isinstance(entry, dict):
+                continue
+            entry = dict(entry)
+            entry.setdefault('playlist_index', pos)
+            entry.setdefault('playlist', info.get('title') or info.get('id'))
+            entry.setdefault('playlist_id', info.get('id'))
+            entries.append(entry)
+        return entries
+
+    def _download_playlist_parallel(self, url: str, ydl_opts: Dict[str, Any],
+                                    workers: int,
+                                    progress_cb: Optional[Callable[[Dict[str, Any]], None]],
+                                    cancel_event: Optional[threading.Event],
+                                    journal_key: Optional[str] = None,
+                                    skip_ids: Optional[Set[str]] = None,
+                                    entries: Optional[List[Dict[str, Any]]] = None,
+                                    total: Optional[int] = None):
+        """Itens da playlist em paralelo. entries: itens já resolvidos (sync:
+        só os novos, com playlist_index da fonte); total é o tamanho da fonte
+        em playlist_count."""
+        metrics = ydl_opts.get('job_metrics')
+        if entries is None and metrics is not None:
+            with metrics.span(EXTRACTION, url=url, flat=True):
+                entries = self._flat_playlist(url)
+        elif entries is None:
+            entries = self._flat_playlist(url)
+        count = total or len(entries)
+        # o progresso agregado conta só os itens deste download
+        tracker = PlaylistProgress(len(entries) if total else count)
+        if skip_ids:
+            # itens concluídos antes da interrupção (journal)
+            entries = [e for e in entries if str(e.get('id')) not in skip_ids]
+        if ydl_opts.get('download_archive') is not None:
+            # descarta itens já baixados sem criar YoutubeDL nem extrair
+            entries = [e for e in entries if not self._archived(e)]
+        if not entries:
+            return
+        report: FailureReport = ydl_opts['failure_report']
+        cb_lock = threading.Lock()
+        deferred: List[Any] = []
+        throttle = ydl_opts.get('bandwidth_throttle')
+
+        def _run_entry(entry: Dict[str, Any]):
+            self._check_cancel(cancel_event)
+            index = entry['playlist_index']
+            if not (entry.get('url') or entry.get('webpage_url')):
+                return
+
+            def _hook(d):
+                if d.get('status') == 'downloading':
+                    self._check_cancel(cancel_event)
+                    if throttle is not None:
+                        throttle.account(d, cancel_event)
+                if progress_cb:
+                    d['playlist_index'] = index
+                    d['playlist_count'] = count
+                    d['playlist_percent'] = tracker.update(index, d)
+                    with cb_lock:
+                        progress_cb(d)
+
+            entry_opts = dict(ydl_opts)
+            entry_opts['noplaylist'] = True
+            entry_opts['progress_hooks'] = [_hook]
+            # falhas deste item; as novas tentativas rodam neste worker
+            entry_opts['failure_report'] = entry_report = FailureReport()
+            # extra_info mantém %(playlist_index)03d do outtmpl igual ao modo sequencial
+            extra = {'playlist': entry.get('playlist'), 'playlist_id': entry.get('playlist_id'),
+                     'playlist_index': index, 'playlist_count': count}
+            with self._session(entry_opts) as ydl:
+                self._attach_postprocessors(ydl, journal_key)
+                ydl.process_ie_result(dict(entry), download=True, extra_info=extra)
+                # o worker segue para o próximo item; o pipeline é aguardado no fim
+                deferred.extend(getattr(ydl, 'deferred_postprocessing', None) or [])
+            for failure in entry_report.unresolved():
+                report.add(failure)
+                self._check_cancel(cancel_event)
+                deferred.extend(self._retry_failure(failure, report, entry_opts, cancel_event,
+                                                    journal_key))
+            self._check_cancel(cancel_event)
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(entries))) as pool:
+            futures = {pool.submit(_run_entry, e): e for e in entries}
             try:
-                ydl.download([url])
+                for fut in as_completed(futures):
+                    try:
+                        fut.result()
+                    except DownloadCancelled:
+                        raise
+                    except Exception as e:
+                        # erro fora do YoutubeDL do item: entra no relatório
+                        logger.error("Falha em item da playlist: %s", e)
+                        entry = futures[fut]
+                        failure = report.record({'url': entry.get('url'), 'id': entry.get('id'),
+                                                 'title': entry.get('title'),
+                                                 'playlist_index': entry.get('playlist_index')}, e)
+                        if failure is not None:
+                            report.resolve(failure, 'skipped')
             except DownloadCancelled:
                 logger.info("Download cancelado")
+                for fut in futures:
+                    fut.cancel()
+                self._drain_postprocessing(deferred, cancel=True)
                 raise
+        self._drain_postprocessing(deferred)
+
+
+def _ydl_class(ydl_opts: Dict[str, Any]):
+    """Classe do YoutubeDL para download; com download segmentado, fragmentos
+    concorrentes, pipeline de pós-processamento, métricas, relatório de
+    falhas ou reserva de espaço usa a variante do videodl."""
+    if ((ydl_opts.get('http_connections') or 1) > 1
+            or (ydl_opts.get('concurrent_fragment_downloads') or 1) > 1
+            or ydl_opts.get('postprocess_pipeline') is not None
+            or ydl_opts.get('job_metrics') is not None
+            or ydl_opts.get('failure_report') is not None
+            or ydl_opts.get('storage_reservation') is not None):
+        return tuned_youtubedl()
+    return _youtubedl()
+
+
+def _skip_ids_filter(skip_ids: Set[str]):
+    """match_filter do yt-dlp que pula itens pelo id (antes da extração quando
+    a playlist fornece o id)."""
+    def _filter(info, *, incomplete=False):
+        if str(info.get('id')) in skip_ids:
+            return f"{info.get('id')} já concluído (journal)"
+        return None
+    return _filter
+
 
 __all__ = ["VideoDownloader", "FormatInfo", "DownloadCancelled"]
@@ -0,0 +1,106 @@
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+logger = logging.getLogger(__name__)
+
+# tempo máximo de cada chamada do ffmpeg na sondagem
+PROBE_TIMEOUT = 10.0
+
+_VERSION_RE = re.compile(r'^ffmpeg version (\S+)', re.MULTILINE)
+# linhas de `ffmpeg -encoders`: " V....D libx264   descrição"
+_ENCODER_RE = re.compile(r'^\s*[VAS][F.][S.][X.][B.][D.]\s+(\w\S*)', re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class FFmpegInfo:
+    """O que o ffmpeg do PATH oferece.
+
+    version e encoders ficam vazios se a sondagem falhar (binário quebrado,
+    timeout); path continua valendo e o yt-dlp tenta usá-lo mesmo assim.
+    """
+    path: Optional[str]
+    version: Optional[str] = None
+    encoders: FrozenSet[str] = frozenset()
+    ffprobe: Optional[str] = None
+
+    @property
+    def available(self) -> bool:
+        return self.path is not None
+
+    def has_encoder(self, name: str) -> bool:
+        """True se o encoder existe ou se não foi possível listar os encoders."""
+        return not self.encoders or name in self.encoders
+
+
+# _lock protege só os valores (rápido); _probe_lock serializa a sondagem,
+# que pode levar segundos, sem bloquear ffmpeg_path()
+_lock = threading.Lock()
+_probe_lock = threading.Lock()
+_UNSET = object()
+_path = _UNSET
+_info: Optional[FFmpegInfo] = None
+
+
+def ffmpeg_path() -> Optional[str]:
+    """Caminho do ffmpeg no PATH; a busca roda uma vez por processo."""
+    global _path
+    with _lock:
+        if _path is _UNSET:
+            _path = shutil.which('ffmpeg')
+        return _path  # type: ignore[return-value]
+
+
+def probe_ffmpeg() -> FFmpegInfo:
+    """Caminho, versão e encoders do ffmpeg, sondados uma vez por processo
+    (duas execuções do ffmpeg; chame fora da thread da interface)."""
+    global _info
+    with _lock:
+        if _info is not None:
+            return _info
+    with _probe_lock:
+        with _lock:
+            if _info is not None:  # sondado por outra thread enquanto esperávamos
+                return _info
+        info = _probe(ffmpeg_path())
+        with _lock:
+            _info = info
+            return info
+
+
+def clear_ffmpeg_cache():
+    """Esquece o resultado (ex.: ffmpeg instalado com o app aberto)."""
+    global _path, _info
+    with _lock:
+        _path, _info = _UNSET, None
+
+
+def _probe(path: Optional[str]) -> FFmpegInfo:
+    if path is None:
+        return FFmpegInfo(None)
+    ffprobe = os.path.join(os.path.dirname(path), os.path.basename(path).replace('ffmpeg', 'ffprobe'))
+    if not os.path.exists(ffprobe):
+        ffprobe = shutil.which('ffprobe')
+    version_out = _run(path, '-version')
+    match = _VERSION_RE.search(version_out)
+    encoders = frozenset(_ENCODER_RE.findall(_run(path, '-hide_banner', '-encoders')))
+    info = FFmpegInfo(path, match.group(1) if match else None, encoders, ffprobe)
+    logger.debug("ffmpeg %s em %s (%d encoders)", info.version, path, len(encoders))
+    return info
+
+
+def _run(path: str, *args: str) -> str:
+    try:
+        return subprocess.run([path, *args], capture_output=True, text=True,
+                              timeout=PROBE_TIMEOUT, errors='replace').stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning("Falha ao consultar %s %s: %s", path, ' '.join(args), e)
+        return ''
+
+
+__all__ = ["FFmpegInfo", "ffmpeg_path", "probe_ffmpeg", "clear_ffmpeg_cache"]
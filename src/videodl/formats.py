@@ -0,0 +1,341 @@
+import logging
+import threading
+from dataclasses import astuple, dataclass, replace
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:  # downloader importa este módulo
+    from .downloader import FormatInfo
+
+logger = logging.getLogger(__name__)
+
+OBJECTIVES = ('quality', 'fastest', 'smallest')
+
+
+@dataclass(frozen=True)
+class FormatProfile:
+    """Critérios declarativos de escolha de formato.
+
+    max_height / max_bytes são limites (formatos sem tamanho conhecido passam
+    no orçamento, mas perdem para os que têm tamanho estimado). video_codecs e
+    audio_codecs são prefixos em ordem de preferência (ex.: ('avc1', 'vp9')).
+    objective: 'quality' (maior resolução/bitrate), 'smallest' (menos bytes) ou
+    'fastest' (menor tempo estimado: bytes / bandwidth + custo do merge).
+    Com prefer_progressive, um formato com vídeo e áudio juntos vence a
+    combinação vídeo+áudio quando é comparável (altura >= progressive_tolerance
+    x a da melhor combinação): evita o merge com ffmpeg. allow_merge=False
+    aceita só formatos progressivos (ou só áudio).
+    """
+    name: str = 'best'
+    max_height: Optional[int] = None
+    max_bytes: Optional[int] = None
+    video_codecs: Tuple[str, ...] = ()
+    audio_codecs: Tuple[str, ...] = ()
+    prefer_ext: Optional[str] = 'mp4'
+    objective: str = 'quality'
+    allow_merge: bool = True
+    prefer_progressive: bool = True
+    progressive_tolerance: float = 0.75
+    bandwidth: float = 2_000_000.0  # bytes/s estimados para 'fastest'
+    merge_rate: float = 40_000_000.0  # bytes/s de remux no merge
+
+    def __post_init__(self):
+        if self.objective not in OBJECTIVES:
+            raise ValueError(f"objective inválido: {self.objective!r} (use {', '.join(OBJECTIVES)})")
+
+    def fallback_spec(self) -> str:
+        """Seletor do yt-dlp equivalente ao perfil, usado nos itens de uma
+        playlist em que os format_ids escolhidos no primeiro não existem."""
+        limits = f'[height<=?{self.max_height}]' if self.max_height else ''
+        if self.max_bytes:
+            limits += f'[filesize<?{self.max_bytes}]'
+        best = 'w' if self.objective != 'quality' else 'b'
+        progressive = f'{best}{limits}[vcodec!=none][acodec!=none]'
+        merged = f'{best}v*{limits}+{best}a'
+        if not self.allow_merge:
+            specs = [progressive, f'{best}{limits}']
+        elif self.prefer_progressive and self.objective != 'quality':
+            specs = [progressive, merged]
+        else:
+            specs = [merged, f'{best}{limits}']
+        return '/'.join(specs + ['best'])
+
+
+# perfis prontos (CLI --profile, GUI, lote JSONL)
+PROFILES: Dict[str, FormatProfile] = {p.name: p for p in (
+    FormatProfile('best'),
+    FormatProfile('1080p', max_height=1080, video_codecs=('avc1', 'vp9', 'av01'),
+                  audio_codecs=('mp4a', 'opus')),
+    FormatProfile('720p', max_height=720, video_codecs=('avc1', 'vp9', 'av01'),
+                  audio_codecs=('mp4a', 'opus')),
+    FormatProfile('fastest', max_height=1080, objective='fastest'),
+    FormatProfile('data-saver', max_height=480, objective='smallest'),
+    FormatProfile('no-merge', allow_merge=False),
+)}
+
+
+def get_profile(profile: Union[str, FormatProfile, None]) -> Optional[FormatProfile]:
+    if profile is None or isinstance(profile, FormatProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"perfil de formato desconhecido: {profile!r} "
+                         f"(disponíveis: {', '.join(PROFILES)})") from None
+
+
+@dataclass
+class FormatChoice:
+    """Formato (ou combinação vídeo+áudio) escolhido por um perfil."""
+    video: 'FormatInfo'  # ou o único formato (progressivo / só áudio)
+    audio: Optional['FormatInfo']  # com merge
+    expected_bytes: Optional[int]
+    estimated_seconds: Optional[float]
+    profile: FormatProfile
+
+    @property
+    def needs_merge(self) -> bool:
+        return self.audio is not None
+
+    @property
+    def format_id(self) -> str:
+        return '+'.join(f.itag for f in (self.video, self.audio) if f is not None)
+
+    @property
+    def format_spec(self) -> str:
+        """Seletor para o yt-dlp: a combinação escolhida e, para itens de
+        playlist com outros formatos, o equivalente declarativo do perfil."""
+        return f'{self.format_id}/{self.profile.fallback_spec()}'
+
+    @property
+    def height(self) -> int:
+        return _height(self.video) if _has_video(self.video) else 0
+
+
+def _height(f: 'FormatInfo') -> int:
+    if f.height:
+        return int(f.height)
+    res = (f.resolution or '').lower()
+    if 'x' in res:
+        res = res.split('x')[-1]
+    res = res.rstrip('p')
+    return int(res) if res.isdigit() else 0
+
+
+def _has_video(f: 'FormatInfo') -> bool:
+    return f.vcodec != 'none' or (f.acodec == 'none' and bool(_height(f)))
+
+
+def _has_audio(f: 'FormatInfo') -> bool:
+    return f.acodec != 'none'
+
+
+def _progressive(f: 'FormatInfo') -> bool:
+    # sem codecs informados (links diretos): o yt-dlp trata como vídeo com áudio
+    return (f.vcodec != 'none' and f.acodec != 'none') or (f.vcodec == 'none' and f.acodec == 'none')
+
+
+def expected_bytes(f: 'FormatInfo') -> Optional[int]:
+    """Tamanho informado, aproximado ou estimado por bitrate x duração."""
+    if f.filesize:
+        return int(f.filesize)
+    if f.tbr and f.duration:
+        return int(f.tbr * 1000 / 8 * f.duration)
+    return None
+
+
+def _codec_rank(codec: str, preference: Sequence[str]) -> int:
+    for i, prefix in enumerate(preference):
+        if codec.startswith(prefix):
+            return len(preference) - i
+    return 0
+
+
+class FormatSelector:
+    """Ordena formatos segundo um FormatProfile.
+
+    rank() gera as candidatas (progressivos, combinações vídeo+melhor áudio
+    e só áudio quando não há vídeo), aplica os limites e ordena pelo
+    objetivo. O resultado é memorizado pelo conjunto de formatos: itens de
+    uma playlist com a mesma grade de formatos (ex.: itags do YouTube) não
+    são reavaliados. Em download() a escolha do primeiro item vira um
+    seletor (format_spec) aplicado pelo yt-dlp a todos os itens.
+    """
+
+    MEMO_SIZE = 64
+
+    def __init__(self, profile: Union[str, FormatProfile, None] = None):
+        self.profile = get_profile(profile) or PROFILES['best']
+        self._memo: Dict[tuple, List[FormatChoice]] = {}
+        self._lock = threading.Lock()
+
+    def select(self, formats: Sequence['FormatInfo']) -> Optional[FormatChoice]:
+        ranked = self.rank(formats)
+        return ranked[0] if ranked else None
+
+    def rank(self, formats: Sequence['FormatInfo']) -> List[FormatChoice]:
+        key = tuple(astuple(f) for f in formats)
+        with self._lock:
+            cached = self._memo.get(key)
+        if cached is None:
+            cached = self._rank(formats)
+            with self._lock:
+                if len(self._memo) >= self.MEMO_SIZE:
+                    self._memo.clear()
+                self._memo[key] = cached
+        return list(cached)
+
+    def sort_formats(self, formats: Sequence['FormatInfo']) -> List['FormatInfo']:
+        """Formatos individuais do mais ao menos adequado ao perfil (lista
+        da GUI): os que fazem parte das melhores combinações vêm primeiro."""
+        order: Dict[str, int] = {}
+        for pos, choice in enumerate(self.rank(formats)):
+            for f in (choice.video, choice.audio):
+                if f is not None:
+                    order.setdefault(f.itag, pos)
+        return sorted(formats, key=lambda f: (order.get(f.itag, len(order)), -_height(f)))
+
+    # ---------------- Internos -----------------
+    def _rank(self, formats: Sequence['FormatInfo']) -> List[FormatChoice]:
+        p = self.profile
+        usable = [f for f in formats if f.ext not in ('mhtml', 'none')
+                  and not (f.protocol or '').startswith('mhtml')]
+        if p.max_height:
+            usable = [f for f in usable if not _has_video(f) or _height(f) <= p.max_height]
+        videos = [f for f in usable if _has_video(f) and not _has_audio(f)]
+        audios = sorted((f for f in usable if _has_audio(f) and not _has_video(f)),
+                        key=self._audio_key, reverse=True)
+        candidates: List[FormatChoice] = [self._choice(f, None) for f in usable if _progressive(f)]
+        if p.allow_merge and audios:
+            for video in videos:
+                candidates.append(self._choice(video, self._audio_for(video, audios)))
+        if not candidates:
+            # só áudio (ou só vídeo) disponível
+            candidates = [self._choice(f, None) for f in (audios or videos)]
+        if p.max_bytes:
+            candidates = [c for c in candidates
+                          if c.expected_bytes is None or c.expected_bytes <= p.max_bytes]
+        candidates.sort(key=self._choice_key)
+        if p.prefer_progressive and p.objective == 'quality' and candidates:
+            candidates = self._promote_progressive(candidates)
+        return candidates
+
+    def _audio_for(self, video: 'FormatInfo', audios: List['FormatInfo']) -> 'FormatInfo':
+        # mesmo container evita remux para outro formato (mp4+m4a, webm+webm)
+        compatible = {'mp4': ('m4a', 'mp4'), 'webm': ('webm',)}.get(video.ext, ())
+        for audio in audios:
+            if audio.ext in compatible:
+                return audio
+        return audios[0]
+
+    def _choice(self, video: 'FormatInfo', audio: Optional['FormatInfo']) -> FormatChoice:
+        sizes = [expected_bytes(f) for f in (video, audio) if f is not None]
+        total = sum(sizes) if all(s is not None for s in sizes) else None
+        seconds = None
+        if total is not None:
+            seconds = total / self.profile.bandwidth
+            if audio is not None:
+                seconds += total / self.profile.merge_rate
+        return FormatChoice(video=video, audio=audio, expected_bytes=total,
+                            estimated_seconds=seconds, profile=self.profile)
+
+    def _audio_key(self, f: 'FormatInfo'):
+        return (_codec_rank(f.acodec, self.profile.audio_codecs), f.tbr or 0,
+                expected_bytes(f) or 0)
+
+    def _choice_key(self, c: FormatChoice):
+        p = self.profile
+        main = c.video
+        codec = _codec_rank(main.vcodec, p.video_codecs)
+        ext = 1 if p.prefer_ext and main.ext == p.prefer_ext else 0
+        unknown = c.expected_bytes is None
+        if p.objective == 'quality':
+            return (-c.height, -codec, -(main.fps or 0), -ext, -(main.tbr or 0), c.needs_merge)
+        if p.objective == 'smallest':
+            return (unknown, c.expected_bytes or 0, -c.height, -codec)
+        # fastest: tempo estimado de download + merge
+        return (unknown, c.estimated_seconds or 0.0, -c.height, -codec)
+
+    def _promote_progressive(self, ranked: List[FormatChoice]) -> List[FormatChoice]:
+        best = ranked[0]
+        if not best.needs_merge:
+            return ranked
+        for i, c in enumerate(ranked):
+            if not c.needs_merge and _has_video(c.video) \
+                    and c.height >= best.height * self.profile.progressive_tolerance:
+                logger.debug("Progressivo %s (%sp) comparável a %s (%sp): sem merge",
+                             c.format_id, c.height, best.format_id, best.height)
+                return [c] + ranked[:i] + ranked[i + 1:]
+        return ranked
+
+
+def without_merge(profile: FormatProfile) -> FormatProfile:
+    """Mesmo perfil aceitando só formatos progressivos (ffmpeg ausente)."""
+    return replace(profile, allow_merge=False) if profile.allow_merge else profile
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """Formato final da extração de áudio (only_audio).
+
+    codec é o preferredcodec do FFmpegExtractAudio; codecs são os prefixos de
+    acodec (ou, sem codec informado, a extensão ext) copiados para o
+    container sem recodificar. Sem codecs ('best') vale o codec da fonte.
+    """
+    name: str
+    codec: str
+    ext: Optional[str] = None
+    codecs: Tuple[str, ...] = ()
+
+    def copies(self, f: 'FormatInfo') -> bool:
+        """True se extrair f para este formato é só cópia do stream."""
+        return not self.codecs or self._rank(f) > 0
+
+    def spec(self) -> str:
+        """Seletor do yt-dlp: primeiro as trilhas só de áudio copiáveis para
+        o container, depois a melhor trilha qualquer."""
+        specs = [f'bestaudio[acodec^={c}]' for c in self.codecs]
+        return '/'.join(specs + ['bestaudio', 'best'])
+
+    def _rank(self, f: 'FormatInfo') -> int:
+        if f.acodec != 'none':
+            return _codec_rank(f.acodec, self.codecs)
+        return 1 if self.ext and f.ext == self.ext else 0  # links diretos: só a extensão
+
+
+AUDIO_FORMATS: Dict[str, AudioFormat] = {a.name: a for a in (
+    AudioFormat('best', 'best'),  # aac -> m4a, opus -> opus, vorbis -> ogg
+    AudioFormat('m4a', 'm4a', 'm4a', ('mp4a', 'aac')),
+    AudioFormat('opus', 'opus', 'opus', ('opus',)),
+    AudioFormat('ogg', 'vorbis', 'ogg', ('vorbis',)),
+    AudioFormat('mp3', 'mp3', 'mp3', ('mp3',)),  # fora de fontes mp3, recodifica (libmp3lame)
+)}
+
+
+def get_audio_format(audio_format: Union[str, AudioFormat]) -> AudioFormat:
+    if isinstance(audio_format, AudioFormat):
+        return audio_format
+    try:
+        return AUDIO_FORMATS[audio_format]
+    except KeyError:
+        raise ValueError(f"formato de áudio desconhecido: {audio_format!r} "
+                         f"(disponíveis: {', '.join(AUDIO_FORMATS)})") from None
+
+
+def _audio_only(f: 'FormatInfo') -> bool:
+    # links diretos de áudio chegam sem codec, marcados só pela resolução
+    return f.vcodec == 'none' and (f.acodec != 'none' or f.resolution == 'audio only') \
+        and f.ext not in ('mhtml', 'none')
+
+
+def select_audio(formats: Sequence['FormatInfo'], audio_format: Union[str, AudioFormat] = 'best'
+                 ) -> Optional['FormatInfo']:
+    """Melhor formato só de áudio para a extração: os que viram o container
+    pedido por cópia do stream vencem; entre eles, o maior bitrate. None se
+    não houver trilha só de áudio (a extração usa o formato progressivo)."""
+    target = get_audio_format(audio_format)
+    return max((f for f in formats if _audio_only(f)),
+               key=lambda f: (target._rank(f), f.tbr or 0, expected_bytes(f) or 0), default=None)
+
+
+__all__ = ["FormatProfile", "FormatChoice", "FormatSelector", "PROFILES", "get_profile",
+           "expected_bytes", "AudioFormat", "AUDIO_FORMATS", "get_audio_format", "select_audio"]
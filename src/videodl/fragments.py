@@ -0,0 +1,186 @@
+import collections
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FragmentTiming:
+    index: int
+    elapsed: float  # do início do pedido até o fragmento estar em disco
+    bytes: int
+    retries: int = 0
+
+
+def fragment_stats(timings: List[FragmentTiming]) -> Dict[str, Any]:
+    """Resumo das latências por fragmento (para logs e benchmarks)."""
+    if not timings:
+        return {'fragments': 0}
+    elapsed = sorted(t.elapsed for t in timings)
+    return {
+        'fragments': len(timings),
+        'bytes': sum(t.bytes for t in timings),
+        'retries': sum(t.retries for t in timings),
+        'mean': sum(elapsed) / len(elapsed),
+        'p50': elapsed[len(elapsed) // 2],
+        'p95': elapsed[min(int(len(elapsed) * 0.95), len(elapsed) - 1)],
+        'max': elapsed[-1],
+    }
+
+
+def backoff_sleep(base: float = 0.5, cap: float = 10.0):
+    """Função para retry_sleep_functions do yt-dlp (backoff exponencial)."""
+    def _sleep(n):
+        return min(base * 2 ** n, cap)
+    return _sleep
+
+
+@functools.lru_cache(maxsize=None)
+def windowed_fragment_fd(base):
+    """Subclasse de um FragmentFD do yt-dlp (HlsFD/DashSegmentsFD) que baixa
+    fragmentos com concurrent_fragment_downloads workers numa janela limitada.
+
+    O modo concorrente do yt-dlp enfileira todos os fragmentos de uma vez;
+    aqui no máximo params['fragment_buffer'] fragmentos (padrão: 2x workers)
+    ficam pendentes entre o pedido e a escrita em ordem no arquivo final, o que
+    limita memória/disco usados por fragmentos adiantados em VODs com milhares
+    de fragmentos. Cada progresso emitido carrega em 'fragment_timings' os
+    fragmentos concluídos desde o anterior (índice, tempo, bytes, retentativas).
+    """
+    from yt_dlp.networking.exceptions import HTTPError, IncompleteRead  # type: ignore
+    from yt_dlp.utils import DownloadError, RetryManager  # type: ignore
+    from yt_dlp.utils.networking import HTTPHeaderDict  # type: ignore
+
+    class WindowedFragmentFD(base):
+        def _hook_progress(self, status, info_dict):
+            pending = getattr(self, '_pending_timings', None)
+            # o yt-dlp reaproveita o mesmo dict de estado entre eventos
+            status.pop('fragment_timings', None)
+            if pending:
+                with self._timings_lock:
+                    status['fragment_timings'] = [asdict(t) for t in pending]
+                    pending.clear()
+            super()._hook_progress(status, info_dict)
+
+        def download_and_append_fragments(
+                self, ctx, fragments, info_dict, *, is_fatal=(lambda idx: False),
+                pack_func=(lambda content, idx: content), finish_func=None,
+                tpe=None, interrupt_trigger=(True, )):
+            workers = int(self.params.get('concurrent_fragment_downloads') or 1)
+            if workers <= 1 or tpe is not None or ctx.get('max_progress', 1) > 1:
+                # sequencial ou vários formatos no mesmo FD: caminho do yt-dlp
+                return super().download_and_append_fragments(
+                    ctx, fragments, info_dict, is_fatal=is_fatal, pack_func=pack_func,
+                    finish_func=finish_func, tpe=tpe, interrupt_trigger=interrupt_trigger)
+
+            if not self.params.get('skip_unavailable_fragments', True):
+                is_fatal = lambda _: True  # noqa: E731
+            window_size = max(int(self.params.get('fragment_buffer') or workers * 2), workers)
+            decrypt_fragment = self.decrypter(info_dict)
+            self._timings_lock = threading.Lock()
+            self._pending_timings: List[FragmentTiming] = []
+            timings: List[FragmentTiming] = []
+
+            def _fetch(fragment):
+                frag_ctx = ctx.copy()
+                started = time.monotonic()
+                retries = self._fetch_fragment(frag_ctx, fragment, info_dict, is_fatal)
+                return (fragment, frag_ctx.get('fragment_filename_sanitized'),
+                        time.monotonic() - started, retries)
+
+            source = iter(fragments)
+            window: collections.deque = collections.deque()
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fragment')
+
+            def _fill():
+                while len(window) < window_size and interrupt_trigger[0]:
+                    fragment = next(source, None)
+                    if fragment is None:
+                        return
+                    window.append(pool.submit(_fetch, fragment))
+
+            try:
+                _fill()
+                while window:
+                    fragment, frag_filename, elapsed, retries = window.popleft().result()
+                    _fill()
+                    frag_index = fragment['frag_index']
+                    ctx.update({'fragment_filename_sanitized': frag_filename,
+                                'fragment_index': frag_index})
+                    content = self._read_fragment(ctx)
+                    timing = FragmentTiming(frag_index, elapsed, len(content or b''), retries)
+                    timings.append(timing)
+                    with self._timings_lock:
+                        self._pending_timings.append(timing)
+                    if not self._append_windowed(ctx, decrypt_fragment(fragment, content),
+                                                 frag_index, is_fatal, pack_func):
+                        return False
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            finally:
+                pool.shutdown(wait=True)
+
+            logger.debug("Fragmentos de %s: %s", ctx.get('filename'), fragment_stats(timings))
+            if finish_func is not None:
+                ctx['dest_stream'].write(finish_func())
+                ctx['dest_stream'].flush()
+            return self._finish_frag_download(ctx, info_dict)
+
+        def _fetch_fragment(self, ctx, fragment, info_dict, is_fatal) -> int:
+            """Baixa um fragmento para o arquivo -FragN (com retentativas do
+            yt-dlp: fragment_retries e retry_sleep_functions['fragment']).
+            Retorna quantas retentativas foram necessárias."""
+            frag_index = ctx['fragment_index'] = fragment['frag_index']
+            ctx['last_error'] = None
+            headers = HTTPHeaderDict(info_dict.get('http_headers'))
+            byte_range = fragment.get('byte_range')
+            if byte_range:
+                headers['Range'] = 'bytes=%d-%d' % (byte_range['start'], byte_range['end'] - 1)
+            # o primeiro fragmento nunca é pulado
+            fatal = is_fatal(fragment.get('index') or (frag_index - 1))
+            attempts = [0]
+
+            def error_callback(err, count, retries):
+                attempts[0] = count
+                if fatal and count > retries:
+                    ctx['dest_stream'].close()
+                self.report_retry(err, count, retries, frag_index, fatal)
+                ctx['last_error'] = err
+
+            for retry in RetryManager(self.params.get('fragment_retries'), error_callback):
+                try:
+                    ctx['fragment_count'] = fragment.get('fragment_count')
+                    if not self._download_fragment(ctx, fragment['url'], info_dict, headers,
+                                                   info_dict.get('request_data')):
+                        break
+                except (HTTPError, IncompleteRead) as err:
+                    retry.error = err
+                    continue
+                except DownloadError:  # tem retentativas próprias
+                    if fatal:
+                        raise
+            return attempts[0]
+
+        def _append_windowed(self, ctx, frag_content, frag_index, is_fatal, pack_func) -> bool:
+            if frag_content:
+                self._append_fragment(ctx, pack_func(frag_content, frag_index))
+            elif not is_fatal(frag_index - 1):
+                self.report_skip_fragment(frag_index, 'fragment not found')
+            else:
+                ctx['dest_stream'].close()
+                self.report_error(f'fragment {frag_index} not found, unable to continue')
+                return False
+            return True
+
+    WindowedFragmentFD.__name__ = 'Windowed' + base.__name__
+    return WindowedFragmentFD
+
+
+__all__ = ["FragmentTiming", "fragment_stats", "backoff_sleep", "windowed_fragment_fd"]
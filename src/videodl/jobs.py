@@ -0,0 +1,369 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .bandwidth import BandwidthScheduler
+from .downloader import VideoDownloader, DownloadCancelled
+from .metrics import JobMetrics, MetricsRegistry
+from .retry import FailureReport, RetryPolicies
+from .storage import Reservation
+from .sync import SourceSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class JobState:
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    FINAL = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class DownloadJob:
+    """Um pedido de download na fila.
+
+    options são repassadas como kwargs para VideoDownloader.download
+    (format_id, only_audio, playlist_mode, write_thumbnail, prefer_mp4...).
+    Prioridade menor é executada primeiro. weight e rate_limit (bytes/s,
+    None = sem limite próprio) valem com um BandwidthScheduler na fila.
+    """
+    id: int
+    url: str
+    output_dir: str
+    options: Dict[str, Any] = field(default_factory=dict)
+    priority: int = 0
+    weight: float = 1.0
+    rate_limit: Optional[float] = None
+    state: str = JobState.PENDING
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    bytes_downloaded: int = 0
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    metrics: Optional[JobMetrics] = field(default=None, repr=False)
+    report: Optional[FailureReport] = field(default=None, repr=False)
+    reserved_bytes: Optional[int] = None  # espaço em disco reservado (StorageManager)
+    sync: Optional[Dict[str, Any]] = None  # contagens do modo sync (SourceSnapshot.last_sync)
+    _file_bytes: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    @property
+    def queue_wait(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return self.started_at - self.created_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Resumo serializável em JSON (manifesto/API)."""
+        return {
+            'id': self.id,
+            'url': self.url,
+            'output_dir': self.output_dir,
+            'options': dict(self.options),
+            'priority': self.priority,
+            'weight': self.weight,
+            'rate_limit': self.rate_limit,
+            'state': self.state,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'queue_wait': self.queue_wait,
+            'elapsed': self.elapsed,
+            'bytes': self.bytes_downloaded,
+            'metrics': self.metrics.to_dict(spans=False) if self.metrics is not None else None,
+            'failures': self.report.to_dict() if self.report is not None else None,
+            'reserved_bytes': self.reserved_bytes,
+            'sync': self.sync,
+        }
+
+    def _account(self, d: Dict[str, Any]):
+        # soma por arquivo: vídeo e áudio separados (merge) e itens de playlist
+        name = d.get('filename') or d.get('tmpfilename')
+        if not name:
+            return
+        done = d.get('downloaded_bytes')
+        if d.get('status') == 'finished':
+            done = d.get('total_bytes') or done
+        if done:
+            self._file_bytes[name] = int(done)
+            self.bytes_downloaded = sum(self._file_bytes.values())
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+
+
+class DownloadQueue:
+    """Fila de downloads com pool limitado de workers.
+
+    Independente da GUI: pode ser usada diretamente por scripts/serviços.
+    Cada job tem seu próprio evento de cancelamento, então cancelar um job
+    não afeta os demais.
+
+    on_progress(job, d) recebe os dicts de progresso do yt-dlp e
+    on_state(job) é chamado a cada mudança de estado; ambos executam na
+    thread do worker.
+
+    Com bandwidth, os jobs em execução dividem o limite global conforme o
+    peso de cada um (set_bandwidth altera peso/limite durante o download).
+    Com metrics, cada job registra spans e contadores (job.metrics) e o
+    registro exporta ao fim de cada job. job.report lista os itens que
+    falharam (recuperados ou pulados) segundo retry_policies.
+
+    Com um StorageManager no downloader, o espaço estimado do job é
+    reservado antes de ele começar: o job continua pendente (ocupando o
+    worker) enquanto as reservas dos jobs em execução impedem e falha, sem
+    baixar nada, se não couber no disco.
+    """
+
+    def __init__(self, concurrency: int = 2,
+                 downloader: Optional[VideoDownloader] = None,
+                 on_progress: Optional[Callable[[DownloadJob, Dict[str, Any]], None]] = None,
+                 on_state: Optional[Callable[[DownloadJob], None]] = None,
+                 bandwidth: Optional[BandwidthScheduler] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 retry_policies: Optional[RetryPolicies] = None):
+        if concurrency < 1:
+            raise ValueError("concurrency deve ser >= 1")
+        self.concurrency = concurrency
+        self.downloader = downloader or VideoDownloader()
+        self.on_progress = on_progress
+        self.on_state = on_state
+        self.bandwidth = bandwidth
+        self.metrics = metrics
+        self.retry_policies = retry_policies
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._jobs: Dict[int, DownloadJob] = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._active = 0
+        self._workers: List[threading.Thread] = []
+        self._closed = False
+
+    # ---------------- Ciclo de vida -----------------
+    def start(self):
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.concurrency):
+                t = threading.Thread(target=self._worker, name=f"videodl-worker-{i + 1}", daemon=True)
+                self._workers.append(t)
+                t.start()
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """Encerra os workers. Com cancel_pending=True cancela também os jobs
+        pendentes e em execução."""
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        if cancel_pending:
+            for job in self.jobs():
+                self.cancel(job.id)
+        for _ in workers:
+            self._queue.put((float('inf'), next(self._seq), None))
+        if wait:
+            for t in workers:
+                t.join()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Bloqueia até todos os jobs atingirem estado final. Retorna False em timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._has_unfinished():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    # ---------------- API de jobs -----------------
+    def submit(self, url: str, output_dir: str, priority: int = 0, weight: float = 1.0,
+               rate_limit: Optional[float] = None, **options) -> DownloadJob:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Fila encerrada")
+            job = DownloadJob(id=next(self._ids), url=url, output_dir=output_dir,
+                              options=options, priority=priority, weight=weight,
+                              rate_limit=rate_limit or None)
+            self._jobs[job.id] = job
+        self._queue.put((priority, next(self._seq), job))
+        self._notify_state(job)
+        self.start()
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancela um job. Pendentes são descartados; em execução são interrompidos
+        no próximo callback de progresso. Retorna False se o job já terminou."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in JobState.FINAL:
+                return False
+            job.cancel_event.set()
+            was_pending = job.state == JobState.PENDING
+            if was_pending:
+                job.state = JobState.CANCELLED
+                job.finished_at = time.time()
+                self._idle.notify_all()
+        if was_pending:
+            self._notify_state(job)
+        return True
+
+    def set_bandwidth(self, job_id: int, weight: Optional[float] = None,
+                      rate_limit: Optional[float] = None) -> bool:
+        """Altera peso e/ou limite (bytes/s; 0 remove) de um job pendente ou em
+        execução. Retorna False se o job não existe ou já terminou."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in JobState.FINAL:
+                return False
+            if weight is not None:
+                job.weight = weight
+            if rate_limit is not None:
+                job.rate_limit = rate_limit or None
+        if self.bandwidth is not None:
+            self.bandwidth.update(job_id, weight=weight, limit=rate_limit)
+        return True
+
+    def get(self, job_id: int) -> Optional[DownloadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[DownloadJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    @property
+    def active_count(self) -> int:
+        with self._lock:
+            return self._active
+
+    # ---------------- Internos -----------------
+    def _has_unfinished(self) -> bool:
+        return any(j.state not in JobState.FINAL for j in self._jobs.values())
+
+    def _notify_state(self, job: DownloadJob):
+        if self.on_state:
+            try:
+                self.on_state(job)
+            except Exception:
+                logger.exception("Erro no callback on_state")
+
+    def _set_state(self, job: DownloadJob, state: str, error: Optional[str] = None):
+        with self._lock:
+            job.state = state
+            job.error = error
+            if state == JobState.RUNNING:
+                job.started_at = time.time()
+            elif state in JobState.FINAL:
+                job.finished_at = time.time()
+                self._idle.notify_all()
+        self._notify_state(job)
+
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.state != JobState.PENDING:
+                    # cancelado enquanto aguardava
+                    continue
+            try:
+                reservation = self._reserve(job)
+            except DownloadCancelled:
+                continue  # cancel() já marcou o job
+            except Exception as e:
+                logger.error("Job %s não iniciado: %s", job.id, e)
+                self._set_state(job, JobState.FAILED, str(e))
+                continue
+            with self._lock:
+                if job.state != JobState.PENDING:
+                    if reservation is not None:
+                        reservation.release()
+                    continue
+                # no mesmo bloco da verificação: cancel() não pode marcar o job
+                # entre o PENDING conferido e o RUNNING
+                self._active += 1
+                job.state = JobState.RUNNING
+                job.error = None
+                job.started_at = time.time()
+            self._notify_state(job)
+            try:
+                state, error = JobState.DONE, None
+                try:
+                    self._run(job, reservation)
+                except DownloadCancelled:
+                    state = JobState.CANCELLED
+                except Exception as e:
+                    logger.error("Job %s falhou: %s", job.id, e)
+                    state, error = JobState.FAILED, str(e)
+                else:
+                    if job.cancel_event.is_set():
+                        state = JobState.CANCELLED
+                if job.metrics is not None:
+                    # exporta antes do estado final: join() já vê as métricas
+                    self.metrics.finish(job.metrics, state)
+                self._set_state(job, state, error)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+    def _reserve(self, job: DownloadJob) -> Optional[Reservation]:
+        if getattr(self.downloader, 'storage', None) is None:
+            return None
+        options = job.options
+        reservation = self.downloader.reserve_space(
+            job.url, job.output_dir, options.get('format_id'), options.get('only_audio', False),
+            options.get('format_profile'), options.get('playlist_mode', False),
+            options.get('playlist_workers', 1), cancel_event=job.cancel_event,
+            sync=options.get('sync', False), audio_format=options.get('audio_format', 'best'))
+        job.reserved_bytes = reservation.nbytes
+        return reservation
+
+    def _run(self, job: DownloadJob, reservation: Optional[Reservation] = None):
+        def _progress(d):
+            job._account(d)
+            if self.on_progress:
+                self.on_progress(job, d)
+
+        options = dict(job.options)
+        only_audio = options.pop('only_audio', False)
+        format_id = options.pop('format_id', None)
+        if self.bandwidth is not None:
+            options['throttle'] = self.bandwidth.register(job.id, job.weight, job.rate_limit)
+        if self.metrics is not None:
+            job.metrics = options['metrics'] = self.metrics.start(job.id, job.url, job.queue_wait)
+        if self.retry_policies is not None:
+            options['retry_policies'] = self.retry_policies
+        job.report = options['failure_report'] = FailureReport()
+        if reservation is not None:
+            options['storage_reservation'] = reservation
+        try:
+            result = self.downloader.download(job.url, job.output_dir, format_id, only_audio,
+                                              progress_cb=_progress,
+                                              cancel_event=job.cancel_event,
+                                              **options)
+            if isinstance(result, SourceSnapshot):
+                job.sync = dict(result.last_sync)
+        finally:
+            if reservation is not None:
+                reservation.release()
+            if self.bandwidth is not None:
+                self.bandwidth.unregister(job.id)
+
+
+__all__ = ["DownloadQueue", "DownloadJob", "JobState"]
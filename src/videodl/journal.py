@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EntryStatus:
+    # downloading: .part em andamento; downloaded: arquivo baixado (pode faltar
+    # outro formato do merge ou o pós-processamento); finished: item concluído
+    status: str
+    filename: Optional[str] = None
+    downloaded_bytes: int = 0
+    total_bytes: Optional[int] = None
+
+
+@dataclass
+class JournalJob:
+    """Estado de um job reconstruído a partir do journal."""
+    key: str
+    url: str
+    output_dir: str
+    options: Dict[str, Any] = field(default_factory=dict)
+    entries: Dict[str, EntryStatus] = field(default_factory=dict)
+    state: Optional[str] = None  # None = sem registro de fim (interrompido)
+    started_at: float = 0.0
+
+    @property
+    def finished_entries(self) -> Set[str]:
+        return {k for k, e in self.entries.items() if e.status == 'finished'}
+
+    @property
+    def partial_bytes(self) -> int:
+        """Bytes já gravados em arquivos .part que serão retomados via HTTP Range."""
+        return sum(e.downloaded_bytes for e in self.entries.values() if e.status == 'downloading')
+
+    def download_kwargs(self) -> Dict[str, Any]:
+        """kwargs para VideoDownloader.download retomar este job."""
+        kwargs = dict(self.options)
+        kwargs['resume_key'] = self.key
+        return kwargs
+
+
+class JobJournal:
+    """Journal append-only (JSON lines) dos downloads.
+
+    Cada job grava seus parâmetros antes de começar, o estado de cada item
+    (com bytes parciais, no máximo a cada progress_interval segundos) e um
+    registro de fim. Registros de início/fim/item concluído são gravados com
+    fsync; após uma queda, pending() devolve os jobs sem registro de fim.
+    """
+
+    def __init__(self, path: str, progress_interval: float = 2.0):
+        self.path = path
+        self.progress_interval = progress_interval
+        self._lock = threading.Lock()
+        self._last_progress: Dict[tuple, float] = {}
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def close(self):
+        """Fecha o journal; gravações seguintes são ignoradas (jobs em curso
+        continuam pendentes e podem ser retomados)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---------------- Gravação -----------------
+    def start_job(self, url: str, output_dir: str, options: Dict[str, Any]) -> str:
+        key = uuid.uuid4().hex
+        self._write({'type': 'job', 'job': key, 'url': url, 'output_dir': output_dir,
+                     'options': options}, sync=True)
+        return key
+
+    def entry_progress(self, key: str, d: Dict[str, Any]):
+        """Registra um dict de progresso do yt-dlp (com limitação de taxa)."""
+        status = d.get('status')
+        info = d.get('info_dict') or {}
+        entry = str(info.get('id') or d.get('filename') or '')
+        if not entry:
+            return
+        record = {'type': 'entry', 'job': key, 'entry': entry, 'status': status,
+                  'filename': d.get('filename'),
+                  'downloaded_bytes': d.get('downloaded_bytes') or 0,
+                  'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate')}
+        if status == 'downloading':
+            now = time.monotonic()
+            slot = (key, d.get('filename'))
+            if now - self._last_progress.get(slot, 0.0) < self.progress_interval:
+                return
+            self._last_progress[slot] = now
+            self._write(record)
+        elif status in ('finished', 'error'):
+            self._last_progress.pop((key, d.get('filename')), None)
+            if status == 'finished':
+                # só o arquivo terminou; o item é concluído em entry_done()
+                record['status'] = 'downloaded'
+            self._write(record, sync=True)
+
+    def entry_done(self, key: str, entry: str, filename: Optional[str] = None):
+        """Item concluído após pós-processamento (arquivo final existe)."""
+        self._write({'type': 'entry', 'job': key, 'entry': entry, 'status': 'finished',
+                     'filename': filename}, sync=True)
+
+    def finish_job(self, key: str, state: str, error: Optional[str] = None):
+        self._write({'type': 'end', 'job': key, 'state': state, 'error': error}, sync=True)
+
+    def _write(self, record: Dict[str, Any], sync: bool = False):
+        record['ts'] = time.time()
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    # ---------------- Leitura -----------------
+    def load(self) -> Dict[str, JournalJob]:
+        jobs: Dict[str, JournalJob] = {}
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return jobs
+        with f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # última linha truncada por uma queda
+                    continue
+                key = rec.get('job')
+                kind = rec.get('type')
+                if kind == 'job':
+                    jobs[key] = JournalJob(key=key, url=rec['url'], output_dir=rec['output_dir'],
+                                           options=rec.get('options') or {}, started_at=rec.get('ts') or 0.0)
+                    continue
+                job = jobs.get(key)
+                if job is None:
+                    continue
+                if kind == 'entry':
+                    prev = job.entries.get(rec['entry'])
+                    if prev is not None and prev.status == 'finished':
+                        continue  # progresso de outro arquivo do mesmo item (merge)
+                    job.entries[rec['entry']] = EntryStatus(
+                        status=rec.get('status') or 'downloading',
+                        filename=rec.get('filename'),
+                        downloaded_bytes=rec.get('downloaded_bytes') or 0,
+                        total_bytes=rec.get('total_bytes'))
+                elif kind == 'end':
+                    job.state = rec.get('state')
+        return jobs
+
+    def pending(self) -> List[JournalJob]:
+        """Jobs interrompidos (sem registro de fim), na ordem em que começaram."""
+        return sorted((j for j in self.load().values() if j.state is None), key=lambda j: j.started_at)
+
+    def get(self, key: str) -> Optional[JournalJob]:
+        return self.load().get(key)
+
+    def compact(self):
+        """Reescreve o journal mantendo só os registros dos jobs pendentes."""
+        keep = {j.key for j in self.pending()}
+        with self._lock:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    lines = [ln for ln in f if self._line_job(ln) in keep]
+            except FileNotFoundError:
+                lines = []
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+            os.replace(tmp, self.path)
+            if self._file is not None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _line_job(line: str) -> Optional[str]:
+        try:
+            return json.loads(line).get('job')
+        except ValueError:
+            return None
+
+
+def journal_postprocessor(journal: JobJournal, key: str):
+    """PostProcessor do yt-dlp (etapa after_move) que marca o item como
+    concluído no journal."""
+    from yt_dlp.postprocessor.common import PostProcessor  # type: ignore
+
+    class JournalEntryPP(PostProcessor):
+        def run(self, info):
+            if info.get('id'):
+                journal.entry_done(key, str(info['id']), info.get('filepath'))
+            return [], info
+
+    return JournalEntryPP()
+
+
+__all__ = ["JobJournal", "JournalJob", "EntryStatus", "journal_postprocessor"]
@@ -4,28 +4,68 @@ from tkinter import ttk, filedialog, messagebox
 import logging
 from typing import List, Optional
 import os
-import shutil
 import json
 
-from .downloader import VideoDownloader, FormatInfo, DownloadCancelled
-from . import downloader as downloader_module
+from .archive import DownloadArchive
+from .bandwidth import BandwidthScheduler
+from .cache import InfoCache
+from .journal import JobJournal
+from .postprocess import PostProcessPipeline
+from .downloader import VideoDownloader, FormatInfo
+from .ffmpeg import FFmpegInfo, probe_ffmpeg
+from .formats import AUDIO_FORMATS, FormatSelector, PROFILES
+from .jobs import DownloadQueue, DownloadJob, JobState
+from .progress import ProgressBus, ProgressSnapshot
+from .sessions import SessionPool
+from .storage import StorageManager
+from .sync import SyncStore
+from .ydl import ytdlp
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class App(tk.Tk):
+    # limite de linhas do log (sessões longas não crescem sem fim)
+    MAX_LOG_LINES = 2000
+    # intervalo do timer único que lê o progresso agregado
+    PROGRESS_POLL_MS = 200
+
     def __init__(self):
         super().__init__()
         self.title("Video Downloader (yt-dlp)")
         self.geometry("880x560")
 
-        self.downloader = VideoDownloader()
+        cfg_dir = os.path.dirname(self._config_path())
+        self.downloader = VideoDownloader(info_cache=InfoCache(cache_dir=os.path.join(cfg_dir, 'cache')),
+                                          archive=DownloadArchive(os.path.join(cfg_dir, 'archive.sqlite3')),
+                                          journal=JobJournal(os.path.join(cfg_dir, 'journal.jsonl')),
+                                          # ffmpeg num pool de processos: a rede não espera a conversão
+                                          pipeline=PostProcessPipeline(),
+                                          # jobs que não cabem no disco falham antes de baixar
+                                          storage=StorageManager(),
+                                          # snapshot por playlist/canal: "Sincronizar" baixa só os novos
+                                          sync_store=SyncStore(os.path.join(cfg_dir, 'sync')),
+                                          # listar formatos e baixar reaproveitam conexões e cookies
+                                          sessions=SessionPool())
+        # callbacks do yt-dlp só atualizam o bus; a UI lê um snapshot no timer
+        self.progress_bus = ProgressBus()
+        # limite de banda global (alterável durante os downloads)
+        self.bandwidth = BandwidthScheduler()
+        # fila com workers próprios: o botão Baixar fica livre para enfileirar mais URLs
+        self.queue = DownloadQueue(concurrency=2, downloader=self.downloader,
+                                   on_progress=self._on_job_progress,
+                                   on_state=self._on_job_state,
+                                   bandwidth=self.bandwidth)
         self.formats: List[FormatInfo] = []
         self.selected_format: Optional[str] = None
 
         self._build_ui()
         self._load_prefs()
-        self._check_ffmpeg()
+        # import do yt_dlp e sondagem do ffmpeg numa thread: a janela abre sem esperar
+        self.after_idle(self._check_dependencies)
+        # oferece retomar downloads interrompidos (queda/fechamento) após a janela abrir
+        self.after(200, self._offer_resume)
+        self.after(self.PROGRESS_POLL_MS, self._poll_progress)
         # salva preferências ao fechar
         self.protocol("WM_DELETE_WINDOW", self._on_close)
 
@@ -49,22 +89,48 @@ class App(tk.Tk):
         self.format_var = tk.StringVar()
         self.format_combo = ttk.Combobox(options_frame, textvariable=self.format_var, width=40, state='readonly')
         self.format_combo.pack(side='left', padx=4)
+        # sem formato escolhido, o perfil decide (e ordena a lista de formatos)
+        ttk.Label(options_frame, text="Perfil:").pack(side='left')
+        self.profile_var = tk.StringVar(value='best')
+        ttk.Combobox(options_frame, textvariable=self.profile_var, values=list(PROFILES),
+                     width=10, state='readonly').pack(side='left', padx=(2, 8))
 
         self.audio_only_var = tk.BooleanVar()
-        ttk.Checkbutton(options_frame, text="Somente áudio (mp3)", variable=self.audio_only_var, command=self.on_audio_only_toggle).pack(side='left', padx=8)
+        ttk.Checkbutton(options_frame, text="Somente áudio", variable=self.audio_only_var, command=self.on_audio_only_toggle).pack(side='left', padx=(8, 2))
+        # best/m4a/opus/ogg copiam a trilha; só mp3 recodifica
+        self.audio_format_var = tk.StringVar(value='best')
+        ttk.Combobox(options_frame, textvariable=self.audio_format_var, values=list(AUDIO_FORMATS),
+                     width=5, state='readonly').pack(side='left', padx=(0, 8))
         self.playlist_var = tk.BooleanVar()
         ttk.Checkbutton(options_frame, text="Baixar playlist inteira", variable=self.playlist_var).pack(side='left', padx=8)
+        self.sync_var = tk.BooleanVar()
+        ttk.Checkbutton(options_frame, text="Sincronizar (só novos)", variable=self.sync_var).pack(side='left', padx=8)
+        ttk.Label(options_frame, text="Paralelos:").pack(side='left')
+        self.playlist_workers_var = tk.IntVar(value=3)
+        ttk.Spinbox(options_frame, from_=1, to=16, width=3, textvariable=self.playlist_workers_var).pack(side='left', padx=(2, 8))
+        # fragmentos HLS/DASH simultâneos por download
+        ttk.Label(options_frame, text="Fragmentos:").pack(side='left')
+        self.fragment_workers_var = tk.IntVar(value=4)
+        ttk.Spinbox(options_frame, from_=1, to=32, width=3, textvariable=self.fragment_workers_var).pack(side='left', padx=(2, 8))
         self.thumb_var = tk.BooleanVar()
         ttk.Checkbutton(options_frame, text="Thumbnail", variable=self.thumb_var).pack(side='left', padx=8)
         self.prefer_mp4_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(options_frame, text="Preferir MP4 (compatível)", variable=self.prefer_mp4_var).pack(side='left', padx=8)
+        self.skip_archived_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Pular já baixados", variable=self.skip_archived_var).pack(side='left', padx=8)
 
         # disparar salvamento quando variáveis mudarem
         self.dest_var.trace_add('write', lambda *args: self._save_prefs())
         self.audio_only_var.trace_add('write', lambda *args: self._save_prefs())
+        self.audio_format_var.trace_add('write', lambda *args: self._save_prefs())
         self.playlist_var.trace_add('write', lambda *args: self._save_prefs())
+        self.sync_var.trace_add('write', lambda *args: self._save_prefs())
         self.thumb_var.trace_add('write', lambda *args: self._save_prefs())
         self.prefer_mp4_var.trace_add('write', lambda *args: self._save_prefs())
+        self.playlist_workers_var.trace_add('write', lambda *args: self._save_prefs())
+        self.fragment_workers_var.trace_add('write', lambda *args: self._save_prefs())
+        self.skip_archived_var.trace_add('write', lambda *args: self._save_prefs())
+        self.profile_var.trace_add('write', lambda *args: self._save_prefs())
 
         action_frame = ttk.Frame(self)
         action_frame.pack(fill='x', padx=6, pady=4)
@@ -72,6 +138,11 @@ class App(tk.Tk):
         self.download_btn.pack(side='left')
         self.cancel_btn = ttk.Button(action_frame, text="Cancelar", command=self.on_cancel, state='disabled')
         self.cancel_btn.pack(side='left', padx=4)
+        ttk.Label(action_frame, text="Limite (KB/s, 0 = livre):").pack(side='left', padx=(16, 2))
+        self.rate_limit_var = tk.IntVar(value=0)
+        ttk.Spinbox(action_frame, from_=0, to=1000000, increment=100, width=8,
+                    textvariable=self.rate_limit_var).pack(side='left')
+        self.rate_limit_var.trace_add('write', lambda *args: self._apply_rate_limit())
 
         progress_frame = ttk.Frame(self)
         progress_frame.pack(fill='x', padx=6, pady=4)
@@ -80,9 +151,6 @@ class App(tk.Tk):
         self.progress_bar.pack(fill='x', expand=True)
         self.status_var = tk.StringVar(value="Pronto")
         ttk.Label(progress_frame, textvariable=self.status_var).pack(anchor='w')
-        # variáveis para progresso de playlist
-        self._playlist_total = 0
-        self._current_index = 0
 
         log_frame = ttk.LabelFrame(self, text="Log")
         log_frame.pack(fill='both', expand=True, padx=6, pady=4)
@@ -93,6 +161,9 @@ class App(tk.Tk):
     def log(self, msg: str):
         self.log_text.config(state='normal')
         self.log_text.insert('end', msg + "\n")
+        lines = int(self.log_text.index('end-1c').split('.')[0]) - 1
+        if lines > self.MAX_LOG_LINES:
+            self.log_text.delete('1.0', f'{lines - self.MAX_LOG_LINES + 1}.0')
         self.log_text.see('end')
         self.log_text.config(state='disabled')
 
@@ -101,20 +172,32 @@ class App(tk.Tk):
         if d:
             self.dest_var.set(d)
 
-    def _check_ffmpeg(self):
-        # Procura binário ffmpeg no PATH
-        if not shutil.which('ffmpeg'):
-            self.log("[AVISO] ffmpeg não encontrado no PATH. Funções de extração de áudio/thumbnail e mesclagem podem falhar.")
-            # Aviso único via messagebox
-            if not hasattr(self, '_ffmpeg_warned'):
-                self._ffmpeg_warned = True
-                try:
-                    messagebox.showinfo(
-                        "ffmpeg ausente",
-                        "O ffmpeg não foi encontrado no PATH.\n\nSem ele, o app tentará baixar formatos 'progressivos' (vídeo+áudio juntos), mas nem sempre estão disponíveis.\n\nPara melhor compatibilidade, instale o ffmpeg (recomendado)."
-                    )
-                except Exception:
-                    pass
+    def _check_dependencies(self):
+        def worker():
+            has_ytdlp = ytdlp() is not None
+            info = probe_ffmpeg()
+            self.after(0, lambda: self._report_dependencies(has_ytdlp, info))
+        threading.Thread(target=worker, name='videodl-deps', daemon=True).start()
+
+    def _report_dependencies(self, has_ytdlp: bool, ffmpeg: FFmpegInfo):
+        if not has_ytdlp:
+            self.log("[ERRO] yt_dlp não está instalado. Instale com: pip install yt-dlp")
+        if ffmpeg.available:
+            self.log(f"ffmpeg {ffmpeg.version or '(versão desconhecida)'}: {ffmpeg.path}")
+            if not ffmpeg.has_encoder('libmp3lame'):
+                self.log("[AVISO] ffmpeg sem encoder MP3 (libmp3lame): 'Somente áudio' vai falhar.")
+            return
+        self.log("[AVISO] ffmpeg não encontrado no PATH. Funções de extração de áudio/thumbnail e mesclagem podem falhar.")
+        # Aviso único via messagebox
+        if not hasattr(self, '_ffmpeg_warned'):
+            self._ffmpeg_warned = True
+            try:
+                messagebox.showinfo(
+                    "ffmpeg ausente",
+                    "O ffmpeg não foi encontrado no PATH.\n\nSem ele, o app tentará baixar formatos 'progressivos' (vídeo+áudio juntos), mas nem sempre estão disponíveis.\n\nPara melhor compatibilidade, instale o ffmpeg (recomendado)."
+                )
+            except Exception:
+                pass
 
     def on_audio_only_toggle(self):
         if self.audio_only_var.get():
@@ -124,7 +207,7 @@ class App(tk.Tk):
             self.format_combo.config(state='readonly')
 
     def on_list_formats(self):
-        if getattr(downloader_module, 'YoutubeDL', None) is None:
+        if ytdlp() is None:
             messagebox.showerror("Dependência ausente", "yt_dlp não está instalado. Instale com: pip install yt-dlp")
             return
         url = self.url_var.get().strip()
@@ -137,28 +220,51 @@ class App(tk.Tk):
         self.status_var.set("Listando formatos...")
         self.formats = []
         self.format_combo.set('')
+        self.format_combo['values'] = ()
+        # listagens antigas ainda em andamento são ignoradas
+        self._list_generation = getattr(self, '_list_generation', 0) + 1
+        generation = self._list_generation
+
+        def _label(fmt: FormatInfo) -> str:
+            audio_flag = '' if (fmt.acodec and fmt.acodec != 'none') else ' [sem áudio]'
+            fps = f"@{fmt.fps}fps" if fmt.fps else ''
+            size = f" ~{fmt.filesize/1_000_000:.1f}MB" if fmt.filesize else ''
+            return f"{fmt.itag} | {fmt.resolution}{fps} | {fmt.ext}{audio_flag}{size} | {fmt.note}"
+
+        def append(fmt: FormatInfo):
+            if generation != self._list_generation:
+                return
+            self.formats.append(fmt)
+            self.format_combo['values'] = (*self.format_combo['values'], _label(fmt))
+            self.status_var.set(f"Listando formatos... ({len(self.formats)})")
+
+        def finish():
+            if generation != self._list_generation:
+                return
+            # reordena pelo perfil: os formatos da melhor escolha primeiro
+            selector = FormatSelector(self._profile())
+            self.formats = selector.sort_formats(self.formats)
+            self.format_combo['values'] = tuple(_label(f) for f in self.formats)
+            choice = selector.select(self.formats)
+            hint = ''
+            if choice is not None:
+                size = f" ~{choice.expected_bytes / 1_000_000:.1f}MB" if choice.expected_bytes else ''
+                hint = f"; perfil {selector.profile.name}: {choice.format_id}{size}"
+            self.status_var.set(f"{len(self.formats)} formatos encontrados{hint}")
+
         def worker():
             try:
-                fmts = self.downloader.list_formats(url)
-                self.formats = fmts
-                def _label(fmt: FormatInfo) -> str:
-                    audio_flag = '' if (fmt.acodec and fmt.acodec != 'none') else ' [sem áudio]'
-                    fps = f"@{fmt.fps}fps" if fmt.fps else ''
-                    size = f" ~{fmt.filesize/1_000_000:.1f}MB" if fmt.filesize else ''
-                    return f"{fmt.itag} | {fmt.resolution}{fps} | {fmt.ext}{audio_flag}{size} | {fmt.note}"
-
-                items = [_label(f) for f in fmts]
-                def update():
-                    self.format_combo['values'] = items
-                    self.status_var.set(f"{len(items)} formatos encontrados")
-                self.after(0, update)
+                # combobox é preenchido conforme os formatos chegam
+                for fmt in self.downloader.iter_formats(url):
+                    self.after(0, lambda f=fmt: append(f))
+                self.after(0, finish)
             except Exception as e:
                 self.after(0, lambda: messagebox.showerror("Erro", str(e)))
                 self.after(0, lambda: self.status_var.set("Erro ao listar"))
         threading.Thread(target=worker, daemon=True).start()
 
     def on_download(self):
-        if getattr(downloader_module, 'YoutubeDL', None) is None:
+        if ytdlp() is None:
             messagebox.showerror("Dependência ausente", "yt_dlp não está instalado. Instale com: pip install yt-dlp")
             return
         url = self.url_var.get().strip()
@@ -186,81 +292,126 @@ class App(tk.Tk):
                 pass
             else:
                 self.log("Nenhum formato listado; usando 'best'")
-        self.download_btn.config(state='disabled')
         self.cancel_btn.config(state='normal')
         self.status_var.set("Iniciando download...")
         self.progress_var.set(0)
         self.log(f"Iniciando: {url}")
+        self.progress_bus.clear_finished()
+        self.queue.submit(url, outdir,
+                          format_id=fmt_id,
+                          only_audio=only_audio,
+                          audio_format=self.audio_format_var.get(),
+                          playlist_mode=self.playlist_var.get(),
+                          sync=self.sync_var.get(),
+                          playlist_workers=self._playlist_workers(),
+                          fragment_workers=self._fragment_workers(),
+                          write_thumbnail=self.thumb_var.get(),
+                          prefer_mp4=self.prefer_mp4_var.get(),
+                          skip_archived=self.skip_archived_var.get(),
+                          format_profile=None if fmt_id else self._profile(),
+                          ensure_audio=True)
 
-        def progress_hook(d):
-            status = d.get('status')
-            playlist_index = d.get('playlist_index') or None
-            playlist_count = d.get('playlist_count') or None
-            if playlist_index and playlist_count:
-                # inicializa se mudou
-                if self._playlist_total != playlist_count:
-                    self._playlist_total = playlist_count
-                if playlist_index != self._current_index:
-                    self._current_index = playlist_index
-            if status == 'downloading':
-                total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
-                downloaded = d.get('downloaded_bytes') or 0
-                percent_item = (downloaded / total * 100) if total else 0
-                # progresso agregado se playlist
-                if self._playlist_total and self._current_index:
-                    global_percent = ((self._current_index - 1) + percent_item / 100.0) / self._playlist_total * 100.0
-                else:
-                    global_percent = percent_item
-                speed = d.get('speed')
-                eta = d.get('eta')
-                self.after(0, lambda p=global_percent, s=speed, e=eta, pi=playlist_index, pc=playlist_count, pi_pct=percent_item: self._update_progress(p, s, e, pi, pc, pi_pct))
-            elif status == 'finished':
-                # ao terminar um item, atualizar para 100% daquele item e refletir agregado
-                if self._playlist_total and self._current_index:
-                    global_percent = (self._current_index / self._playlist_total) * 100.0
-                else:
-                    global_percent = 100.0
-                self.after(0, lambda: self.progress_var.set(global_percent))
-                self.after(0, lambda: self.status_var.set("Processando (pós) ..."))
-
-        playlist_mode = self.playlist_var.get()
-        write_thumb = self.thumb_var.get()
+    def _on_job_progress(self, job: DownloadJob, d):
+        # executa na thread do worker da fila: só coalesce no bus, sem tocar no Tk
+        self.progress_bus.publish(job.id, d)
 
-        def worker():
-            try:
-                self.downloader.download(url, outdir, fmt_id, only_audio,
-                                         playlist_mode=playlist_mode,
-                                         write_thumbnail=write_thumb,
-                                         prefer_mp4=self.prefer_mp4_var.get(),
-                                         ensure_audio=True,
-                                         progress_cb=progress_hook)
-                self.after(0, lambda: self.status_var.set("Concluído"))
-                self.after(0, lambda: self.log("Concluído"))
-            except DownloadCancelled:
-                self.after(0, lambda: self.status_var.set("Cancelado"))
-                self.after(0, lambda: self.log("Cancelado"))
-            except Exception as e:
-                self.after(0, lambda: self.status_var.set("Erro"))
-                self.after(0, lambda: self.log(f"Erro: {e}"))
-            finally:
-                self.after(0, lambda: self.download_btn.config(state='normal'))
-                self.after(0, lambda: self.cancel_btn.config(state='disabled'))
-        threading.Thread(target=worker, daemon=True).start()
+    def _on_job_state(self, job: DownloadJob):
+        # executa na thread que alterou o estado (worker ou chamador)
+        if job.state in JobState.FINAL:
+            self.progress_bus.finish(job.id, job.state)
 
-    def _update_progress(self, global_percent, speed, eta, playlist_index=None, playlist_count=None, item_percent=None):
-        self.progress_var.set(global_percent)
-        speed_str = f" {speed/1024:.1f} KB/s" if speed else ''
-        eta_str = f" ETA {eta}s" if eta else ''
-        if playlist_index and playlist_count:
-            item_part = f" Item {playlist_index}/{playlist_count}"
-            if item_percent is not None:
-                item_part += f" ({item_percent:.1f}% do item)"
-            self.status_var.set(f"Playlist: {global_percent:.1f}%{item_part}{speed_str}{eta_str}")
+        def update():
+            if job.state == JobState.DONE:
+                self.status_var.set("Concluído")
+                self.log(f"Concluído: {job.url}")
+                if job.sync:
+                    removed = job.sync['removed']
+                    self.log(f"Sync: {job.sync['new']} novo(s), "
+                             f"{'?' if removed is None else removed} removido(s)")
+                for failure in (job.report.skipped if job.report is not None else []):
+                    self.log(f"Item {failure.playlist_index} pulado "
+                             f"({failure.error_class}): {failure.message}")
+            elif job.state == JobState.CANCELLED:
+                self.status_var.set("Cancelado")
+                self.log(f"Cancelado: {job.url}")
+            elif job.state == JobState.FAILED:
+                self.status_var.set("Erro")
+                self.log(f"Erro: {job.error}")
+            busy = any(j.state not in JobState.FINAL for j in self.queue.jobs())
+            self.cancel_btn.config(state='normal' if busy else 'disabled')
+        self.after(0, update)
+
+    def _profile(self) -> str:
+        name = self.profile_var.get()
+        return name if name in PROFILES else 'best'
+
+    def _playlist_workers(self) -> int:
+        try:
+            return max(1, int(self.playlist_workers_var.get()))
+        except (tk.TclError, ValueError):
+            return 1
+
+    def _rate_limit_kbps(self) -> int:
+        try:
+            return max(0, int(self.rate_limit_var.get()))
+        except (tk.TclError, ValueError):
+            return 0
+
+    def _apply_rate_limit(self):
+        # vale para os downloads em andamento a partir do próximo bloco
+        self.bandwidth.set_global_limit(self._rate_limit_kbps() * 1024 or None)
+        self._save_prefs()
+
+    def _fragment_workers(self) -> int:
+        try:
+            return max(1, int(self.fragment_workers_var.get()))
+        except (tk.TclError, ValueError):
+            return 1
+
+    def _poll_progress(self):
+        snap = self.progress_bus.poll()
+        if snap is not None and snap.active:
+            self._update_progress(snap)
+        self.after(self.PROGRESS_POLL_MS, self._poll_progress)
+
+    def _update_progress(self, snap: ProgressSnapshot):
+        self.progress_var.set(snap.percent)
+        speed_str = f" {snap.speed/1024:.1f} KB/s" if snap.speed else ''
+        eta_str = f" ETA {int(snap.eta)}s" if snap.eta else ''
+        active = [j for j in snap.jobs.values() if j.active]
+        if len(active) > 1:
+            self.status_var.set(f"{len(active)} downloads: {snap.percent:.1f}%{speed_str}{eta_str}")
+            return
+        job = active[0]
+        if job.status == 'postprocessing' and not job.playlist_count:
+            self.status_var.set("Processando (pós) ...")
+        elif job.playlist_index and job.playlist_count:
+            item_part = f" Item {job.playlist_index}/{job.playlist_count}"
+            self.status_var.set(f"Playlist: {snap.percent:.1f}%{item_part}{speed_str}{eta_str}")
         else:
-            self.status_var.set(f"Baixando: {global_percent:.1f}%{speed_str}{eta_str}")
+            self.status_var.set(f"Baixando: {snap.percent:.1f}%{speed_str}{eta_str}")
+
+    def _offer_resume(self):
+        journal = self.downloader.journal
+        pending = self.downloader.pending_jobs()
+        if pending:
+            partial = sum(j.partial_bytes for j in pending)
+            msg = f"{len(pending)} download(s) interrompido(s) encontrado(s)"
+            if partial:
+                msg += f" ({partial/1_000_000:.1f} MB parciais)"
+            if messagebox.askyesno("Retomar downloads", msg + ".\n\nRetomar de onde pararam?"):
+                for job in pending:
+                    self.log(f"Retomando: {job.url}")
+                    self.queue.submit(job.url, job.output_dir, **job.download_kwargs())
+                self.cancel_btn.config(state='normal')
+            else:
+                for job in pending:
+                    journal.finish_job(job.key, 'cancelled')
+        journal.compact()
 
     def on_cancel(self):
-        self.downloader.cancel()
+        for job in self.queue.jobs():
+            self.queue.cancel(job.id)
         self.log("Cancelando...")
         self.status_var.set("Cancelando...")
 
@@ -290,18 +441,39 @@ class App(tk.Tk):
             if 'audio_only' in data:
                 self.audio_only_var.set(bool(data['audio_only']))
                 self.on_audio_only_toggle()
+            if data.get('audio_format') in AUDIO_FORMATS:
+                self.audio_format_var.set(data['audio_format'])
             if 'playlist' in data:
                 self.playlist_var.set(bool(data['playlist']))
+            if 'sync' in data:
+                self.sync_var.set(bool(data['sync']))
             if 'thumbnail' in data:
                 self.thumb_var.set(bool(data['thumbnail']))
+            if 'skip_archived' in data:
+                self.skip_archived_var.set(bool(data['skip_archived']))
+            if isinstance(data.get('playlist_workers'), int):
+                self.playlist_workers_var.set(max(1, data['playlist_workers']))
+            if isinstance(data.get('fragment_workers'), int):
+                self.fragment_workers_var.set(max(1, data['fragment_workers']))
+            if data.get('format_profile') in PROFILES:
+                self.profile_var.set(data['format_profile'])
+            if isinstance(data.get('rate_limit_kbps'), int):
+                self.rate_limit_var.set(max(0, data['rate_limit_kbps']))
 
     def _save_prefs(self):
         data = {
             'dest_dir': self.dest_var.get().strip(),
             'prefer_mp4': bool(self.prefer_mp4_var.get()),
             'audio_only': bool(self.audio_only_var.get()),
+            'audio_format': self.audio_format_var.get(),
             'playlist': bool(self.playlist_var.get()),
+            'sync': bool(self.sync_var.get()),
             'thumbnail': bool(self.thumb_var.get()),
+            'playlist_workers': self._playlist_workers(),
+            'fragment_workers': self._fragment_workers(),
+            'rate_limit_kbps': self._rate_limit_kbps(),
+            'format_profile': self._profile(),
+            'skip_archived': bool(self.skip_archived_var.get()),
         }
         try:
             with open(self._config_path(), 'w', encoding='utf-8') as f:
@@ -311,6 +483,12 @@ class App(tk.Tk):
 
     def _on_close(self):
         self._save_prefs()
+        # fecha o journal antes de cancelar: jobs em andamento ficam pendentes
+        # e podem ser retomados na próxima abertura
+        self.downloader.journal.close()
+        self.queue.shutdown(wait=False, cancel_pending=True)
+        self.downloader.pipeline.shutdown(wait=False, cancel_pending=True)
+        self.downloader.sessions.close()
         self.destroy()
 
 
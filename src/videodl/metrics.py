@@ -0,0 +1,305 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# etapas medidas (nome dos spans)
+EXTRACTION = 'extraction'
+FORMAT_SELECTION = 'format_selection'
+DOWNLOAD = 'download'  # transferência de rede de um arquivo
+POSTPROCESS = 'postprocess'  # um pós-processador (attrs['postprocessor'])
+MOVE = 'move'  # MoveFilesAfterDownload: .part/temp -> destino final
+
+STAGES = (EXTRACTION, FORMAT_SELECTION, DOWNLOAD, POSTPROCESS, MOVE)
+
+# limites (s) dos histogramas Prometheus
+_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0)
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # time.time()
+    end: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return max(self.end - self.start, 0.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'start': self.start, 'duration': self.duration, **self.attrs}
+
+
+class JobMetrics:
+    """Tempos e contadores de um job.
+
+    Os spans são registrados pelo YoutubeDL do videodl (params['job_metrics']):
+    extração, seleção de formato, transferência de cada arquivo, cada
+    pós-processador e a movimentação final. Contadores: bytes (por arquivo,
+    pelo progresso), http_retries, fragment_retries e entry_retries (itens
+    repetidos inteiros pela política de retry.py). Thread-safe: segmentos,
+    fragmentos e itens de playlist em paralelo registram no mesmo objeto.
+    """
+
+    def __init__(self, job_id: Any = None, url: str = ''):
+        self.job_id = job_id
+        self.url = url
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.queue_wait: Optional[float] = None
+        self.state: Optional[str] = None
+        self.spans: List[Span] = []
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._file_bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    # ---------------- Registro -----------------
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """Mede o bloco; attrs pode ser completado dentro dele (ex.: erro)."""
+        start = time.time()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs['error'] = type(e).__name__
+            raise
+        finally:
+            self.add_span(name, start, time.time(), **attrs)
+
+    def add_span(self, name: str, start: float, end: float, **attrs):
+        with self._lock:
+            self.spans.append(Span(name, start, end, attrs))
+
+    def incr(self, counter: str, n: int = 1):
+        if n:
+            with self._lock:
+                self.counters[counter] += n
+
+    def on_progress(self, d: Dict[str, Any]):
+        """Dict de progresso do yt-dlp: bytes baixados por arquivo."""
+        name = d.get('filename') or d.get('tmpfilename')
+        done = d.get('downloaded_bytes')
+        if d.get('status') == 'finished':
+            done = d.get('total_bytes') or done
+        if name and done:
+            with self._lock:
+                self._file_bytes[name] = int(done)
+                self.counters['bytes'] = sum(self._file_bytes.values())
+
+    # ---------------- Leitura -----------------
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Segundos somados por etapa (spans paralelos somam)."""
+        totals: Dict[str, float] = defaultdict(float)
+        with self._lock:
+            for s in self.spans:
+                totals[s.name] += s.duration
+        return dict(totals)
+
+    def postprocessor_totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = defaultdict(float)
+        with self._lock:
+            for s in self.spans:
+                if s.name in (POSTPROCESS, MOVE):
+                    totals[s.attrs.get('postprocessor') or s.name] += s.duration
+        return dict(totals)
+
+    def to_dict(self, spans: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            span_list = [s.to_dict() for s in self.spans] if spans else None
+        data = {
+            'job_id': self.job_id,
+            'url': self.url,
+            'state': self.state,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'queue_wait': self.queue_wait,
+            'elapsed': self.elapsed,
+            'stages': self.stage_totals(),
+            'counters': counters,
+        }
+        if span_list is not None:
+            data['spans'] = span_list
+        return data
+
+
+class MetricsRegistry:
+    """Coleta as métricas dos jobs e agrega para exportação.
+
+    jsonl_path: cada job finalizado vira uma linha JSON (com os spans).
+    prometheus_path: arquivo no formato texto do Prometheus reescrito
+    (atomicamente) a cada job finalizado, para o textfile collector do
+    node_exporter; prometheus() retorna o mesmo texto para um endpoint.
+    Jobs finalizados ficam em memória até keep_finished.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+                 keep_finished: int = 1000):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.keep_finished = keep_finished
+        self._lock = threading.Lock()
+        self._jobs: Dict[Any, JobMetrics] = {}
+        self._finished: List[Any] = []
+        self._jobs_total: Dict[str, int] = defaultdict(int)
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._stage_hist: Dict[str, _Histogram] = defaultdict(_Histogram)
+        self._pp_seconds: Dict[str, float] = defaultdict(float)
+        self._queue_wait = _Histogram()
+
+    def start(self, job_id: Any, url: str = '', queue_wait: Optional[float] = None) -> JobMetrics:
+        metrics = JobMetrics(job_id, url)
+        metrics.started_at = time.time()
+        metrics.queue_wait = queue_wait
+        with self._lock:
+            self._jobs[job_id] = metrics
+        return metrics
+
+    def finish(self, metrics: JobMetrics, state: str):
+        metrics.state = state
+        metrics.finished_at = time.time()
+        record = metrics.to_dict()
+        with self._lock:
+            self._jobs_total[state] += 1
+            for name, value in record['counters'].items():
+                self._counters[name] += value
+            for stage, seconds in record['stages'].items():
+                self._stage_hist[stage].observe(seconds)
+            for name, seconds in metrics.postprocessor_totals().items():
+                self._pp_seconds[name] += seconds
+            if metrics.queue_wait is not None:
+                self._queue_wait.observe(metrics.queue_wait)
+            self._finished.append(metrics.job_id)
+            while len(self._finished) > self.keep_finished:
+                self._jobs.pop(self._finished.pop(0), None)
+        self._export(record)
+
+    def get(self, job_id: Any) -> Optional[JobMetrics]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[JobMetrics]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def prometheus(self) -> str:
+        """Métricas agregadas no formato de exposição de texto do Prometheus."""
+        with self._lock:
+            active = sum(1 for m in self._jobs.values() if m.finished_at is None)
+            lines = [
+                '# HELP videodl_jobs_total Jobs finalizados por estado.',
+                '# TYPE videodl_jobs_total counter',
+            ]
+            lines += [f'videodl_jobs_total{{state="{s}"}} {n}' for s, n in sorted(self._jobs_total.items())]
+            lines += [
+                '# HELP videodl_jobs_active Jobs em execução.',
+                '# TYPE videodl_jobs_active gauge',
+                f'videodl_jobs_active {active}',
+                '# HELP videodl_downloaded_bytes_total Bytes baixados por jobs finalizados.',
+                '# TYPE videodl_downloaded_bytes_total counter',
+                f'videodl_downloaded_bytes_total {self._counters.get("bytes", 0)}',
+                '# HELP videodl_retries_total Novas tentativas de rede.',
+                '# TYPE videodl_retries_total counter',
+                f'videodl_retries_total{{kind="http"}} {self._counters.get("http_retries", 0)}',
+                f'videodl_retries_total{{kind="fragment"}} {self._counters.get("fragment_retries", 0)}',
+                f'videodl_retries_total{{kind="entry"}} {self._counters.get("entry_retries", 0)}',
+                '# HELP videodl_stage_seconds Tempo por job em cada etapa.',
+                '# TYPE videodl_stage_seconds histogram',
+            ]
+            for stage in sorted(self._stage_hist):
+                lines += self._stage_hist[stage].lines('videodl_stage_seconds', f'stage="{stage}"')
+            lines += [
+                '# HELP videodl_postprocessor_seconds_total Tempo gasto por pós-processador.',
+                '# TYPE videodl_postprocessor_seconds_total counter',
+            ]
+            lines += [f'videodl_postprocessor_seconds_total{{postprocessor="{name}"}} {secs:.6f}'
+                      for name, secs in sorted(self._pp_seconds.items())]
+            lines += [
+                '# HELP videodl_queue_wait_seconds Espera na fila até o início do job.',
+                '# TYPE videodl_queue_wait_seconds histogram',
+            ]
+            lines += self._queue_wait.lines('videodl_queue_wait_seconds')
+        return '\n'.join(lines) + '\n'
+
+    # ---------------- Exportação -----------------
+    def _export(self, record: Dict[str, Any]):
+        try:
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            if self.prometheus_path:
+                tmp = self.prometheus_path + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(self.prometheus())
+                os.replace(tmp, self.prometheus_path)
+        except OSError as e:
+            # métricas nunca derrubam um download
+            logger.warning("Falha ao exportar métricas: %s", e)
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def lines(self, name: str, labels: str = '') -> List[str]:
+        sep = ',' if labels else ''
+        out = [f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {n}'
+               for bound, n in zip(_BUCKETS, self.counts)]
+        out.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f'{{{labels}}}' if labels else ''
+        out.append(f'{name}_sum{suffix} {self.sum:.6f}')
+        out.append(f'{name}_count{suffix} {self.count}')
+        return out
+
+
+def cpu_times() -> Dict[str, float]:
+    """Segundos de CPU do processo e dos filhos já encerrados e aguardados
+    (ffmpeg do pós-processamento em linha; workers de um pool só depois do
+    shutdown)."""
+    t = os.times()
+    return {'user': t.user, 'system': t.system,
+            'children_user': t.children_user, 'children_system': t.children_system}
+
+
+def cpu_usage(before: Dict[str, float], after: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """CPU gasto entre duas leituras de cpu_times(), com o total."""
+    after = after if after is not None else cpu_times()
+    usage = {k: max(after[k] - before[k], 0.0) for k in before}
+    usage['total'] = sum(usage.values())
+    return usage
+
+
+def span_name_for(pp_key: str) -> Tuple[str, Dict[str, Any]]:
+    """Span de um pós-processador pela chave do yt-dlp (pp.pp_key())."""
+    if pp_key == 'MoveFiles':
+        return MOVE, {}
+    return POSTPROCESS, {'postprocessor': pp_key}
+
+
+__all__ = ["JobMetrics", "MetricsRegistry", "Span", "STAGES", "cpu_times", "cpu_usage"]
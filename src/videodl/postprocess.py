@@ -0,0 +1,160 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# opções do YoutubeDL que os pós-processadores consultam
+_PP_OPTIONS = ('postprocessors', 'merge_output_format', 'postprocessor_args', 'keepvideo',
+               'ffmpeg_location', 'prefer_ffmpeg', 'overwrites', 'final_ext', 'paths',
+               'outtmpl', 'writethumbnail', 'embedthumbnail', 'addmetadata')
+
+
+def postprocess_options(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Subconjunto (picklable) das opções do YoutubeDL usado no worker."""
+    opts = {k: params[k] for k in _PP_OPTIONS if k in params}
+    opts.update(quiet=True, no_warnings=True, ignoreerrors=False)
+    return opts
+
+
+def _run_postprocess(opts: Dict[str, Any], filename: str, info: Dict[str, Any],
+                     extra_pps: List[str], files_to_move: Dict[str, str]) -> Dict[str, Any]:
+    """Executa no worker: pós-processadores da etapa post_process (merge,
+    fixups, extração de áudio, thumbnail...) e a movimentação dos arquivos."""
+    import yt_dlp.postprocessor as pp_module  # type: ignore
+
+    from .metrics import JobMetrics, cpu_times, cpu_usage
+    from .ydl import tuned_youtubedl
+
+    started = time.monotonic()
+    cpu = cpu_times()
+    # spans de cada pós-processador voltam no info para o JobMetrics do job
+    metrics = JobMetrics()
+    with tuned_youtubedl()(dict(opts, job_metrics=metrics)) as ydl:
+        # merge/fixups decididos no download vêm só pelo nome da classe
+        info['__postprocessors'] = [getattr(pp_module, name)(ydl) for name in extra_pps]
+        info = ydl.post_process(filename, info, files_to_move)
+        info.pop('__postprocessors', None)
+        info = ydl.sanitize_info(info)
+    info['__postprocess_elapsed'] = time.monotonic() - started
+    info['__postprocess_spans'] = metrics.to_dict()['spans']
+    # o worker e o ffmpeg que ele aguardou (processo dedicado: só este item)
+    info['__postprocess_cpu'] = cpu_usage(cpu)['total']
+    return info
+
+
+class _PipelineFuture(Future):
+    """Future do item no pipeline; cancelar também cancela o trabalho no pool
+    se ainda não começou."""
+    inner: Optional[Future] = None
+
+    def cancel(self) -> bool:
+        if self.inner is not None:
+            self.inner.cancel()
+        return super().cancel()
+
+
+class PostProcessPipeline:
+    """Etapa de pós-processamento separada da rede.
+
+    O download (YoutubeDL de tuned_youtubedl com params['postprocess_pipeline'])
+    entrega o arquivo bruto e segue para o próximo item; o ffmpeg roda num pool
+    de processos (padrão: um por núcleo). No máximo max_pending arquivos ficam
+    aguardando: submit() bloqueia a thread de download quando a etapa de CPU
+    está atrasada (backpressure).
+
+    Pós-processadores after_move do download (archive, journal) rodam no
+    processo principal quando o item termina. cpu_seconds soma o CPU dos
+    workers (com o ffmpeg) por item; com use_processes=False fica em zero,
+    pois esse CPU já aparece no do próprio processo.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 use_processes: bool = True):
+        self.workers = max(int(workers or os.cpu_count() or 1), 1)
+        self.max_pending = max(int(max_pending or self.workers * 2), 1)
+        self.use_processes = use_processes
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.cpu_seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.use_processes:
+                    # spawn: fork de um processo com threads (Tk, workers) não é seguro
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='postprocess')
+            return self._executor
+
+    def submit(self, opts: Dict[str, Any], filename: str, info: Dict[str, Any],
+               extra_pps: List[str], files_to_move: Dict[str, str],
+               on_done: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Future:
+        """Enfileira o pós-processamento; bloqueia enquanto houver max_pending
+        itens pendentes. O Future resolve com o info final depois de on_done."""
+        self._slots.acquire()
+        result = _PipelineFuture()
+        try:
+            result.inner = self._get_executor().submit(_run_postprocess, opts, filename, info,
+                                                       extra_pps, files_to_move)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        def _complete(fut: Future):
+            self._slots.release()
+            if fut.cancelled():
+                result.cancel()
+                return
+            try:
+                final = fut.result()
+                cpu = final.pop('__postprocess_cpu', 0.0)
+                if self.use_processes:
+                    with self._lock:
+                        self.cpu_seconds += cpu
+                if on_done is not None:
+                    # mesmo com o job cancelado: o arquivo final já existe
+                    final = on_done(final)
+            except BaseException as e:
+                if not result.done():
+                    result.set_exception(e)
+            else:
+                if not result.done():
+                    result.set_result(final)
+
+        result.inner.add_done_callback(_complete)
+        return result
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+
+
+def wait_postprocessing(futures: List[Future], cancel: bool = False) -> List[BaseException]:
+    """Aguarda os pós-processamentos de um download; retorna as falhas (o
+    chamador registra, como o ignoreerrors faz no modo em linha)."""
+    errors: List[BaseException] = []
+    for fut in futures:
+        if cancel:
+            fut.cancel()
+    for fut in futures:
+        if fut.cancelled():
+            continue
+        try:
+            fut.result()
+        except Exception as e:
+            errors.append(e)
+    return errors
+
+
+__all__ = ["PostProcessPipeline", "postprocess_options", "wait_postprocessing"]
@@ -0,0 +1,241 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class PlaylistProgress:
+    """Progresso agregado de uma playlist.
+
+    Guarda a fração concluída de cada item (por playlist_index), então o
+    percentual global continua correto quando vários itens baixam em paralelo
+    e terminam fora de ordem. Um item com mais de um arquivo (merge
+    vídeo+áudio) soma os bytes por arquivo, sobre o tamanho esperado dos
+    requested_formats quando conhecido; a fração de um item nunca regride.
+    """
+
+    def __init__(self, count: int):
+        self.count = max(int(count or 0), 1)
+        self._fractions: Dict[int, float] = {}
+        # (baixado, total) por arquivo de cada item
+        self._files: Dict[int, Dict[str, Tuple[int, int]]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, index: int, d: Dict[str, Any]) -> float:
+        """Registra um dict de progresso do yt-dlp para o item e retorna o
+        percentual global (0-100)."""
+        status = d.get('status')
+        name = d.get('filename') or d.get('tmpfilename') or ''
+        total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+        downloaded = d.get('downloaded_bytes') or 0
+        with self._lock:
+            files = self._files.setdefault(index, {})
+            if status == 'finished':
+                # tamanho desconhecido: peso mínimo, mas o arquivo conta como concluído
+                size = total or downloaded or files.get(name, (0, 0))[1] or 1
+                files[name] = (size, size)
+            elif status == 'downloading' and total:
+                files[name] = (min(downloaded, total), total)
+            else:
+                return self._percent()
+            expected = max(sum(t for _, t in files.values()), _expected_bytes(d))
+            fraction = min(sum(b for b, _ in files.values()) / expected, 1.0)
+            self._fractions[index] = max(self._fractions.get(index, 0.0), fraction)
+            return self._percent()
+
+    def percent(self) -> float:
+        with self._lock:
+            return self._percent()
+
+    @property
+    def completed(self) -> int:
+        with self._lock:
+            return sum(1 for f in self._fractions.values() if f >= 1.0)
+
+    def _percent(self) -> float:
+        return sum(self._fractions.values()) / self.count * 100.0
+
+
+def _expected_bytes(d: Dict[str, Any]) -> int:
+    """Soma dos tamanhos dos formatos de um merge (0 se algum é desconhecido)."""
+    requested = (d.get('info_dict') or {}).get('requested_formats') or ()
+    sizes = [f.get('filesize') or f.get('filesize_approx') for f in requested]
+    return int(sum(sizes)) if sizes and all(sizes) else 0
+
+
+@dataclass
+class JobProgress:
+    """Último estado conhecido de um job (coalescido)."""
+    job_id: Any
+    status: str = 'pending'  # downloading / postprocessing / done / failed / cancelled
+    downloaded_bytes: int = 0
+    total_bytes: int = 0
+    speed: float = 0.0
+    eta: Optional[float] = None
+    percent: float = 0.0
+    playlist_index: Optional[int] = None
+    playlist_count: Optional[int] = None
+    updated_at: float = 0.0
+    # (baixado, total, velocidade) por arquivo: merge e itens de playlist
+    _files: Dict[str, Tuple[int, int, float]] = field(default_factory=dict, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('pending', 'downloading', 'postprocessing')
+
+
+@dataclass
+class ProgressSnapshot:
+    jobs: Dict[Any, JobProgress]
+    percent: float
+    downloaded_bytes: int
+    total_bytes: int
+    speed: float
+    eta: Optional[float]
+    active: int
+    version: int
+
+
+class ProgressBus:
+    """Camada entre os downloads e a UI.
+
+    publish() é chamado a cada callback do yt-dlp (várias vezes por segundo por
+    download) e só atualiza o estado do job — o último valor vence. A UI lê
+    snapshot()/poll() num timer próprio; assinantes de subscribe() recebem
+    snapshots no máximo max_rate vezes por segundo. Uma atualização contida
+    pelo limite sai no fim do intervalo (timer), então o último estado
+    publicado sempre chega aos assinantes.
+    """
+
+    def __init__(self, max_rate: float = 10.0):
+        self.max_rate = max_rate
+        self._jobs: Dict[Any, JobProgress] = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._polled_version = -1
+        self._last_emit = 0.0
+        self._emitted_version = -1
+        self._trailing: Optional[threading.Timer] = None
+        self._subscribers: List[Callable[[ProgressSnapshot], None]] = []
+
+    def subscribe(self, callback: Callable[[ProgressSnapshot], None]):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[ProgressSnapshot], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, job_id: Any, d: Dict[str, Any]):
+        """Registra um dict de progresso do yt-dlp para o job."""
+        status = d.get('status')
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._jobs[job_id] = JobProgress(job_id)
+            name = d.get('filename') or d.get('tmpfilename') or ''
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            downloaded = d.get('downloaded_bytes') or 0
+            if status == 'downloading':
+                job.status = 'downloading'
+                job._files[name] = (downloaded, total, d.get('speed') or 0.0)
+            elif status == 'finished':
+                total = total or downloaded
+                job._files[name] = (total, total, 0.0)
+                # arquivo pronto; pode haver merge/pós-processamento ou outros itens
+                job.status = 'postprocessing'
+            job.downloaded_bytes = sum(f[0] for f in job._files.values())
+            job.total_bytes = sum(f[1] for f in job._files.values())
+            job.speed = sum(f[2] for f in job._files.values())
+            if d.get('playlist_percent') is not None:
+                job.percent = d['playlist_percent']
+            elif job.total_bytes:
+                job.percent = min(job.downloaded_bytes / job.total_bytes * 100.0, 100.0)
+            job.eta = d.get('eta') if status == 'downloading' else None
+            job.playlist_index = d.get('playlist_index') or job.playlist_index
+            job.playlist_count = d.get('playlist_count') or job.playlist_count
+            job.updated_at = time.monotonic()
+            self._version += 1
+        self._maybe_emit()
+
+    def finish(self, job_id: Any, status: str = 'done'):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._jobs[job_id] = JobProgress(job_id)
+            job.status = status
+            job.speed = 0.0
+            job.eta = None
+            if status == 'done':
+                job.percent = 100.0
+            self._version += 1
+        self._maybe_emit(force=True)
+
+    def remove(self, job_id: Any):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._version += 1
+
+    def clear_finished(self):
+        with self._lock:
+            for key in [k for k, j in self._jobs.items() if not j.active]:
+                del self._jobs[key]
+            self._version += 1
+
+    def snapshot(self) -> ProgressSnapshot:
+        with self._lock:
+            return self._snapshot()
+
+    def poll(self) -> Optional[ProgressSnapshot]:
+        """Snapshot se algo mudou desde o último poll(), senão None."""
+        with self._lock:
+            if self._version == self._polled_version:
+                return None
+            self._polled_version = self._version
+            return self._snapshot()
+
+    def _snapshot(self) -> ProgressSnapshot:
+        jobs = {k: JobProgress(**{f: getattr(j, f) for f in (
+            'job_id', 'status', 'downloaded_bytes', 'total_bytes', 'speed', 'eta',
+            'percent', 'playlist_index', 'playlist_count', 'updated_at')}) for k, j in self._jobs.items()}
+        active = [j for j in jobs.values() if j.active]
+        considered = active or list(jobs.values())
+        percent = (sum(j.percent for j in considered) / len(considered)) if considered else 0.0
+        downloaded = sum(j.downloaded_bytes for j in active)
+        total = sum(j.total_bytes for j in active)
+        speed = sum(j.speed for j in active)
+        eta = (total - downloaded) / speed if speed and total > downloaded else None
+        return ProgressSnapshot(jobs=jobs, percent=percent, downloaded_bytes=downloaded,
+                                total_bytes=total, speed=speed, eta=eta,
+                                active=len(active), version=self._version)
+
+    def _maybe_emit(self, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if not self._subscribers:
+                return
+            wait = (1.0 / self.max_rate - (now - self._last_emit)) if self.max_rate else 0.0
+            if not force and wait > 0:
+                if self._trailing is None:
+                    # emissão atrasada para o fim do intervalo com o estado de então
+                    self._trailing = threading.Timer(wait, self._emit_trailing)
+                    self._trailing.daemon = True
+                    self._trailing.start()
+                return
+            self._last_emit = now
+            self._emitted_version = self._version
+            snap = self._snapshot()
+            subscribers = list(self._subscribers)
+        for cb in subscribers:
+            cb(snap)
+
+    def _emit_trailing(self):
+        with self._lock:
+            self._trailing = None
+            if self._version == self._emitted_version:
+                return  # uma emissão forçada já levou o estado atual
+        self._maybe_emit(force=True)
+
+
+__all__ = ["PlaylistProgress", "ProgressBus", "ProgressSnapshot", "JobProgress"]
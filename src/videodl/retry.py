@@ -0,0 +1,273 @@
+import random
+import re
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set
+
+# classes de erro (classify)
+CANCELLED = 'cancelled'
+HTTP_5XX = 'http_5xx'
+RATE_LIMITED = 'rate_limited'  # HTTP 429
+FORBIDDEN = 'forbidden'  # HTTP 403: URL assinada expirada ou formato bloqueado
+NOT_FOUND = 'not_found'  # HTTP 404/410
+TIMEOUT = 'timeout'
+NETWORK = 'network'  # conexão recusada/resetada, leitura incompleta, TLS
+UNAVAILABLE = 'unavailable'  # vídeo privado/removido/bloqueado (erro esperado do extrator)
+FORMAT = 'format'  # formato pedido não existe
+POSTPROCESS = 'postprocess'
+DISK = 'disk'
+OTHER = 'other'
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Como repetir um item após uma classe de erro.
+
+    retries: novas tentativas após a primeira falha. A espera antes da
+    tentativa n é min(cap, base * 2**(n-1)) com jitter: a fração jitter dela é
+    sorteada (1.0 = "full jitter"), o que espalha itens que falharam juntos.
+    failover: cada nova tentativa exclui os formatos que falharam, então o
+    seletor do yt-dlp cai no próximo formato do ranking.
+    """
+    retries: int = 0
+    base: float = 1.0
+    cap: float = 30.0
+    jitter: float = 1.0
+    failover: bool = False
+
+    def delay(self, attempt: int, rng: Optional[random.Random] = None) -> float:
+        wait = min(self.cap, self.base * 2 ** max(attempt - 1, 0))
+        return wait * (1.0 - self.jitter) + (rng or random).uniform(0.0, wait * self.jitter)
+
+
+NO_RETRY = RetryPolicy()
+
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    HTTP_5XX: RetryPolicy(retries=4, base=2.0, cap=60.0),
+    RATE_LIMITED: RetryPolicy(retries=5, base=10.0, cap=300.0),
+    TIMEOUT: RetryPolicy(retries=4, base=1.0, cap=30.0),
+    NETWORK: RetryPolicy(retries=4, base=1.0, cap=30.0),
+    FORBIDDEN: RetryPolicy(retries=2, base=0.5, cap=5.0, failover=True),
+}
+
+
+class RetryPolicies:
+    """Política por classe de erro; classes sem política não são repetidas."""
+
+    def __init__(self, policies: Optional[Mapping[str, RetryPolicy]] = None,
+                 rng: Optional[random.Random] = None):
+        self.policies = dict(DEFAULT_POLICIES if policies is None else policies)
+        self.rng = rng
+
+    def get(self, error_class: str) -> RetryPolicy:
+        return self.policies.get(error_class, NO_RETRY)
+
+    def delay(self, error_class: str, attempt: int) -> float:
+        return self.get(error_class).delay(attempt, self.rng)
+
+    def with_retries(self, retries: int) -> 'RetryPolicies':
+        """Mesmas esperas com outro número de tentativas (0 desativa)."""
+        return RetryPolicies({k: replace(p, retries=retries) for k, p in self.policies.items()},
+                             self.rng)
+
+
+_HTTP_RE = re.compile(r'HTTP Error (\d{3})')
+_NETWORK_NAMES = {'TransportError', 'IncompleteRead', 'ContentTooShortError', 'SSLError',
+                  'ProxyError', 'ConnectionError', 'ConnectionResetError',
+                  'ConnectionRefusedError', 'ConnectionAbortedError', 'BrokenPipeError',
+                  'RemoteDisconnected'}
+
+
+def _chain(exc: Optional[BaseException]) -> Iterator[BaseException]:
+    """A exceção e as que ela embrulha (exc_info do DownloadError, cause do
+    yt-dlp, __cause__/__context__)."""
+    seen: Set[int] = set()
+    pending = [exc]
+    while pending:
+        e = pending.pop(0)
+        if e is None or id(e) in seen:
+            continue
+        seen.add(id(e))
+        yield e
+        exc_info = getattr(e, 'exc_info', None)
+        if isinstance(exc_info, tuple) and len(exc_info) > 1:
+            pending.append(exc_info[1])
+        cause = getattr(e, 'cause', None)
+        if isinstance(cause, BaseException):
+            pending.append(cause)
+        pending += [e.__cause__, e.__context__]
+
+
+def _http_class(status: int) -> Optional[str]:
+    if status == 429:
+        return RATE_LIMITED
+    if status == 403:
+        return FORBIDDEN
+    if status in (404, 410):
+        return NOT_FOUND
+    if 500 <= status < 600:
+        return HTTP_5XX
+    return None
+
+
+def classify(exc: Optional[BaseException], message: str = '') -> str:
+    """Classe de erro de uma falha do yt-dlp (ver constantes do módulo).
+
+    Sem importar o yt-dlp: usa nomes de classe e atributos (status/code das
+    respostas HTTP, expected dos ExtractorError) e, por último, o texto.
+    """
+    from .downloader import DownloadCancelled
+
+    chain = list(_chain(exc))
+    for e in chain:
+        if isinstance(e, DownloadCancelled) or type(e).__name__ == 'DownloadCancelled':
+            return CANCELLED
+    for e in chain:
+        status = getattr(e, 'status', None) or getattr(e, 'code', None)
+        if isinstance(status, int) and _http_class(status):
+            return _http_class(status)
+    for e in chain:
+        name = type(e).__name__
+        if isinstance(e, TimeoutError) or 'timed out' in str(e).lower():
+            return TIMEOUT
+        if name in _NETWORK_NAMES or isinstance(e, ConnectionError):
+            return NETWORK
+        if name == 'PostProcessingError':
+            return POSTPROCESS
+        if isinstance(e, OSError) and getattr(e, 'errno', None) in (28, 122):  # ENOSPC, EDQUOT
+            return DISK
+    text = ' '.join([message] + [str(e) for e in chain])
+    m = _HTTP_RE.search(text)
+    if m and _http_class(int(m.group(1))):
+        return _http_class(int(m.group(1)))
+    lowered = text.lower()
+    if 'timed out' in lowered:
+        return TIMEOUT
+    if 'requested format is not available' in lowered:
+        return FORMAT
+    if any(getattr(e, 'expected', False) for e in chain) or 'unavailable' in lowered \
+            or 'private video' in lowered:
+        return UNAVAILABLE
+    return OTHER
+
+
+@dataclass
+class EntryFailure:
+    """Falha de um item (ou do vídeo do job) e o que foi feito com ela.
+
+    status: 'failed' (ainda não tratada), 'recovered' (uma nova tentativa
+    deu certo), 'skipped' (item de playlist abandonado) ou 'fatal' (o job
+    falhou por ela).
+    """
+    url: str
+    error_class: str
+    message: str
+    id: Optional[str] = None
+    title: Optional[str] = None
+    playlist_index: Optional[int] = None
+    attempts: int = 1
+    status: str = 'failed'
+    format_ids: List[str] = field(default_factory=list)  # da tentativa que falhou
+    excluded_formats: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)  # classe de cada tentativa
+    extra_info: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @property
+    def is_entry(self) -> bool:
+        return self.playlist_index is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        # sem os dados "smuggled" do yt-dlp: as novas tentativas usam self.url, em memória
+        return {'url': self.url.split('#__youtubedl_smuggle=')[0], 'id': self.id, 'title': self.title,
+                'playlist_index': self.playlist_index, 'status': self.status,
+                'error_class': self.error_class, 'message': self.message,
+                'attempts': self.attempts, 'errors': list(self.errors),
+                'excluded_formats': list(self.excluded_formats)}
+
+
+class FailureReport:
+    """Falhas de um job: itens pulados, recuperados e retentativas.
+
+    Preenchido pelo YoutubeDL do videodl (params['failure_report']) com o
+    que o ignoreerrors do yt-dlp engoliria, e atualizado pelas novas
+    tentativas de VideoDownloader.download. Thread-safe.
+    """
+
+    def __init__(self):
+        self._failures: List[EntryFailure] = []
+        self._lock = threading.Lock()
+        self.retries = 0
+
+    def record(self, context: Dict[str, Any], exc: Optional[BaseException],
+               message: str = '') -> Optional[EntryFailure]:
+        """Registra a falha do item em context (url, id, title,
+        playlist_index, format_id, extra_info). Cancelamentos não são falhas."""
+        error_class = classify(exc, message)
+        if error_class == CANCELLED:
+            return None
+        url = context.get('webpage_url') or context.get('url') or ''
+        format_ids = [i for i in str(context.get('format_id') or '').split('+') if i]
+        with self._lock:
+            for failure in self._failures:
+                # o yt-dlp pode reportar o mesmo item mais de uma vez
+                if failure.status == 'failed' and failure.url == url:
+                    return failure
+            failure = EntryFailure(
+                url=url, error_class=error_class, message=_clean(message or str(exc or '')),
+                id=context.get('id'), title=context.get('title'),
+                playlist_index=context.get('playlist_index'), format_ids=format_ids,
+                errors=[error_class], extra_info=dict(context.get('extra_info') or {}))
+            self._failures.append(failure)
+        return failure
+
+    def attempt_failed(self, failure: EntryFailure, exc: BaseException,
+                       format_id: Optional[str] = None):
+        with self._lock:
+            failure.attempts += 1
+            failure.error_class = classify(exc)
+            failure.message = _clean(str(exc))
+            failure.errors.append(failure.error_class)
+            failure.format_ids = [i for i in str(format_id or '').split('+') if i]
+
+    def count_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def resolve(self, failure: EntryFailure, status: str):
+        with self._lock:
+            failure.status = status
+
+    def add(self, failure: EntryFailure):
+        with self._lock:
+            self._failures.append(failure)
+
+    def unresolved(self) -> List[EntryFailure]:
+        with self._lock:
+            return [f for f in self._failures if f.status == 'failed']
+
+    def failures(self, status: Optional[str] = None) -> List[EntryFailure]:
+        with self._lock:
+            return [f for f in self._failures if status is None or f.status == status]
+
+    @property
+    def skipped(self) -> List[EntryFailure]:
+        return self.failures('skipped')
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = [f.to_dict() for f in self._failures]
+            retries = self.retries
+        return {'retries': retries,
+                'skipped': sum(1 for f in failures if f['status'] == 'skipped'),
+                'recovered': sum(1 for f in failures if f['status'] == 'recovered'),
+                'failures': failures}
+
+
+def _clean(message: str) -> str:
+    # mensagens do yt-dlp vêm com prefixo/cores de terminal
+    message = re.sub(r'\x1b\[[0-9;]*m', '', message)
+    return re.sub(r'^ERROR:\s*', '', message.strip())
+
+
+__all__ = ["RetryPolicy", "RetryPolicies", "DEFAULT_POLICIES", "FailureReport", "EntryFailure",
+           "classify"]
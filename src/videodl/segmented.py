@@ -0,0 +1,448 @@
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)', re.I)
+
+
+class SegmentError(Exception):
+    """Falha ao baixar um segmento (esgotadas as tentativas) ou resposta
+    inconsistente do servidor."""
+
+
+@dataclass
+class SegmentedResult:
+    url: str
+    filename: str
+    total_bytes: int
+    downloaded_bytes: int  # baixados nesta execução (sem os retomados)
+    resumed_bytes: int
+    connections: int
+    segments: int
+    ranged: bool  # False = servidor ignorou Range (uma conexão só)
+    elapsed: float
+    retries: int = 0  # novas tentativas de segmentos
+
+    @property
+    def speed(self) -> float:
+        return self.downloaded_bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass
+class _Segment:
+    start: int
+    end: int  # exclusivo
+    pos: int = 0
+
+    def __post_init__(self):
+        self.pos = self.pos or self.start
+
+    @property
+    def remaining(self) -> int:
+        return self.end - self.pos
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(r for r in ranges if r[1] > r[0]):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _missing_ranges(total: int, done: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    missing = []
+    pos = 0
+    for start, end in _merge_ranges(done):
+        if start > pos:
+            missing.append((pos, start))
+        pos = max(pos, end)
+    if pos < total:
+        missing.append((pos, total))
+    return missing
+
+
+def _preallocate(path: str, size: int):
+    """Cria/ajusta o arquivo com o tamanho final; os segmentos escrevem direto
+    nos seus offsets."""
+    mode = 'r+b' if os.path.exists(path) else 'wb'
+    with open(path, mode) as f:
+        if hasattr(os, 'posix_fallocate') and size:
+            try:
+                # reserva os blocos de fato (evita ENOSPC no meio e fragmentação)
+                os.posix_fallocate(f.fileno(), 0, size)
+            except OSError:
+                f.truncate(size)
+        else:
+            f.truncate(size)
+        if os.path.getsize(path) > size:
+            f.truncate(size)
+
+
+class SegmentedDownloader:
+    """Baixa um arquivo HTTP em faixas de bytes (Range) paralelas.
+
+    O arquivo de destino é pré-alocado com o tamanho final e cada conexão
+    escreve no seu offset (sem remontar em memória). As conexões vêm de um
+    único requests.Session (pool do urllib3) reaproveitado por todos os
+    segmentos. Os segmentos são menores que o arquivo/conexões, então conexões
+    mais rápidas pegam mais segmentos.
+
+    Se o servidor ignorar Range (200 em vez de 206) o corpo da própria
+    sondagem é gravado sequencialmente em uma conexão.
+
+    O progresso dos segmentos fica em `<arquivo>.segments` e permite retomar;
+    um arquivo parcial sem esse registro (.part do downloader do yt-dlp) é
+    tratado como prefixo já baixado.
+    """
+
+    STATE_SUFFIX = '.segments'
+
+    def __init__(self, connections: int = 4, min_segment_size: int = 1024 * 1024,
+                 chunk_size: int = 64 * 1024, retries: int = 3, timeout: float = 20.0,
+                 headers: Optional[Dict[str, str]] = None, session=None,
+                 progress_interval: float = 0.25, state_interval: float = 2.0,
+                 throttle: Optional[Callable[[int], None]] = None):
+        self.connections = max(int(connections), 1)
+        self.min_segment_size = max(int(min_segment_size), 1)
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.progress_interval = progress_interval
+        self.state_interval = state_interval
+        # chamado com o tamanho de cada bloco recebido (pode bloquear: limite de banda)
+        self.throttle = throttle
+        self._own_session = session is None
+        self.session = session if session is not None else new_session(self.connections)
+
+    def close(self):
+        if self._own_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------- API -----------------
+    def download(self, url: str, filename: str,
+                 progress_cb: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 resume: bool = True) -> SegmentedResult:
+        """Baixa url para filename. progress_cb recebe dicts no formato dos
+        hooks do yt-dlp (status/downloaded_bytes/total_bytes/speed/eta/elapsed)
+        no máximo a cada progress_interval segundos; uma exceção levantada nele
+        interrompe o download (o estado fica salvo para retomar)."""
+        started = time.monotonic()
+        probe = self._request(url, {'Range': 'bytes=0-0'}, stream=True)
+        try:
+            total = self._probe_total(probe)
+            if total is None:
+                if probe.status_code == 206:
+                    # 206 sem tamanho total: pede o arquivo inteiro
+                    probe.close()
+                    probe = self._request(url, {})
+                return self._single(url, filename, probe, progress_cb, started)
+        finally:
+            probe.close()
+
+        done = self._load_state(filename, total) if resume else []
+        # o registro precede a pré-alocação: um arquivo do tamanho final sem
+        # registro seria confundido com um .part completo
+        self._save_state(filename, total, done)
+        _preallocate(filename, total)
+        resumed = sum(e - s for s, e in done)
+        segments = self._plan(_missing_ranges(total, done))
+        workers = min(self.connections, len(segments)) or 1
+        retries = 0
+        if segments:
+            retries = self._run(url, filename, total, segments, done, workers, progress_cb,
+                                started, resumed)
+        self._clear_state(filename)
+        elapsed = time.monotonic() - started
+        return SegmentedResult(url=url, filename=filename, total_bytes=total,
+                               downloaded_bytes=total - resumed, resumed_bytes=resumed,
+                               connections=workers, segments=len(segments), ranged=True,
+                               elapsed=elapsed, retries=retries)
+
+    # ---------------- Internos -----------------
+    def _request(self, url: str, extra: Dict[str, str], stream: bool = True):
+        headers = dict(self.headers)
+        headers['Accept-Encoding'] = 'identity'  # offsets precisam ser do corpo bruto
+        headers.update(extra)
+        resp = self.session.get(url, headers=headers, stream=stream, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp
+
+    @staticmethod
+    def _probe_total(resp) -> Optional[int]:
+        if resp.status_code != 206:
+            return None
+        m = _CONTENT_RANGE.match(resp.headers.get('Content-Range', ''))
+        if not m or m.group(3) == '*':
+            return None
+        return int(m.group(3))
+
+    def _plan(self, missing: List[Tuple[int, int]]) -> List[_Segment]:
+        """Divide as faixas faltantes em segmentos de tamanho parecido:
+        ~4 por conexão, nunca menores que min_segment_size."""
+        remaining = sum(e - s for s, e in missing)
+        if not remaining:
+            return []
+        target = max(self.min_segment_size, -(-remaining // (self.connections * 4)))
+        segments = []
+        for start, end in missing:
+            count = max(1, round((end - start) / target))
+            size = -(-(end - start) // count)
+            for s in range(start, end, size):
+                segments.append(_Segment(s, min(s + size, end)))
+        return segments
+
+    def _run(self, url: str, filename: str, total: int, segments: List[_Segment],
+             done: List[Tuple[int, int]], workers: int,
+             progress_cb: Optional[Callable[[Dict[str, Any]], None]],
+             started: float, resumed: int) -> int:
+        """Baixa os segmentos; retorna quantas novas tentativas foram feitas."""
+        stop = threading.Event()
+        lock = threading.Lock()
+        finished: List[Tuple[int, int]] = list(done)
+        retries = [0]
+
+        def _fetch(seg: _Segment):
+            attempt = 0
+            with open(filename, 'r+b') as f:
+                while seg.remaining > 0:
+                    if stop.is_set():
+                        return
+                    try:
+                        resp = self._request(url, {'Range': f'bytes={seg.pos}-{seg.end - 1}'})
+                        with resp:
+                            if resp.status_code != 206:
+                                raise SegmentError(f"servidor respondeu {resp.status_code} a um Range")
+                            m = _CONTENT_RANGE.match(resp.headers.get('Content-Range', ''))
+                            if not m or int(m.group(1)) != seg.pos or (
+                                    m.group(3) != '*' and int(m.group(3)) != total):
+                                raise SegmentError("Content-Range inconsistente (arquivo mudou?)")
+                            f.seek(seg.pos)
+                            for chunk in resp.iter_content(self.chunk_size):
+                                if stop.is_set():
+                                    return
+                                chunk = chunk[:seg.remaining]
+                                f.write(chunk)
+                                with lock:
+                                    seg.pos += len(chunk)
+                                if self.throttle is not None:
+                                    self.throttle(len(chunk))
+                                if not seg.remaining:
+                                    break
+                        if seg.remaining:
+                            raise SegmentError("conexão encerrada antes do fim do segmento")
+                    except SegmentError:
+                        raise
+                    except Exception as e:
+                        attempt += 1
+                        with lock:
+                            retries[0] += 1
+                        if attempt > self.retries:
+                            raise SegmentError(f"segmento {seg.start}-{seg.end}: {e}") from e
+                        logger.debug("Segmento %d-%d: %s; tentativa %d", seg.start, seg.end, e, attempt)
+                        time.sleep(min(0.5 * 2 ** (attempt - 1), 5.0))
+            with lock:
+                finished.append((seg.start, seg.end))
+
+        def _ranges() -> List[Tuple[int, int]]:
+            with lock:
+                return finished + [(s.start, s.pos) for s in segments if s.pos > s.start]
+
+        last_state = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='segment')
+        futures = [pool.submit(_fetch, seg) for seg in segments]
+        try:
+            pending = set(futures)
+            while pending:
+                completed, pending = wait(pending, timeout=self.progress_interval,
+                                          return_when=FIRST_EXCEPTION)
+                for fut in completed:
+                    fut.result()  # propaga SegmentError
+                now = time.monotonic()
+                if now - last_state >= self.state_interval:
+                    self._save_state(filename, total, _ranges())
+                    last_state = now
+                if progress_cb and pending:
+                    with lock:
+                        got = sum(s.pos - s.start for s in segments)
+                    elapsed = now - started
+                    speed = got / elapsed if elapsed > 0 else None
+                    downloaded = resumed + got
+                    progress_cb({
+                        'status': 'downloading',
+                        'downloaded_bytes': downloaded,
+                        'total_bytes': total,
+                        'speed': speed,
+                        'eta': (total - downloaded) / speed if speed else None,
+                        'elapsed': elapsed,
+                    })
+        except BaseException:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            self._save_state(filename, total, _ranges())
+            raise
+        pool.shutdown(wait=True)
+        return retries[0]
+
+    def _single(self, url: str, filename: str, resp,
+                progress_cb: Optional[Callable[[Dict[str, Any]], None]],
+                started: float) -> SegmentedResult:
+        """Fallback sem Range: grava a resposta (200) sequencialmente."""
+        logger.info("Servidor não aceita Range; baixando em uma conexão: %s", url)
+        total = int(resp.headers.get('Content-Length') or 0) or None
+        got = 0
+        last = 0.0
+        self._clear_state(filename)
+        with open(filename, 'wb') as f:
+            for chunk in resp.iter_content(self.chunk_size):
+                f.write(chunk)
+                got += len(chunk)
+                if self.throttle is not None:
+                    self.throttle(len(chunk))
+                now = time.monotonic()
+                if progress_cb and now - last >= self.progress_interval:
+                    last = now
+                    elapsed = now - started
+                    speed = got / elapsed if elapsed > 0 else None
+                    progress_cb({'status': 'downloading', 'downloaded_bytes': got,
+                                 'total_bytes': total, 'speed': speed,
+                                 'eta': (total - got) / speed if speed and total else None,
+                                 'elapsed': elapsed})
+        if total is not None and got != total:
+            raise SegmentError(f"recebidos {got} de {total} bytes")
+        return SegmentedResult(url=url, filename=filename, total_bytes=got, downloaded_bytes=got,
+                               resumed_bytes=0, connections=1, segments=1, ranged=False,
+                               elapsed=time.monotonic() - started)
+
+    # ---------------- Estado para retomar -----------------
+    def _state_path(self, filename: str) -> str:
+        return filename + self.STATE_SUFFIX
+
+    def _load_state(self, filename: str, total: int) -> List[Tuple[int, int]]:
+        if not os.path.exists(filename):
+            return []
+        try:
+            with open(self._state_path(filename), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            # .part sequencial (downloader padrão): o prefixo já está gravado
+            size = min(os.path.getsize(filename), total)
+            return [(0, size)] if size else []
+        except ValueError:
+            return []
+        if state.get('total') != total:
+            return []  # arquivo remoto mudou: recomeça
+        return _merge_ranges([(int(s), int(e)) for s, e in state.get('done') or []])
+
+    def _save_state(self, filename: str, total: int, ranges: List[Tuple[int, int]]):
+        path = self._state_path(filename)
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'total': total, 'done': _merge_ranges(ranges)}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Falha ao salvar estado dos segmentos: %s", e)
+
+    def _clear_state(self, filename: str):
+        try:
+            os.remove(self._state_path(filename))
+        except FileNotFoundError:
+            pass
+
+
+def new_session(connections: int = 4, proxy: Optional[str] = None, cookies=None):
+    """requests.Session com pool dimensionado para as conexões paralelas."""
+    import requests  # type: ignore
+    from requests.adapters import HTTPAdapter  # type: ignore
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(connections, 1))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if proxy:
+        session.proxies = {'http': proxy, 'https': proxy}
+    if cookies is not None:
+        session.cookies = cookies
+    return session
+
+
+def _segmentable(info_dict: Dict[str, Any]) -> bool:
+    headers = info_dict.get('http_headers') or {}
+    return (info_dict.get('protocol') in ('http', 'https')
+            and not info_dict.get('request_data')
+            and info_dict.get('impersonate') is None
+            and not any(k.lower() == 'range' for k in headers))
+
+
+@functools.lru_cache(maxsize=None)
+def segmented_http_fd():
+    """FileDownloader do yt-dlp (subclasse do HttpFD) que usa
+    SegmentedDownloader quando params['http_connections'] > 1."""
+    from yt_dlp.downloader.http import HttpFD  # type: ignore
+
+    class SegmentedHttpFD(HttpFD):
+        def real_download(self, filename, info_dict):
+            connections = int(self.params.get('http_connections') or 1)
+            if connections <= 1 or not _segmentable(info_dict):
+                return super().real_download(filename, info_dict)
+            tmpfilename = self.temp_name(filename)
+            self.report_destination(filename)
+
+            throttle = self.params.get('bandwidth_throttle')
+
+            def _progress(d):
+                # bytes já contabilizados no limite de banda pelos workers
+                d.update(filename=filename, tmpfilename=tmpfilename, throttled=throttle is not None)
+                self._hook_progress(d, info_dict)
+
+            session = new_session(connections, proxy=self.params.get('proxy'),
+                                  cookies=self.ydl.cookiejar)
+            seg = SegmentedDownloader(connections, headers=dict(info_dict.get('http_headers') or {}),
+                                      session=session,
+                                      throttle=throttle.consume if throttle is not None else None,
+                                      retries=self.params.get('retries') or 3,
+                                      timeout=self.params.get('socket_timeout') or 20.0)
+            try:
+                result = seg.download(info_dict['url'], tmpfilename, progress_cb=_progress,
+                                      resume=self.params.get('continuedl', True))
+            finally:
+                session.close()
+            if self.params.get('job_metrics') is not None:
+                self.params['job_metrics'].incr('http_retries', result.retries)
+            logger.debug("%s: %d bytes, %d conexões, %d segmentos, %.1fs",
+                          filename, result.total_bytes, result.connections, result.segments,
+                          result.elapsed)
+            self.try_rename(tmpfilename, filename)
+            self._hook_progress({
+                'status': 'finished',
+                'downloaded_bytes': result.total_bytes,
+                'total_bytes': result.total_bytes,
+                'filename': filename,
+                'elapsed': result.elapsed,
+            }, info_dict)
+            return True
+
+    return SegmentedHttpFD
+
+
+__all__ = ["SegmentedDownloader", "SegmentedResult", "SegmentError", "new_session",
+           "segmented_http_fd"]
@@ -0,0 +1,552 @@
+"""Modo serviço: API HTTP/JSON para enviar e acompanhar jobs remotamente.
+
+Uso:
+    python -m videodl.cli serve -o /srv/videos --host 0.0.0.0 --port 8080 --token SEGREDO
+
+Endpoints (JSON; com --token exigem "Authorization: Bearer <token>"):
+    POST   /jobs               cria um job (ou uma lista) com as chaves do lote JSONL
+    GET    /jobs[?state=...]   lista os jobs
+    GET    /jobs/<id>          estado, bytes e progresso de um job
+    DELETE /jobs/<id>          cancela (também POST /jobs/<id>/cancel)
+    GET    /events             progresso de todos os jobs (server-sent events)
+    GET    /jobs/<id>/events   progresso de um job; termina quando ele finaliza
+    GET    /metrics            métricas no formato texto do Prometheus
+    GET    /health             sem autenticação
+
+Os downloads rodam no pool de workers de um DownloadQueue compartilhado; as
+conexões HTTP (keep-alive e streams SSE) são atendidas por um único event
+loop asyncio, então muitos clientes consultando estado não custam uma thread
+cada. Não importa tkinter.
+"""
+import argparse
+import asyncio
+import contextlib
+import hmac
+import json
+import logging
+import os
+import re
+import signal
+import sys
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .archive import DownloadArchive
+from .bandwidth import BandwidthScheduler
+from .cli import JOB_OPTIONS, check_spec, parse_rate, parse_size
+from .downloader import VideoDownloader
+from .formats import PROFILES
+from .jobs import DownloadJob, DownloadQueue, JobState
+from .journal import JobJournal
+from .metrics import MetricsRegistry
+from .postprocess import PostProcessPipeline
+from .progress import ProgressBus
+from .sessions import SessionPool
+from .storage import DEFAULT_MIN_FREE, StorageManager
+from .sync import SyncStore
+from .ydl import preload_ytdlp
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 1 << 20
+MAX_HEADER = 64 * 1024
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    version: str
+    headers: Dict[str, str]
+    body: bytes = b''
+
+    @property
+    def keep_alive(self) -> bool:
+        conn = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return conn == 'keep-alive'
+        return conn != 'close'
+
+    def json(self) -> Any:
+        try:
+            return json.loads(self.body or b'null')
+        except ValueError as e:
+            raise HttpError(400, f"JSON inválido: {e}")
+
+
+class ApiServer:
+    """Servidor da API sobre um DownloadQueue.
+
+    output_dir é a raiz dos downloads: o output_dir de cada job, se
+    informado, é um subdiretório relativo a ela. O progresso chega pelo
+    ProgressBus (coalescido, no máximo progress_rate snapshots/s) e acorda os
+    streams SSE pelo event loop; heartbeat é o intervalo dos comentários de
+    keep-alive dos streams e idle_timeout fecha conexões keep-alive ociosas.
+    """
+
+    def __init__(self, output_dir: str = '.', concurrency: int = 2,
+                 downloader: Optional[VideoDownloader] = None,
+                 bandwidth: Optional[BandwidthScheduler] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 defaults: Optional[Dict[str, Any]] = None,
+                 host: str = '127.0.0.1', port: int = 8080, token: Optional[str] = None,
+                 progress_rate: float = 4.0, heartbeat: float = 15.0, idle_timeout: float = 75.0):
+        self.output_dir = os.path.realpath(output_dir)
+        self.defaults = defaults or {}
+        self.host = host
+        self.port = port
+        self.token = token
+        self.heartbeat = heartbeat
+        self.idle_timeout = idle_timeout
+        self.metrics = metrics
+        self.bus = ProgressBus(max_rate=progress_rate)
+        self.queue = DownloadQueue(concurrency=concurrency, downloader=downloader,
+                                   on_progress=self._on_progress, on_state=self._on_state,
+                                   bandwidth=bandwidth, metrics=metrics)
+        self.bus.subscribe(lambda _snap: self._poke())
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: set = set()
+        self._stopped: Optional[asyncio.Event] = None
+
+    # ---------------- Ciclo de vida -----------------
+    async def start(self) -> 'ApiServer':
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=MAX_HEADER)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("API em http://%s:%d", self.host, self.port)
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._stopped.wait()
+
+    async def close(self, cancel_jobs: bool = True):
+        """Para de aceitar conexões, fecha as abertas e encerra a fila.
+        Com cancel_jobs, o journal do downloader é fechado antes de cancelar:
+        os jobs interrompidos continuam pendentes e são retomados na próxima
+        execução (como após uma queda)."""
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        journal = getattr(self.queue.downloader, 'journal', None)
+        if cancel_jobs and journal is not None:
+            # sem o registro de fim 'cancelled' dos downloads interrompidos
+            journal.close()
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self.queue.shutdown(wait=True, cancel_pending=cancel_jobs))
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def stop(self):
+        """Pede o encerramento de serve_forever (seguro a partir de sinais)."""
+        if self._stopped is not None:
+            self._stopped.set()
+
+    # ---------------- Jobs -----------------
+    def submit(self, spec: Any) -> DownloadJob:
+        try:
+            spec = check_spec(spec)
+            priority = int(spec.get('priority') or 0)
+            weight = float(spec.get('weight') or 1.0)
+        except (TypeError, ValueError) as e:
+            raise HttpError(400, str(e))
+        dest = self._resolve_output(spec.get('output_dir'))
+        options = {k: spec[k] for k in JOB_OPTIONS if k in spec}
+        for k, v in self.defaults.items():
+            options.setdefault(k, v)
+        os.makedirs(dest, exist_ok=True)
+        try:
+            return self.queue.submit(spec['url'], dest, priority=priority, weight=weight,
+                                     rate_limit=spec.get('rate_limit'), **options)
+        except RuntimeError as e:
+            raise HttpError(503, str(e))
+
+    def job_view(self, job: DownloadJob, progress=None) -> Dict[str, Any]:
+        data = job.to_dict()
+        if progress is None:
+            progress = self.bus.snapshot().jobs.get(job.id)
+        if progress is not None:
+            data['progress'] = {
+                'status': progress.status, 'percent': round(progress.percent, 2),
+                'downloaded_bytes': progress.downloaded_bytes, 'total_bytes': progress.total_bytes,
+                'speed': progress.speed, 'eta': progress.eta,
+                'playlist_index': progress.playlist_index, 'playlist_count': progress.playlist_count,
+            }
+        return data
+
+    def _resolve_output(self, sub: Any) -> str:
+        if not sub:
+            return self.output_dir
+        if not isinstance(sub, str) or os.path.isabs(sub):
+            raise HttpError(400, "output_dir deve ser um caminho relativo à raiz do servidor")
+        dest = os.path.realpath(os.path.join(self.output_dir, sub))
+        if os.path.commonpath([dest, self.output_dir]) != self.output_dir:
+            raise HttpError(400, "output_dir fora da raiz do servidor")
+        return dest
+
+    def _on_progress(self, job: DownloadJob, d: Dict[str, Any]):
+        self.bus.publish(job.id, d)
+
+    def _on_state(self, job: DownloadJob):
+        if job.state in JobState.FINAL:
+            self.bus.finish(job.id, job.state)
+        else:
+            self._poke()
+
+    def _poke(self):
+        # chamado nas threads dos workers: acorda os streams no event loop
+        if self._loop is None:
+            return
+        with contextlib.suppress(RuntimeError):  # loop encerrado
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    # ---------------- HTTP -----------------
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                except HttpError as e:
+                    await self._send_json(writer, e.status, {'error': e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                if not await self._dispatch(request, writer):
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.exception("Erro na conexão da API")
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HttpError(400, "requisição incompleta")
+            return None  # cliente fechou a conexão keep-alive
+        except asyncio.LimitOverrunError:
+            raise HttpError(431, "cabeçalhos grandes demais")
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+            raise HttpError(400, "linha de requisição inválida")
+        method, target, version = parts
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        if 'transfer-encoding' in headers:
+            raise HttpError(411, "envie o corpo com Content-Length")
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HttpError(400, "Content-Length inválido")
+        if length > MAX_BODY:
+            raise HttpError(413, "corpo grande demais")
+        body = await reader.readexactly(length) if length else b''
+        url = urlsplit(target)
+        return Request(method.upper(), url.path.rstrip('/') or '/', parse_qs(url.query),
+                       version, headers, body)
+
+    async def _dispatch(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """Atende a requisição; retorna se a conexão continua aberta."""
+        keep_alive = request.keep_alive
+        try:
+            if request.path != '/health':
+                self._authorize(request)
+            route = self._route(request)
+            if route is None:
+                raise HttpError(404, "rota desconhecida")
+            handler, args = route
+            if handler in (self._events, self._job_events):
+                await handler(request, writer, *args)
+                return False
+            status, payload = handler(request, *args)
+        except HttpError as e:
+            status, payload = e.status, {'error': e.message}
+        if isinstance(payload, str):
+            await self._send(writer, status, payload.encode('utf-8'),
+                             'text/plain; version=0.0.4; charset=utf-8', keep_alive)
+        else:
+            await self._send_json(writer, status, payload, keep_alive)
+        return keep_alive
+
+    def _authorize(self, request: Request):
+        if not self.token:
+            return
+        given = request.headers.get('authorization', '')
+        if not hmac.compare_digest(given.encode(), f'Bearer {self.token}'.encode()):
+            raise HttpError(401, "token inválido ou ausente")
+
+    def _route(self, request: Request):
+        routes = (
+            ('GET', r'/health', self._health),
+            ('GET', r'/jobs', self._list_jobs),
+            ('POST', r'/jobs', self._create_jobs),
+            ('GET', r'/jobs/(\d+)', self._get_job),
+            ('DELETE', r'/jobs/(\d+)', self._cancel_job),
+            ('POST', r'/jobs/(\d+)/cancel', self._cancel_job),
+            ('GET', r'/jobs/(\d+)/events', self._job_events),
+            ('GET', r'/events', self._events),
+            ('GET', r'/metrics', self._metrics),
+        )
+        allowed = []
+        for method, pattern, handler in routes:
+            m = re.fullmatch(pattern, request.path)
+            if m:
+                if method == request.method:
+                    return handler, [int(g) for g in m.groups()]
+                allowed.append(method)
+        if allowed:
+            raise HttpError(405, f"use {', '.join(allowed)}")
+        return None
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Any,
+                         keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        await self._send(writer, status, body, 'application/json; charset=utf-8', keep_alive)
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes,
+                    content_type: str, keep_alive: bool):
+        writer.write(self._head(status, {
+            'Content-Type': content_type, 'Content-Length': str(len(body)),
+            'Connection': 'keep-alive' if keep_alive else 'close'}) + body)
+        await writer.drain()
+
+    @staticmethod
+    def _head(status: int, headers: Dict[str, str]) -> bytes:
+        lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}']
+        lines += [f'{k}: {v}' for k, v in headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    # ---------------- Rotas -----------------
+    def _health(self, request: Request) -> Tuple[int, Any]:
+        jobs = self.queue.jobs()
+        storage = getattr(self.queue.downloader, 'storage', None)
+        sessions = getattr(self.queue.downloader, 'sessions', None)
+        return 200, {'status': 'ok', 'active': self.queue.active_count,
+                     'pending': sum(1 for j in jobs if j.state == JobState.PENDING),
+                     'storage': storage.report([self.output_dir]) if storage is not None else None,
+                     'sessions': sessions.stats() if sessions is not None else None}
+
+    def _list_jobs(self, request: Request) -> Tuple[int, Any]:
+        states = set(request.query.get('state', []))
+        snapshot = self.bus.snapshot().jobs
+        jobs = sorted(self.queue.jobs(), key=lambda j: j.id)
+        return 200, [self.job_view(j, snapshot.get(j.id)) for j in jobs
+                     if not states or j.state in states]
+
+    def _create_jobs(self, request: Request) -> Tuple[int, Any]:
+        payload = request.json()
+        if isinstance(payload, list):
+            if not payload:
+                raise HttpError(400, "lista de jobs vazia")
+            for spec in payload:  # valida tudo antes de enfileirar
+                check = dict(spec) if isinstance(spec, dict) else spec
+                try:
+                    check_spec(check)
+                except ValueError as e:
+                    raise HttpError(400, str(e))
+                self._resolve_output(check.get('output_dir'))
+            return 201, [self.job_view(self.submit(spec)) for spec in payload]
+        return 201, self.job_view(self.submit(payload))
+
+    def _get_job(self, request: Request, job_id: int) -> Tuple[int, Any]:
+        job = self.queue.get(job_id)
+        if job is None:
+            raise HttpError(404, f"job {job_id} não existe")
+        return 200, self.job_view(job)
+
+    def _cancel_job(self, request: Request, job_id: int) -> Tuple[int, Any]:
+        job = self.queue.get(job_id)
+        if job is None:
+            raise HttpError(404, f"job {job_id} não existe")
+        if not self.queue.cancel(job_id):
+            raise HttpError(409, f"job {job_id} já finalizado ({job.state})")
+        return 202, self.job_view(job)
+
+    def _metrics(self, request: Request) -> Tuple[int, Any]:
+        if self.metrics is None:
+            raise HttpError(404, "métricas desativadas")
+        return 200, self.metrics.prometheus()
+
+    # ---------------- Server-sent events -----------------
+    async def _events(self, request: Request, writer: asyncio.StreamWriter):
+        await self._stream(writer, None)
+
+    async def _job_events(self, request: Request, writer: asyncio.StreamWriter, job_id: int):
+        if self.queue.get(job_id) is None:
+            raise HttpError(404, f"job {job_id} não existe")
+        await self._stream(writer, job_id)
+
+    async def _stream(self, writer: asyncio.StreamWriter, job_id: Optional[int]):
+        """Envia um evento 'job' sempre que estado ou progresso de um job
+        muda; com job_id, encerra depois do estado final desse job."""
+        writer.write(self._head(200, {'Content-Type': 'text/event-stream',
+                                      'Cache-Control': 'no-cache', 'Connection': 'keep-alive',
+                                      'X-Accel-Buffering': 'no'}) + b'retry: 3000\n\n')
+        await writer.drain()
+        sent: Dict[int, tuple] = {}
+        while True:
+            changed = self._changed
+            snapshot = self.bus.snapshot().jobs
+            jobs = [self.queue.get(job_id)] if job_id is not None else self.queue.jobs()
+            for job in sorted(jobs, key=lambda j: j.id):
+                progress = snapshot.get(job.id)
+                key = (job.state, job.bytes_downloaded,
+                       progress and (progress.status, progress.downloaded_bytes, progress.percent))
+                if sent.get(job.id) == key:
+                    continue
+                sent[job.id] = key
+                data = json.dumps(self.job_view(job, progress), ensure_ascii=False, default=str)
+                writer.write(f'id: {job.id}\nevent: job\ndata: {data}\n\n'.encode('utf-8'))
+            await writer.drain()
+            if job_id is not None and jobs[0].state in JobState.FINAL:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), self.heartbeat)
+            except asyncio.TimeoutError:
+                writer.write(b': keep-alive\n\n')
+                await writer.drain()
+
+
+# ---------------- Linha de comando -----------------
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog='videodl serve', description="API HTTP/JSON de downloads")
+    p.add_argument('--host', default='127.0.0.1', help="endereço de escuta (padrão: 127.0.0.1)")
+    p.add_argument('--port', type=int, default=8080, help="porta (padrão: 8080)")
+    p.add_argument('--token', default=os.environ.get('VIDEODL_TOKEN'),
+                   help="exige 'Authorization: Bearer TOKEN' (padrão: $VIDEODL_TOKEN)")
+    p.add_argument('-o', '--output', default='.', help="raiz dos downloads (padrão: atual)")
+    p.add_argument('-j', '--jobs', type=int, default=2, help="downloads simultâneos (padrão: 2)")
+    p.add_argument('-p', '--profile', dest='format_profile', choices=sorted(PROFILES),
+                   help="perfil de formato padrão dos jobs sem format_id")
+    p.add_argument('-r', '--limit-rate', type=parse_rate,
+                   help="limite de banda somando todos os jobs (ex.: 500K, 2M)")
+    p.add_argument('--pp-workers', type=int,
+                   help="processos de pós-processamento (padrão: núcleos; 0 = na thread do download)")
+    p.add_argument('--scratch-dir', help="diretório para .part e arquivos intermediários do merge")
+    p.add_argument('--min-free', type=parse_size, default=DEFAULT_MIN_FREE,
+                   help="espaço mantido livre em disco (ex.: 1G; padrão: 64M)")
+    p.add_argument('--sessions', type=int, default=8,
+                   help="sessões do yt-dlp (conexões, cookies) mantidas entre jobs (padrão: 8; 0 desativa)")
+    p.add_argument('--archive', help="índice SQLite de já baixados; itens registrados são pulados")
+    p.add_argument('--sync-dir', help="snapshots do modo sync (jobs com \"sync\": true baixam só itens novos)")
+    p.add_argument('--journal', help="journal de jobs (JSONL); jobs interrompidos são retomados")
+    p.add_argument('--metrics-jsonl', help="acrescenta as métricas de cada job neste JSONL")
+    p.add_argument('--metrics-prom', help="grava métricas agregadas no formato texto do Prometheus")
+    p.add_argument('-v', '--verbose', action='store_true')
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s', stream=sys.stderr)
+    if args.jobs < 1:
+        logger.error("--jobs deve ser >= 1")
+        return 2
+    if args.host not in ('127.0.0.1', 'localhost', '::1') and not args.token:
+        logger.warning("API exposta em %s sem --token", args.host)
+    os.makedirs(args.output, exist_ok=True)
+    # o servidor já aceita conexões enquanto o yt_dlp é importado
+    preload_ytdlp()
+    journal = JobJournal(args.journal) if args.journal else None
+    archive = DownloadArchive(args.archive) if args.archive else None
+    pipeline = PostProcessPipeline(args.pp_workers) if args.pp_workers != 0 else None
+    # /metrics sempre disponível; arquivos só se pedidos
+    metrics = MetricsRegistry(jsonl_path=args.metrics_jsonl, prometheus_path=args.metrics_prom)
+    sessions = SessionPool(args.sessions) if args.sessions > 0 else None
+    server = ApiServer(args.output, concurrency=args.jobs,
+                       downloader=VideoDownloader(archive=archive, journal=journal,
+                                                  pipeline=pipeline,
+                                                  storage=StorageManager(args.scratch_dir,
+                                                                         args.min_free),
+                                                  sync_store=(SyncStore(args.sync_dir)
+                                                              if args.sync_dir else None),
+                                                  sessions=sessions),
+                       bandwidth=BandwidthScheduler(args.limit_rate), metrics=metrics,
+                       defaults={'format_profile': args.format_profile} if args.format_profile else None,
+                       host=args.host, port=args.port, token=args.token)
+
+    async def _evict_sessions():
+        # sem jobs novos as sessões ociosas não seriam fechadas
+        while True:
+            await asyncio.sleep(60)
+            sessions.evict_idle()
+
+    async def _run():
+        await server.start()
+        loop = asyncio.get_running_loop()
+        evictor = asyncio.ensure_future(_evict_sessions()) if sessions is not None else None
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):  # Windows
+                loop.add_signal_handler(sig, server.stop)
+        if journal is not None:
+            for job in journal.pending():
+                logger.info("Retomando: %s", job.url)
+                os.makedirs(job.output_dir, exist_ok=True)
+                # todas as opções gravadas, inclusive ensure_audio e skip_archived
+                server.queue.submit(job.url, job.output_dir, **job.download_kwargs())
+        try:
+            await server.serve_forever()
+        finally:
+            logger.info("Encerrando: cancelando jobs em andamento...")
+            if evictor is not None:
+                evictor.cancel()
+            await server.close()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if pipeline is not None:
+            pipeline.shutdown()
+        if sessions is not None:
+            sessions.close()
+        if journal is not None:
+            journal.compact()
+    return 0
+
+
+__all__ = ["ApiServer", "HttpError"]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# opções do YoutubeDL que mudam a cada job e são lidas de params durante o
+# download: trocadas ao emprestar a sessão, fora da chave do pool
+PER_JOB_OPTIONS = frozenset({
+    'progress_hooks', 'failure_report', 'retry_policies', 'bandwidth_throttle', 'job_metrics',
+    'storage_reservation', 'match_filter', 'retry_sleep_functions',
+})
+
+
+def options_key(opts: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Chave das opções "estáticas" (tudo fora de PER_JOB_OPTIONS). Objetos
+    (archive, pipeline...) entram pela identidade: a sessão guardada mantém
+    a referência, então o id não é reaproveitado enquanto ela existir."""
+    return tuple((k, _freeze(opts[k])) for k in sorted(opts) if k not in PER_JOB_OPTIONS)
+
+
+def _freeze(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    return ('id', id(value))
+
+
+class _Session:
+    __slots__ = ('ydl', 'key', 'pps', 'uses', 'idle_since')
+
+    def __init__(self, ydl, key):
+        self.ydl = ydl
+        self.key = key
+        # pós-processadores das opções; os de cada job (archive, journal) saem na devolução
+        self.pps = {when: list(pps) for when, pps in ydl._pps.items()}
+        self.uses = 0
+        self.idle_since = 0.0
+
+
+class SessionPool:
+    """Pool de YoutubeDL reaproveitados entre jobs com as mesmas opções.
+
+    Cada YoutubeDL guarda o que é caro refazer: conexões HTTP/TLS abertas
+    (keep-alive do handler de requisições), cookies e as instâncias dos
+    extratores com seus caches. lease() empresta uma sessão livre com a
+    mesma chave (options_key) ou cria uma; ela é exclusiva da thread até a
+    devolução, quando o estado do job (hooks, pós-processadores adicionados,
+    contadores, opções de PER_JOB_OPTIONS) é descartado. Uma exceção que
+    escapa do bloco fecha a sessão em vez de devolvê-la.
+
+    Limites: max_idle sessões livres no total (as mais antigas saem
+    primeiro) e max_idle_per_key por chave; sessões livres há mais de
+    idle_timeout segundos ou usadas max_uses vezes são fechadas. max_idle=0
+    desativa o reaproveitamento.
+    """
+
+    def __init__(self, max_idle: int = 8, max_idle_per_key: int = 4,
+                 idle_timeout: float = 300.0, max_uses: int = 200,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_idle = max(int(max_idle), 0)
+        self.max_idle_per_key = max(int(max_idle_per_key), 1)
+        self.idle_timeout = idle_timeout
+        self.max_uses = max(int(max_uses), 1)
+        self._clock = clock
+        self._idle: List[_Session] = []  # da mais antiga para a mais recente
+        self._leased: Dict[int, _Session] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.created = self.reused = self.closed_sessions = 0
+
+    # ---------------- Empréstimo -----------------
+    @contextmanager
+    def lease(self, factory: Callable[[Dict[str, Any]], Any], opts: Dict[str, Any]) -> Iterator[Any]:
+        """YoutubeDL (factory: a classe) configurado com opts pelo bloco."""
+        ydl = self.acquire(factory, opts)
+        try:
+            yield ydl
+        except BaseException:
+            self.release(ydl, reuse=False)
+            raise
+        self.release(ydl)
+
+    def acquire(self, factory: Callable[[Dict[str, Any]], Any], opts: Dict[str, Any]):
+        key = (factory, options_key(opts))
+        with self._lock:
+            expired = self._expire()
+            session = None
+            for i in range(len(self._idle) - 1, -1, -1):
+                if self._idle[i].key == key:
+                    # a mais recente: conexões com mais chance de continuar abertas
+                    session = self._idle.pop(i)
+                    self.reused += 1
+                    break
+        self._close(expired)
+        if session is None:
+            # opts copiado: o YoutubeDL normaliza e altera o próprio params
+            session = _Session(factory(dict(opts)), key)
+            with self._lock:
+                self.created += 1
+        ydl = session.ydl
+        for name in PER_JOB_OPTIONS:
+            if name in opts:
+                ydl.params[name] = opts[name]
+            else:
+                ydl.params.pop(name, None)
+        ydl._progress_hooks = list(opts.get('progress_hooks') or [])
+        session.uses += 1
+        with self._lock:
+            self._leased[id(ydl)] = session
+        return ydl
+
+    def release(self, ydl, reuse: bool = True):
+        """Devolve a sessão ao pool (reuse=False: fecha)."""
+        with self._lock:
+            session = self._leased.pop(id(ydl), None)
+        if session is None:
+            return
+        if reuse:
+            try:
+                self._reset(session)
+            except Exception as e:
+                logger.debug("Sessão descartada ao limpar estado do job: %s", e)
+                reuse = False
+        drop: List[_Session] = []
+        with self._lock:
+            if (not reuse or self._closed or session.uses >= self.max_uses
+                    or self.max_idle == 0):
+                drop.append(session)
+            else:
+                session.idle_since = self._clock()
+                self._idle.append(session)
+                same = [s for s in self._idle if s.key == session.key]
+                drop.extend(same[:max(len(same) - self.max_idle_per_key, 0)])
+                drop.extend(s for s in self._idle[:max(len(self._idle) - self.max_idle, 0)]
+                            if s not in drop)
+                self._idle = [s for s in self._idle if s not in drop]
+            drop.extend(self._expire())
+        self._close(drop)
+
+    # ---------------- Manutenção -----------------
+    def evict_idle(self) -> int:
+        """Fecha as sessões livres há mais de idle_timeout; retorna quantas."""
+        with self._lock:
+            expired = self._expire()
+        self._close(expired)
+        return len(expired)
+
+    def close(self):
+        """Fecha as sessões livres; as emprestadas fecham na devolução."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        self._close(idle)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'idle': len(self._idle), 'leased': len(self._leased),
+                    'created': self.created, 'reused': self.reused, 'closed': self.closed_sessions}
+
+    # ---------------- Internos -----------------
+    def _expire(self) -> List[_Session]:
+        # chamado com o lock
+        if self.idle_timeout is None:
+            return []
+        limit = self._clock() - self.idle_timeout
+        expired = [s for s in self._idle if s.idle_since <= limit]
+        if expired:
+            self._idle = [s for s in self._idle if s.idle_since > limit]
+        return expired
+
+    def _reset(self, session: _Session):
+        """Descarta o estado do job anterior, mantendo conexões, cookies e
+        extratores."""
+        ydl = session.ydl
+        ydl._pps = {when: list(pps) for when, pps in session.pps.items()}
+        ydl._progress_hooks = []
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls = set()
+        for name in PER_JOB_OPTIONS:
+            # sem referências ao job (relatório, métricas, reserva) enquanto livre
+            ydl.params.pop(name, None)
+        reset = getattr(ydl, 'reset_job_state', None)
+        if reset is not None:
+            reset()
+
+    def _close(self, sessions: List[_Session]):
+        for session in sessions:
+            with self._lock:
+                self.closed_sessions += 1
+            try:
+                session.ydl.close()
+            except Exception as e:
+                logger.debug("Falha ao fechar sessão do yt-dlp: %s", e)
+
+
+__all__ = ["SessionPool", "options_key", "PER_JOB_OPTIONS"]
@@ -0,0 +1,222 @@
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# margem mantida livre em cada sistema de arquivos (estimativas são aproximadas)
+DEFAULT_MIN_FREE = 64 * 1024 * 1024
+
+
+class InsufficientSpace(OSError):
+    """Não há espaço para o download (errno ENOSPC: classificado como erro de
+    disco, sem novas tentativas)."""
+
+    def __init__(self, path: str, needed: int, available: int):
+        super().__init__(errno.ENOSPC,
+                         f"Espaço insuficiente em {path}: necessários ~{needed / 1_000_000:.1f} MB, "
+                         f"disponíveis {max(available, 0) / 1_000_000:.1f} MB", path)
+        self.needed = needed
+        self.available = available
+
+
+def item_bytes(info: Dict[str, Any]) -> Tuple[Optional[int], bool]:
+    """Tamanho esperado de um item já com formato escolhido pelo yt-dlp e se
+    ele passa por merge. None se algum formato não tem tamanho conhecido."""
+    formats = info.get('requested_formats') or [info]
+    total = 0
+    for f in formats:
+        size = f.get('filesize') or f.get('filesize_approx')
+        if not size and f.get('tbr') and info.get('duration'):
+            size = f['tbr'] * 1000 / 8 * info['duration']
+        if not size:
+            return None, len(formats) > 1
+        total += int(size)
+    return total, len(formats) > 1
+
+
+def _existing(path: str) -> str:
+    # diretório ainda não criado: mede o ancestral que existe
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class Reservation:
+    """Espaço reservado para um job (StorageManager.reserve). Liberado ao
+    fim do download; release() pode ser chamado mais de uma vez."""
+
+    def __init__(self, manager: 'StorageManager', output_dir: str,
+                 needs: Dict[int, Tuple[str, int]]):
+        self.manager = manager
+        self.output_dir = output_dir
+        self.needs = needs  # dispositivo -> (caminho, bytes)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(n for _, n in self.needs.values())
+
+    def check_item(self, nbytes: Optional[int], merge: bool = False):
+        """Confere um item antes de baixá-lo (playlists: o tamanho de cada
+        item só é conhecido depois da extração). Levanta InsufficientSpace."""
+        if nbytes:
+            self.manager.check(self.output_dir, nbytes, merge, exclude=self)
+
+    def release(self):
+        self.manager.release(self)
+
+    def __enter__(self) -> 'Reservation':
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class StorageManager:
+    """Controle de espaço em disco dos downloads.
+
+    Antes de começar, cada job reserva o tamanho estimado em cada sistema de
+    arquivos que vai usar: o temporário (.part, partes do merge) e o destino
+    final. Um merge precisa de até 2x o tamanho no temporário (partes +
+    arquivo mesclado). Um job que não cabe por causa das reservas de outros
+    jobs espera (até cancel_event ou a liberação de espaço); um que não cabe
+    nem sem elas é rejeitado com InsufficientSpace.
+
+    scratch_dir: diretório rápido para os temporários (paths['temp'] do
+    yt-dlp); o arquivo pronto é movido ao destino por rename no mesmo
+    sistema de arquivos ou copiado entre sistemas diferentes.
+    min_free: margem que fica livre em cada sistema de arquivos.
+    """
+
+    def __init__(self, scratch_dir: Optional[str] = None, min_free: int = DEFAULT_MIN_FREE,
+                 poll: float = 5.0,
+                 disk_free: Optional[Callable[[str], int]] = None):
+        self.scratch_dir = os.path.abspath(scratch_dir) if scratch_dir else None
+        self.min_free = max(int(min_free or 0), 0)
+        self.poll = poll
+        self._disk_free = disk_free or (lambda path: shutil.disk_usage(path).free)
+        self._reserved: Dict[Reservation, Dict[int, Tuple[str, int]]] = {}
+        self._paths: Dict[int, str] = {}
+        self._changed = threading.Condition()
+
+    # ---------------- Consulta -----------------
+    def free_bytes(self, path: str) -> int:
+        return self._disk_free(_existing(path))
+
+    def temp_dir(self, output_dir: str) -> Optional[str]:
+        """Subdiretório do scratch para output_dir (estável entre execuções:
+        .part de um job interrompido continua de onde parou)."""
+        if self.scratch_dir is None:
+            return None
+        digest = hashlib.sha1(os.path.realpath(output_dir).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.scratch_dir, digest)
+
+    def needs(self, output_dir: str, nbytes: int, merge: bool = False) -> Dict[int, Tuple[str, int]]:
+        """Bytes necessários por sistema de arquivos (st_dev -> (caminho, bytes))."""
+        temp = self.temp_dir(output_dir) or output_dir
+        temp_dev = os.stat(_existing(temp)).st_dev
+        out_dev = os.stat(_existing(output_dir)).st_dev
+        needs = {temp_dev: (temp, nbytes * 2 if merge else nbytes)}
+        if out_dev != temp_dev:
+            # destino em outro sistema de arquivos: o arquivo final é copiado
+            needs[out_dev] = (output_dir, nbytes)
+        return needs
+
+    def headroom(self, path: str, exclude: Optional[Reservation] = None) -> int:
+        """Bytes livres em path menos as reservas de jobs e a margem min_free."""
+        dev = os.stat(_existing(path)).st_dev
+        with self._changed:
+            reserved = self._reserved_on(dev, exclude)
+        return self.free_bytes(path) - reserved - self.min_free
+
+    def report(self, paths: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Espaço de cada sistema de arquivos em uso (scratch, destinos com
+        reserva e paths): livre, reservado e folga (headroom)."""
+        with self._changed:
+            known = dict(self._paths)
+        for path in [p for p in (self.scratch_dir, *paths) if p]:
+            known.setdefault(os.stat(_existing(path)).st_dev, path)
+        scratch_dev = os.stat(_existing(self.scratch_dir)).st_dev if self.scratch_dir else None
+        result = []
+        for dev, path in known.items():
+            free = self.free_bytes(path)
+            with self._changed:
+                reserved = self._reserved_on(dev, None)
+            result.append({'path': path, 'free': free, 'reserved': reserved,
+                           'min_free': self.min_free, 'headroom': free - reserved - self.min_free,
+                           'scratch': dev == scratch_dev})
+        return result
+
+    # ---------------- Reservas -----------------
+    def check(self, output_dir: str, nbytes: int, merge: bool = False,
+              exclude: Optional[Reservation] = None):
+        """Levanta InsufficientSpace se nbytes não cabem agora."""
+        with self._changed:
+            self._shortage(self.needs(output_dir, nbytes, merge), exclude, raise_now=True)
+
+    def reserve(self, output_dir: str, nbytes: Optional[int], merge: bool = False,
+                cancel_event: Optional[threading.Event] = None,
+                on_wait: Optional[Callable[[InsufficientSpace], None]] = None) -> Reservation:
+        """Reserva espaço para um job, esperando enquanto outras reservas o
+        impedem. Tamanho desconhecido (None) não reserva nada. Levanta
+        InsufficientSpace se não couber nem sem as outras reservas e
+        DownloadCancelled se cancel_event for setado durante a espera."""
+        needs = self.needs(output_dir, nbytes, merge) if nbytes else {}
+        reservation = Reservation(self, output_dir, needs)
+        waited = False
+        with self._changed:
+            while True:
+                shortage = self._shortage(needs, None, raise_now=False)
+                if shortage is None:
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    from .downloader import DownloadCancelled
+                    raise DownloadCancelled("Download cancelado pelo usuário")
+                if not waited:
+                    waited = True
+                    logger.info("Aguardando espaço em disco: %s", shortage)
+                    if on_wait is not None:
+                        on_wait(shortage)
+                # liberação de outra reserva acorda; o poll cobre espaço liberado fora do app
+                self._changed.wait(self.poll if cancel_event is None else min(self.poll, 0.5))
+            self._reserved[reservation] = needs
+            for dev, (path, _) in needs.items():
+                self._paths.setdefault(dev, path)
+        return reservation
+
+    def release(self, reservation: Reservation):
+        with self._changed:
+            if self._reserved.pop(reservation, None) is not None:
+                self._changed.notify_all()
+
+    # ---------------- Internos -----------------
+    def _reserved_on(self, dev: int, exclude: Optional[Reservation]) -> int:
+        return sum(needs[dev][1] for r, needs in self._reserved.items()
+                   if r is not exclude and dev in needs)
+
+    def _shortage(self, needs: Dict[int, Tuple[str, int]], exclude: Optional[Reservation],
+                  raise_now: bool) -> Optional[InsufficientSpace]:
+        """InsufficientSpace do primeiro sistema de arquivos sem espaço, ou
+        None. Levanta quando esperar não resolve (não cabe sem as reservas
+        dos outros jobs) ou com raise_now."""
+        for dev, (path, nbytes) in needs.items():
+            free = self.free_bytes(path) - self.min_free
+            others = self._reserved_on(dev, exclude)
+            if nbytes <= free - others:
+                continue
+            error = InsufficientSpace(path, nbytes, free - others)
+            if raise_now or nbytes > free or not others:
+                raise error
+            return error
+        return None
+
+
+__all__ = ["StorageManager", "Reservation", "InsufficientSpace", "item_bytes", "DEFAULT_MIN_FREE"]
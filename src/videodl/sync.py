@@ -0,0 +1,282 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# ordem das entradas na fonte (canais costumam ser NEWEST_FIRST)
+NEWEST_FIRST = 'newest_first'
+OLDEST_FIRST = 'oldest_first'
+
+
+def entry_key(entry: Dict[str, Any]) -> Optional[str]:
+    """Identidade do item na fonte: id do extrator ou, sem id (feeds), a URL."""
+    key = entry.get('id') or entry.get('url') or entry.get('webpage_url')
+    return str(key) if key else None
+
+
+def _upload_date(entry: Dict[str, Any]) -> Optional[str]:
+    if entry.get('upload_date'):
+        return str(entry['upload_date'])
+    if entry.get('timestamp'):
+        return time.strftime('%Y%m%d', time.gmtime(entry['timestamp']))
+    return None
+
+
+# campos de uma entrada flat guardados para repetir itens que falharam
+_RETRY_FIELDS = ('_type', 'ie_key', 'id', 'url', 'title', 'timestamp', 'upload_date',
+                 'playlist_index', 'playlist', 'playlist_id')
+
+
+def _strip_smuggle(url: Optional[str]) -> str:
+    return (url or '').split('#__youtubedl_smuggle=')[0]
+
+
+@dataclass
+class SourceSnapshot:
+    """Estado compacto de uma fonte (playlist/canal/feed) após o último sync:
+    posição e data de cada item já baixado, ordem e quando houve o último
+    percurso completo (o único que detecta itens removidos). failed guarda a
+    entrada flat dos itens novos que falharam, repetidos no próximo sync
+    mesmo fora do trecho percorrido."""
+    url: str
+    entries: Dict[str, Tuple[int, Optional[str]]] = field(default_factory=dict)
+    order: Optional[str] = None
+    total: Optional[int] = None
+    synced_at: float = 0.0
+    full_synced_at: float = 0.0
+    last_sync: Dict[str, Any] = field(default_factory=dict)
+    failed: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def detect_order(self) -> Optional[str]:
+        """Ordem pelas datas: decrescentes com a posição = NEWEST_FIRST."""
+        dated = sorted((pos, date) for pos, date in self.entries.values() if date)
+        dates = [d for _, d in dated]
+        if len(set(dates)) < 2:
+            return None
+        if all(a >= b for a, b in zip(dates, dates[1:])):
+            return NEWEST_FIRST
+        if all(a <= b for a, b in zip(dates, dates[1:])):
+            return OLDEST_FIRST
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'url': self.url, 'order': self.order, 'total': self.total,
+                'synced_at': self.synced_at, 'full_synced_at': self.full_synced_at,
+                'last_sync': self.last_sync, 'failed': self.failed,
+                'entries': [[k, pos, date] for k, (pos, date) in
+                            sorted(self.entries.items(), key=lambda kv: kv[1][0])]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SourceSnapshot':
+        return cls(url=data['url'], order=data.get('order'), total=data.get('total'),
+                   synced_at=data.get('synced_at') or 0.0,
+                   full_synced_at=data.get('full_synced_at') or 0.0,
+                   last_sync=data.get('last_sync') or {},
+                   failed=data.get('failed') or {},
+                   entries={k: (pos, date) for k, pos, date in data.get('entries') or []})
+
+
+@dataclass
+class SyncPlan:
+    """Resultado do percurso da fonte: itens novos (a baixar), posição/data
+    dos itens vistos e, em percurso completo, os removidos."""
+    new: List[Dict[str, Any]]
+    seen: Dict[str, Tuple[int, Optional[str]]]
+    full: bool
+    removed: Optional[List[str]] = None  # None: percurso parcial, não detectável
+    total: Optional[int] = None
+    title: Optional[str] = None
+
+    @property
+    def walked(self) -> int:
+        return len(self.seen)
+
+
+class SyncStore:
+    """Snapshots do modo sync, um JSON por fonte em directory.
+
+    stop_after: em fontes NEWEST_FIRST o percurso para depois de tantos
+    itens já conhecidos seguidos (novidades ficam no topo); em OLDEST_FIRST
+    só o fim da lista é percorrido quando as entradas são paginadas sob
+    demanda. full_interval (s): intervalo máximo entre percursos completos,
+    que detectam itens removidos (0 = sempre completo).
+    """
+
+    def __init__(self, directory: str, stop_after: int = 10,
+                 full_interval: float = 7 * 86400):
+        self.directory = directory
+        self.stop_after = max(int(stop_after), 1)
+        self.full_interval = full_interval
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f'{digest}.json')
+
+    def load(self, url: str) -> Optional[SourceSnapshot]:
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                return SourceSnapshot.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Snapshot de sync ilegível para %s (%s); percurso completo", url, e)
+            return None
+
+    def save(self, snapshot: SourceSnapshot):
+        path = self._path(snapshot.url)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with self._lock:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(snapshot.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, path)
+
+    def sources(self) -> List[SourceSnapshot]:
+        result = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                        result.append(SourceSnapshot.from_dict(json.load(f)))
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue
+        return result
+
+    # ---------------- Percurso -----------------
+    def plan(self, url: str, info: Dict[str, Any], snapshot: Optional[SourceSnapshot],
+             full: bool = False) -> SyncPlan:
+        """Percorre as entradas flat (preguiçosas, extract_info com
+        process=False) de info só até onde é preciso para achar as novas."""
+        known = snapshot.entries if snapshot is not None else {}
+        if not info.get('entries') and info.get('_type', 'video') == 'video':
+            # não é playlist: fonte de um item
+            entry = {'url': info.get('webpage_url') or url, 'id': info.get('id')}
+            key = entry_key(entry)
+            seen = {key: (1, _upload_date(info))}
+            return SyncPlan(new=[] if key in known else [dict(entry, playlist_index=1)],
+                            seen=seen, full=True, removed=[], total=1, title=info.get('title'))
+        full = (full or not known or snapshot.order is None
+                or time.time() - snapshot.full_synced_at >= self.full_interval)
+        entries: Any = info.get('entries') or []
+        start = 0
+        if not full and snapshot.order == OLDEST_FIRST:
+            start, entries = self._tail(entries, known)
+            full = entries is None
+            entries = info.get('entries') or [] if entries is None else entries
+        total = info.get('playlist_count')
+        if total is None and isinstance(info.get('entries'), list):
+            total = len(info['entries'])  # já extraídas (ex.: feeds): tamanho sem custo
+        plan = SyncPlan(new=[], seen={}, full=full, total=total,
+                        title=info.get('title') or info.get('id'))
+        run = 0
+        for pos, entry in enumerate(entries, start=start + 1):
+            if not isinstance(entry, dict):
+                continue
+            key = entry_key(entry)
+            if key is None:
+                continue
+            plan.seen[key] = (pos, _upload_date(entry))
+            if key in known:
+                run += 1
+                if not full and snapshot.order == NEWEST_FIRST and run >= self.stop_after:
+                    break
+                continue
+            run = 0
+            plan.new.append(dict(entry, playlist_index=pos, playlist=plan.title,
+                                 playlist_id=info.get('id')))
+        if full:
+            plan.total = plan.total or len(plan.seen)
+            plan.removed = [k for k in known if k not in plan.seen]
+        else:
+            # falhas anteriores fora do trecho percorrido
+            plan.new.extend(dict(e) for k, e in snapshot.failed.items() if k not in plan.seen)
+        return plan
+
+    def _tail(self, entries: Any, known: Dict[str, Tuple[int, Optional[str]]]
+              ) -> Tuple[int, Optional[Iterable[Any]]]:
+        """Fim da lista (OLDEST_FIRST) a partir dos últimos stop_after itens
+        conhecidos. Só para entradas paginadas sob demanda (PagedList do
+        yt-dlp: as páginas anteriores não são buscadas); senão (None) o
+        percurso é completo."""
+        start = max(max(pos for pos, _ in known.values()) - self.stop_after, 0)
+        if hasattr(entries, 'getslice'):
+            window = entries.getslice(start)
+        elif isinstance(entries, list):
+            window = entries[start:]
+        else:
+            return 0, None
+        # o trecho precisa começar no item conhecido da mesma posição (sem
+        # remoções ou inserções antes dele)
+        first = next((e for e in window if isinstance(e, dict)), None)
+        if first is None or known.get(entry_key(first), (None,))[0] != start + 1:
+            return 0, None
+        return start, window
+
+    def commit(self, url: str, snapshot: Optional[SourceSnapshot], plan: SyncPlan,
+               failed: Set[str]) -> SourceSnapshot:
+        """Grava o snapshot após o download dos novos. Itens que falharam
+        ficam de fora e voltam como novos no próximo sync."""
+        snapshot = snapshot or SourceSnapshot(url=url)
+        entries = {} if plan.full else dict(snapshot.entries)
+        for key, value in plan.seen.items():
+            if key not in failed:
+                entries[key] = value
+        retry = {}
+        for entry in plan.new:
+            key = entry_key(entry)
+            if key in failed:
+                retry[key] = {k: entry[k] for k in _RETRY_FIELDS if entry.get(k) is not None}
+            elif key not in entries:
+                entries[key] = (entry['playlist_index'], _upload_date(entry))
+        new_positions = [plan.seen[k][0] for k in map(entry_key, plan.new) if k in plan.seen]
+        known_positions = [pos for key, (pos, _) in plan.seen.items() if key in snapshot.entries]
+        order = SourceSnapshot(url=url, entries=entries).detect_order()
+        if order is None and new_positions and known_positions:
+            # sem datas: onde os novos apareceram em relação aos conhecidos
+            if max(new_positions) < min(known_positions):
+                order = NEWEST_FIRST
+            elif min(new_positions) > max(known_positions):
+                order = OLDEST_FIRST
+        now = time.time()
+        result = SourceSnapshot(
+            url=url, entries=entries, order=order or snapshot.order,
+            total=plan.total or snapshot.total, synced_at=now,
+            full_synced_at=now if plan.full else snapshot.full_synced_at,
+            failed=retry,
+            last_sync={'new': len(plan.new), 'failed': len(failed), 'walked': plan.walked,
+                       'full': plan.full,
+                       'removed': len(plan.removed) if plan.removed is not None else None,
+                       'total': plan.total or snapshot.total})
+        self.save(result)
+        return result
+
+
+def failed_keys(plan: SyncPlan, failures: Iterable[Any]) -> Set[str]:
+    """Chaves dos itens novos que não foram baixados (EntryFailure do
+    relatório), comparando id e URL com e sem os dados "smuggled"."""
+    by_ref: Dict[str, str] = {}
+    for entry in plan.new:
+        key = entry_key(entry)
+        for ref in (entry.get('id'), entry.get('url'), _strip_smuggle(entry.get('url'))):
+            if ref:
+                by_ref[str(ref)] = key
+    failed = set()
+    for failure in failures:
+        for ref in (failure.id, failure.url, _strip_smuggle(failure.url)):
+            if ref and str(ref) in by_ref:
+                failed.add(by_ref[str(ref)])
+                break
+    return failed
+
+
+__all__ = ["SyncStore", "SourceSnapshot", "SyncPlan", "NEWEST_FIRST", "OLDEST_FIRST",
+           "entry_key", "failed_keys"]
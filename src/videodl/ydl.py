@@ -0,0 +1,241 @@
+import functools
+import os
+import sys
+import threading
+import time
+
+
+@functools.lru_cache(maxsize=None)
+def ytdlp():
+    """Módulo yt_dlp, importado na primeira chamada (None se não estiver
+    instalado ou falhar ao importar). O import custa centenas de ms; os
+    módulos do videodl não o fazem no carregamento."""
+    try:
+        import yt_dlp  # type: ignore
+    except Exception:  # cobertura ampla: ImportError + outros problemas de ambiente
+        return None
+    return yt_dlp
+
+
+def preload_ytdlp() -> threading.Thread:
+    """Importa o yt_dlp numa thread (a GUI abre a janela enquanto isso)."""
+    thread = threading.Thread(target=ytdlp, name='videodl-import', daemon=True)
+    thread.start()
+    return thread
+
+
+@functools.lru_cache(maxsize=None)
+def tuned_youtubedl():
+    """YoutubeDL que troca o downloader escolhido pelo yt-dlp pelas variantes
+    do videodl quando habilitadas nas opções:
+
+    - http_connections > 1: formatos HTTP diretos (progressivos e cada parte de
+      um merge) via SegmentedHttpFD;
+    - concurrent_fragment_downloads > 1: HLS/DASH nativos via
+      WindowedFragmentFD (janela limitada de fragmentos, tempos por fragmento);
+    - postprocess_pipeline (PostProcessPipeline): a etapa post_process (merge,
+      fixups, ffmpeg) vai para o pipeline e o download segue para o próximo
+      item. Os Futures ficam em deferred_postprocessing;
+    - job_metrics (JobMetrics): spans de extração, seleção de formato,
+      transferência de cada arquivo, cada pós-processador e movimentação
+      final, mais as retentativas de rede;
+    - failure_report (FailureReport): registra as falhas que o ignoreerrors
+      engoliria, com o item (url, id, playlist_index, formato) em que
+      ocorreram. Um DownloadCancelled levantado num hook de progresso
+      interrompe o download (com ignoreerrors o yt-dlp seguiria para o
+      próximo item da playlist).
+    - storage_reservation (storage.Reservation): antes de baixar cada item,
+      confere se o tamanho dos formatos escolhidos cabe no disco; se não
+      couber, o item falha (InsufficientSpace) sem transferir nada.
+
+    reset_job_state() descarta o estado por job acima (SessionPool, ao
+    reaproveitar a instância em outro job).
+    """
+    from yt_dlp import YoutubeDL  # type: ignore
+    from yt_dlp.downloader import get_suitable_downloader  # type: ignore
+    from yt_dlp.downloader.dash import DashSegmentsFD  # type: ignore
+    from yt_dlp.downloader.hls import HlsFD  # type: ignore
+    from yt_dlp.downloader.http import HttpFD  # type: ignore
+
+    from .fragments import windowed_fragment_fd
+    from .metrics import DOWNLOAD, EXTRACTION, FORMAT_SELECTION, span_name_for
+    from .postprocess import postprocess_options
+    from .retry import CANCELLED, classify
+    from .segmented import segmented_http_fd
+    from .storage import item_bytes
+
+    class TunedYoutubeDL(YoutubeDL):
+        def _tuned_fd(self, info, name):
+            base = get_suitable_downloader(info, self.params, to_stdout=(name == '-'))
+            if base is HttpFD and name != '-' and int(self.params.get('http_connections') or 1) > 1:
+                return segmented_http_fd()
+            if base in (HlsFD, DashSegmentsFD) and int(self.params.get('concurrent_fragment_downloads') or 1) > 1:
+                return windowed_fragment_fd(base)
+            return None
+
+        # ---------------- Métricas -----------------
+        @property
+        def _metrics(self):
+            return self.params.get('job_metrics')
+
+        def _mark(self, name):
+            if self._metrics is not None:
+                self.__dict__.setdefault('_metric_marks', {})[name] = time.time()
+
+        def _close_mark(self, name, **attrs):
+            started = self.__dict__.get('_metric_marks', {}).pop(name, None)
+            if started is not None:
+                self._metrics.add_span(name, started, time.time(), **attrs)
+
+        # ---------------- Falhas -----------------
+        @property
+        def entry_context(self):
+            """Item em processamento: url, playlist_index e extra_info da
+            extração; id, title e format_id depois da seleção de formato."""
+            return self.__dict__.setdefault('_entry_context', {})
+
+        def trouble(self, message=None, tb=None, is_error=True):
+            if is_error and self.params.get('ignoreerrors'):
+                exc = sys.exc_info()[1]
+                if exc is not None and classify(exc) == CANCELLED:
+                    raise exc
+                report = self.params.get('failure_report')
+                if report is not None:
+                    report.record(self.entry_context, exc, message or '')
+            return super().trouble(message, tb, is_error)
+
+        def extract_info(self, url, *args, **kwargs):
+            extra = kwargs.get('extra_info') or (args[2] if len(args) > 2 else None) or {}
+            self._entry_context = {
+                'url': url, 'playlist_index': extra.get('playlist_index'),
+                'extra_info': {k: extra[k] for k in ('playlist', 'playlist_id', 'playlist_index',
+                                                     'playlist_count') if k in extra}}
+            self._mark(EXTRACTION)
+            try:
+                result = super().extract_info(url, *args, **kwargs)
+            except BaseException as e:
+                self._close_mark(EXTRACTION, url=url, error=type(e).__name__)
+                raise
+            # process=False, ou falha engolida pelo ignoreerrors (result None)
+            self._close_mark(EXTRACTION, url=url, **({} if result else {'error': 'no result'}))
+            return result
+
+        def process_ie_result(self, ie_result, *args, **kwargs):
+            # o extrator terminou: o resultado chega aqui antes de qualquer download
+            self._close_mark(EXTRACTION, extractor=ie_result.get('extractor_key') or ie_result.get('ie_key'),
+                             type=ie_result.get('_type', 'video'))
+            return super().process_ie_result(ie_result, *args, **kwargs)
+
+        def process_video_result(self, info_dict, *args, **kwargs):
+            self._mark(FORMAT_SELECTION)
+            try:
+                return super().process_video_result(info_dict, *args, **kwargs)
+            finally:
+                # sem download (archive/filtro/simulação) a etapa termina aqui
+                self._close_mark(FORMAT_SELECTION, id=info_dict.get('id'))
+
+        def process_info(self, info_dict):
+            self._close_mark(FORMAT_SELECTION, id=info_dict.get('id'),
+                             format_id=info_dict.get('format_id'))
+            context = self.entry_context
+            context.update({k: info_dict.get(k) for k in ('id', 'title', 'webpage_url', 'format_id')})
+            if info_dict.get('playlist_index') is not None:
+                context['playlist_index'] = info_dict['playlist_index']
+                context.setdefault('extra_info', {}).update(
+                    {k: info_dict.get(k) for k in ('playlist', 'playlist_id', 'playlist_index',
+                                                   'playlist_count')})
+            reservation = self.params.get('storage_reservation')
+            if reservation is not None:
+                nbytes, merge = item_bytes(info_dict)
+                # arquivo final já existe: o yt-dlp não baixa de novo
+                if nbytes and not os.path.exists(self.prepare_filename(info_dict)):
+                    reservation.check_item(nbytes, merge)
+            return super().process_info(info_dict)
+
+        def run_pp(self, pp, infodict):
+            if self._metrics is None:
+                return super().run_pp(pp, infodict)
+            name, attrs = span_name_for(pp.pp_key())
+            with self._metrics.span(name, **attrs):
+                return super().run_pp(pp, infodict)
+
+        # ---------------- Download -----------------
+        def dl(self, name, info, subtitle=False, test=False):
+            metrics = self._metrics
+            fd_class = None
+            if not (test or subtitle) and info.get('url'):
+                fd_class = self._tuned_fd(info, name)
+                if fd_class is None and metrics is not None:
+                    fd_class = get_suitable_downloader(info, self.params, to_stdout=(name == '-'))
+            if fd_class is None:
+                return super().dl(name, info, subtitle=subtitle, test=test)
+            # mesmo fluxo de YoutubeDL.dl, só com outra classe de downloader
+            fd = fd_class(self, self.params)
+            for ph in self._progress_hooks:
+                fd.add_progress_hook(ph)
+            new_info = self._copy_infodict(info)
+            if new_info.get('http_headers') is None:
+                new_info['http_headers'] = self._calc_headers(new_info)
+            if metrics is None:
+                return fd.download(name, new_info, subtitle)
+            report_retry = fd.report_retry
+
+            def _report_retry(*args, **kwargs):
+                # frag_index presente = retentativa de fragmento
+                fragment = len(args) > 3 or 'frag_index' in kwargs
+                metrics.incr('fragment_retries' if fragment else 'http_retries')
+                return report_retry(*args, **kwargs)
+
+            fd.report_retry = _report_retry
+            with metrics.span(DOWNLOAD, filename=name, format_id=info.get('format_id'),
+                              downloader=fd_class.__name__):
+                return fd.download(name, new_info, subtitle)
+
+        @property
+        def deferred_postprocessing(self):
+            if not hasattr(self, '_deferred_pps'):
+                self._deferred_pps = []
+                self._deferred_archive_ids = set()
+            return self._deferred_pps
+
+        def post_process(self, filename, info, files_to_move=None):
+            pipeline = self.params.get('postprocess_pipeline')
+            extra = info.get('__postprocessors') or []
+            if pipeline is None or not (extra or self._pps['post_process']):
+                return super().post_process(filename, info, files_to_move)
+            payload = self.sanitize_info({k: v for k, v in info.items() if k != '__postprocessors'})
+            after_move = list(self._pps['after_move'])
+
+            metrics = self._metrics
+
+            def _after_move(final):
+                for span in final.pop('__postprocess_spans', None) or ():
+                    if metrics is not None:
+                        metrics.add_span(span.pop('name'), span['start'],
+                                         span.pop('start') + span.pop('duration'), **span)
+                for pp in after_move:
+                    _, final = pp.run(final)
+                return final
+
+            future = pipeline.submit(postprocess_options(self.params), filename, payload,
+                                     [type(pp).__name__ for pp in extra], dict(files_to_move or {}),
+                                     on_done=_after_move)
+            self.deferred_postprocessing.append(future)
+            # o archive é gravado pelo after_move quando o item terminar
+            self._deferred_archive_ids.add(self._make_archive_id(info))
+            info['filepath'] = filename
+            return info
+
+        def reset_job_state(self):
+            for name in ('_entry_context', '_metric_marks', '_deferred_pps', '_deferred_archive_ids'):
+                self.__dict__.pop(name, None)
+
+        def record_download_archive(self, info_dict):
+            if self._make_archive_id(info_dict) in getattr(self, '_deferred_archive_ids', ()):
+                return
+            super().record_download_archive(info_dict)
+
+    return TunedYoutubeDL
+
+
+__all__ = ["tuned_youtubedl", "ytdlp", "preload_ytdlp"]
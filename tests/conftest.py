@@ -0,0 +1,54 @@
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+
+import pytest
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """SimpleHTTPRequestHandler sem o log de cada pedido no stderr."""
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """Sobe servidores HTTP locais: http_server(directory, handler=QuietHandler)
+    serve directory numa porta livre e devolve a URL base. Encerrados no fim
+    do teste."""
+    servers = []
+
+    def start(directory, handler=QuietHandler) -> str:
+        httpd = ThreadingHTTPServer(('127.0.0.1', 0),
+                                    functools.partial(handler, directory=str(directory)))
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return f'http://127.0.0.1:{httpd.server_address[1]}'
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def rss_feed(base: str, names: Iterable[str], pub_dates: Optional[Dict[str, str]] = None) -> str:
+    """Feed RSS 2.0 com um item por nome (na ordem dada), cujo enclosure é
+    {base}/{nome}.mp4; pub_dates dá o <pubDate> de cada item."""
+    pub_dates = pub_dates or {}
+    items = ''.join(
+        f'<item><title>{n}</title><guid>{n}</guid>'
+        + (f'<pubDate>{pub_dates[n]}</pubDate>' if n in pub_dates else '')
+        + f'<enclosure url="{base}/{n}.mp4" type="video/mp4" length="0"/></item>'
+        for n in names)
+    return (f'<?xml version="1.0"?><rss version="2.0"><channel><title>f</title>'
+            f'<link>{base}/</link><description>d</description>{items}</channel></rss>')
+
+
+@pytest.fixture
+def write_feed():
+    """write_feed(path, base, names, pub_dates=None): grava rss_feed em path."""
+    def write(path, base: str, names: Iterable[str], pub_dates: Optional[Dict[str, str]] = None):
+        path.write_text(rss_feed(base, names, pub_dates))
+    return write
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.aio import AsyncVideoDownloader
+from videodl.downloader import DownloadCancelled
+
+
+class FakeDownloader:
+    """Bloqueia na thread até release; publica progress_steps eventos."""
+
+    def __init__(self, progress_steps=3):
+        self.release = threading.Event()
+        self.progress_steps = progress_steps
+        self.active = 0
+        self.peak = 0
+        self.cancelled = []
+        self._lock = threading.Lock()
+
+    def list_formats(self, url):
+        return [url]
+
+    def download(self, url, output_dir, format_id, only_audio, progress_cb=None,
+                 cancel_event=None, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            for i in range(self.progress_steps):
+                if progress_cb:
+                    progress_cb({'status': 'downloading', 'filename': url,
+                                 'downloaded_bytes': i + 1, 'info_dict': {}})
+            while not self.release.wait(0.01):
+                if cancel_event.is_set():
+                    self.cancelled.append(url)
+                    raise DownloadCancelled("cancelado")
+            if progress_cb:
+                progress_cb({'status': 'finished', 'filename': url, 'downloaded_bytes': 9})
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_download_limits_threads_and_delivers_progress_on_loop():
+    fake = FakeDownloader()
+    fake.release.set()
+
+    async def main():
+        seen = []
+        loop_thread = threading.get_ident()
+
+        def _cb(d):
+            seen.append((threading.get_ident(), d))
+
+        async with AsyncVideoDownloader(fake, max_downloads=2) as adl:
+            assert await adl.list_formats('http://x') == ['http://x']
+            await asyncio.gather(*(adl.download(f'http://{i}', '/tmp', progress_cb=_cb)
+                                   for i in range(20)))
+        await asyncio.sleep(0)
+        assert fake.peak <= 2
+        assert all(tid == loop_thread for tid, _ in seen)
+        assert len(seen) == 20 * 4
+        assert all('info_dict' not in d for _, d in seen)
+
+    asyncio.run(main())
+
+
+def test_task_cancellation_stops_download():
+    fake = FakeDownloader()
+
+    async def main():
+        async with AsyncVideoDownloader(fake, max_downloads=1) as adl:
+            running = asyncio.create_task(adl.download('http://a', '/tmp'))
+            waiting = asyncio.create_task(adl.download('http://b', '/tmp'))
+            await asyncio.sleep(0.1)
+            running.cancel()
+            waiting.cancel()
+            results = await asyncio.gather(running, waiting, return_exceptions=True)
+            assert all(isinstance(r, asyncio.CancelledError) for r in results)
+        # b nunca começou: a espera pela vaga não ocupa thread
+        assert fake.cancelled == ['http://a']
+        assert fake.active == 0
+
+    asyncio.run(main())
+
+
+def test_iter_progress_yields_events_and_cancels_on_break():
+    fake = FakeDownloader(progress_steps=2)
+
+    async def main():
+        async with AsyncVideoDownloader(fake) as adl:
+            fake.release.set()
+            events = [d async for d in adl.iter_progress('http://a', '/tmp')]
+            assert [d['status'] for d in events] == ['downloading', 'downloading', 'finished']
+
+            fake.release.clear()
+            gen = adl.iter_progress('http://b', '/tmp')
+            async for d in gen:
+                break
+            await gen.aclose()
+        assert fake.cancelled == ['http://b']
+
+    asyncio.run(main())
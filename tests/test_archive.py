@@ -0,0 +1,58 @@
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.archive import DownloadArchive, file_checksum
+
+
+def test_archive_record_and_query(tmp_path):
+    media = tmp_path / 'video.mp4'
+    media.write_bytes(b'x' * 1000)
+    archive = DownloadArchive(str(tmp_path / 'archive.sqlite3'))
+    assert 'youtube abc' not in archive
+    archive.record('Youtube', 'abc', str(media), url='https://example/abc')
+    # formato de id do yt-dlp ("extrator id", extrator em minúsculas)
+    assert 'youtube abc' in archive
+    entry = archive.get('youtube', 'abc')
+    assert entry.size == 1000
+    assert entry.checksum == file_checksum(str(media))
+    # add() do yt-dlp não apaga os dados do arquivo
+    archive.add('youtube abc')
+    assert archive.get('youtube', 'abc').size == 1000
+    assert None not in archive
+
+
+def test_archive_prune_missing_files(tmp_path):
+    archive = DownloadArchive(str(tmp_path / 'a.sqlite3'), checksum=False)
+    kept = tmp_path / 'kept.mp4'
+    kept.write_bytes(b'1')
+    archive.record('generic', 'kept', str(kept))
+    archive.record('generic', 'gone', str(tmp_path / 'gone.mp4'))
+    archive.add('generic noinfo')
+    assert archive.prune() == 1
+    assert sorted(e.video_id for e in archive.entries()) == ['kept', 'noinfo']
+    assert archive.remove('generic', 'kept')
+    assert len(archive) == 1
+
+
+def test_archive_concurrent_writers(tmp_path):
+    path = str(tmp_path / 'a.sqlite3')
+    archive = DownloadArchive(path, checksum=False)
+    other = DownloadArchive(path, checksum=False)  # simula outro processo
+
+    def writer(arch, prefix):
+        for i in range(50):
+            arch.add(f'generic {prefix}{i}')
+
+    threads = [threading.Thread(target=writer, args=(a, p))
+               for a, p in ((archive, 'a'), (archive, 'b'), (other, 'c'))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(archive) == 150
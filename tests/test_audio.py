@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+pytest.importorskip('yt_dlp')
+
+from videodl import downloader as downloader_module
+from videodl.downloader import VideoDownloader
+
+
+@pytest.fixture
+def audio_server(tmp_path, http_server):
+    root = tmp_path / 'srv'
+    root.mkdir()
+    (root / 'episodio.m4a').write_bytes(os.urandom(30_000))
+    return http_server(root)
+
+
+def test_audio_options_copy_unless_mp3(monkeypatch, tmp_path):
+    monkeypatch.setattr(downloader_module, 'ffmpeg_path', lambda: '/usr/bin/ffmpeg')
+    dl = VideoDownloader()
+    opts = dl._build_ydl_opts(str(tmp_path), None, True, False, False, True, True,
+                              audio_format='ogg')
+    # vorbis é copiado para .ogg; outras trilhas recodificam só se não houver vorbis
+    assert opts['format'] == 'bestaudio[acodec^=vorbis]/bestaudio/best'
+    assert opts['postprocessors'] == [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'vorbis'}]
+    opts = dl._build_ydl_opts(str(tmp_path), None, True, False, False, True, True)
+    assert opts['postprocessors'] == [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'best'}]
+    with pytest.raises(ValueError):
+        dl._build_ydl_opts(str(tmp_path), None, True, False, False, True, True, audio_format='wma')
+
+    monkeypatch.setattr(downloader_module, 'ffmpeg_path', lambda: None)
+    opts = dl._build_ydl_opts(str(tmp_path), None, True, False, False, True, True)
+    assert opts['postprocessors'] == [] and opts['format'].startswith('bestaudio[ext=m4a]/')
+    for audio_format in ('mp3', 'opus'):
+        with pytest.raises(RuntimeError):
+            dl._build_ydl_opts(str(tmp_path), None, True, False, False, True, True,
+                               audio_format=audio_format)
+
+
+def test_audio_only_download_keeps_source_track(audio_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader_module, 'ffmpeg_path', lambda: None)
+    dl = VideoDownloader()
+    url = f'{audio_server}/episodio.m4a'
+    audio = dl.choose_audio(url, 'm4a')
+    assert audio is not None and audio.ext == 'm4a'
+    assert dl.estimate_bytes(url, only_audio=True, audio_format='m4a') == (None, False)
+    dl.download(url, str(tmp_path / 'out'), None, True, audio_format='m4a')
+    assert os.listdir(tmp_path / 'out') == ['episodio.m4a']
+    assert os.path.getsize(tmp_path / 'out' / 'episodio.m4a') == 30_000
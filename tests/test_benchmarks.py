@@ -0,0 +1,35 @@
+import os
+import sys
+import urllib.request
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+for path in (os.path.join(BASE_DIR, 'src'), os.path.join(BASE_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from server import BenchServer
+
+
+def test_bench_server_serves_ranges_hls_and_feed():
+    with BenchServer(file_size=50_000, files=2, segments=3, segment_size=1000) as srv:
+        req = urllib.request.Request(srv.progressive_url(1), headers={'Range': 'bytes=100-199'})
+        with urllib.request.urlopen(req) as resp:
+            assert resp.status == 206
+            assert resp.headers['Content-Range'] == 'bytes 100-199/50000'
+            assert len(resp.read()) == 100
+        with urllib.request.urlopen(srv.hls_url) as resp:
+            assert resp.read().decode().count('.ts') == 3
+        with urllib.request.urlopen(srv.playlist_url) as resp:
+            feed = resp.read().decode()
+        assert feed.count('<enclosure') == 2 and srv.progressive_url(1) in feed
+
+
+def test_compare_reports_ratios():
+    pytest.importorskip('yt_dlp')
+    import run
+
+    base = {'config': {'repeat': 1}, 'results': {'a': {'seconds': {'median': 2.0, 'runs': 1}}}}
+    current = {'config': {'repeat': 1}, 'results': {'a': {'seconds': {'median': 1.0, 'runs': 1}}}}
+    assert run.compare(current, base) == ['a.seconds.median: 2 -> 1 (0.50x)']
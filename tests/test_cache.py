@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.cache import InfoCache, normalize_url
+
+
+def test_normalize_url_ignores_tracking_and_order():
+    a = normalize_url('HTTPS://Example.com:443/watch?v=1&utm_source=x&b=2#t=10')
+    b = normalize_url('https://example.com/watch?b=2&v=1')
+    assert a == b
+
+
+def test_cache_hits_misses_and_lru():
+    cache = InfoCache(max_entries=2)
+    assert cache.get('http://a') is None
+    cache.put('http://a', {'id': 'a'}, elapsed=1.5)
+    cache.put('http://b', {'id': 'b'})
+    assert cache.get('http://a') == {'id': 'a'}
+    cache.put('http://c', {'id': 'c'})  # remove b (menos recente)
+    assert cache.get('http://b') is None
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2
+    assert stats['saved_seconds'] == 1.5
+
+
+def test_cache_variants_are_separate():
+    cache = InfoCache()
+    cache.put('http://a', {'_type': 'playlist'}, variant='flat')
+    assert cache.get('http://a', 'video') is None
+    assert cache.get('http://a', 'flat') == {'_type': 'playlist'}
+
+
+def test_cache_ttl_and_disk(tmp_path):
+    cache = InfoCache(ttl=60, cache_dir=str(tmp_path))
+    cache.put('http://a', {'id': 'a'})
+    # nova instância lê do disco
+    other = InfoCache(ttl=60, cache_dir=str(tmp_path))
+    assert other.get('http://a') == {'id': 'a'}
+    expired = InfoCache(ttl=0.01, cache_dir=str(tmp_path))
+    time.sleep(0.02)
+    assert expired.get('http://a') is None
+    assert not any(n.endswith('.json') for n in os.listdir(tmp_path))
+
+
+def test_cache_disk_size_bound(tmp_path):
+    cache = InfoCache(cache_dir=str(tmp_path), max_disk_entries=3)
+    for i in range(6):
+        cache.put(f'http://x/{i}', {'id': i})
+    assert len([n for n in os.listdir(tmp_path) if n.endswith('.json')]) == 3
+
+
+def test_normalize_url_keeps_smuggled_data():
+    smuggled = 'http://h/a.mp4#__youtubedl_smuggle=%7B%7D'
+    assert normalize_url(smuggled) != normalize_url('http://h/a.mp4')
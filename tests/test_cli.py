@@ -0,0 +1,76 @@
+import os
+import sys
+
+try:
+    import pytest  # type: ignore
+except ImportError:  # pragma: no cover
+    pytest = None  # type: ignore
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.cli import parse_batch, run_jobs
+
+
+class RecordingDownloader:
+    def __init__(self):
+        self.calls = []
+
+    def download(self, url, output_dir, format_id, only_audio, progress_cb=None,
+                 cancel_event=None, **kwargs):
+        self.calls.append((url, format_id, only_audio, kwargs))
+        if progress_cb:
+            progress_cb({'status': 'finished', 'filename': url + '.mp4', 'total_bytes': 100})
+        if 'fail' in url:
+            raise RuntimeError("erro simulado")
+
+
+def test_parse_batch_plain_and_jsonl():
+    specs = parse_batch([
+        "# comentário",
+        "",
+        "https://a",
+        '{"url": "https://b", "only_audio": true, "priority": 2}',
+    ])
+    assert specs == [{'url': 'https://a'}, {'url': 'https://b', 'only_audio': True, 'priority': 2}]
+
+
+def test_parse_batch_rejects_unknown_options():
+    with pytest.raises(ValueError):
+        parse_batch(['{"url": "https://a", "bogus": 1}'])
+    with pytest.raises(ValueError):
+        parse_batch(['{"only_audio": true}'])
+
+
+def test_run_jobs_manifest(tmp_path):
+    fake = RecordingDownloader()
+    specs = [{'url': 'https://a'}, {'url': 'https://fail', 'format_id': '22'}]
+    manifest = run_jobs(specs, str(tmp_path), concurrency=2,
+                        defaults={'format_id': None, 'only_audio': True}, downloader=fake)
+    assert manifest['counts'] == {'done': 1, 'failed': 1, 'cancelled': 0}
+    assert manifest['total_bytes'] == 200
+    by_url = {j['url']: j for j in manifest['jobs']}
+    assert by_url['https://fail']['error'] == 'erro simulado'
+    assert by_url['https://a']['elapsed'] is not None
+    # CPU do lote: sem pipeline, nada em postprocess
+    cpu = manifest['cpu']
+    assert cpu['postprocess'] == 0.0 and cpu['total'] >= cpu['user']
+    assert cpu['per_job'] == cpu['total']
+    # opção do job prevalece sobre o padrão
+    calls = {c[0]: c for c in fake.calls}
+    assert calls['https://fail'][1] == '22'
+    assert calls['https://a'][2] is True
+
+
+def test_run_jobs_resume_keeps_journaled_options(tmp_path):
+    # spec montada de JournalJob.download_kwargs(): opções fora do lote sobrevivem
+    fake = RecordingDownloader()
+    spec = {'url': 'https://a', 'output_dir': str(tmp_path), 'format_id': None,
+            'only_audio': False, 'ensure_audio': False, 'skip_archived': False,
+            'resume_key': 'abc'}
+    run_jobs([spec], str(tmp_path), downloader=fake)
+    kwargs = fake.calls[0][3]
+    assert kwargs['ensure_audio'] is False and kwargs['skip_archived'] is False
+    assert kwargs['resume_key'] == 'abc'
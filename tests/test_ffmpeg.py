@@ -0,0 +1,95 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl import ffmpeg
+from videodl.downloader import VideoDownloader
+
+FAKE_FFMPEG = """#!/bin/sh
+echo run >> "$0.calls"
+case "$1" in
+  -version) echo "ffmpeg version 6.1.1-test Copyright (c) 2000-2023"; echo "built with gcc" ;;
+  *) printf ' V..... = Video\\n A..... = Audio\\n ------\\n V....D libx264              H.264\\n A....D libmp3lame           MP3\\n A....D aac                  AAC\\n' ;;
+esac
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    path = tmp_path / 'ffmpeg'
+    path.write_text(FAKE_FFMPEG)
+    path.chmod(0o755)
+    monkeypatch.setenv('PATH', str(tmp_path))
+    ffmpeg.clear_ffmpeg_cache()
+    yield path
+    ffmpeg.clear_ffmpeg_cache()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='script sh')
+def test_probe_parses_version_and_encoders_once(fake_ffmpeg):
+    info = ffmpeg.probe_ffmpeg()
+    assert info.path == str(fake_ffmpeg) and info.available
+    assert info.version == '6.1.1-test'
+    assert info.encoders == {'libx264', 'libmp3lame', 'aac'}
+    assert info.has_encoder('libmp3lame') and not info.has_encoder('libopus')
+    assert ffmpeg.probe_ffmpeg() is info
+    assert (fake_ffmpeg.parent / 'ffmpeg.calls').read_text().count('run') == 2
+    # caminho resolvido vai para o yt-dlp em vez de uma nova busca no PATH
+    opts = VideoDownloader()._build_ydl_opts('out', None, True, False, False, True, True)
+    assert opts['ffmpeg_location'] == str(fake_ffmpeg)
+
+
+def test_probe_without_ffmpeg(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    ffmpeg.clear_ffmpeg_cache()
+    try:
+        info = ffmpeg.probe_ffmpeg()
+        assert not info.available and info.version is None
+        # só o MP3 recodifica: sem ffmpeg, erro antes de baixar
+        with pytest.raises(RuntimeError, match='ffmpeg'):
+            VideoDownloader()._build_ydl_opts('out', None, True, False, False, True, True,
+                                              audio_format='mp3')
+    finally:
+        ffmpeg.clear_ffmpeg_cache()
+
+
+def test_slow_probe_does_not_block_path_lookup(fake_ffmpeg, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    probes = []
+
+    def slow_probe(path):
+        probes.append(path)
+        started.set()
+        release.wait(5)
+        return ffmpeg.FFmpegInfo(path)
+
+    monkeypatch.setattr(ffmpeg, '_probe', slow_probe)
+    threads = [threading.Thread(target=ffmpeg.probe_ffmpeg) for _ in range(2)]
+    for t in threads:
+        t.start()
+    try:
+        assert started.wait(5)
+        # download iniciado durante a sondagem da GUI: só a busca no PATH
+        assert ffmpeg.ffmpeg_path() == str(fake_ffmpeg)
+    finally:
+        release.set()
+        for t in threads:
+            t.join(5)
+    assert probes == [str(fake_ffmpeg)] and ffmpeg.probe_ffmpeg().path == str(fake_ffmpeg)
+
+
+def test_entry_modules_do_not_import_ytdlp():
+    code = ("import sys, videodl.cli, videodl.service, videodl.aio, videodl.downloader as d\n"
+            "assert 'yt_dlp' not in sys.modules, 'yt_dlp importado no carregamento'\n"
+            "from videodl.ydl import ytdlp\n"
+            "if ytdlp() is not None: assert d.YoutubeDL is ytdlp().YoutubeDL\n")
+    subprocess.run([sys.executable, '-c', code], check=True,
+                   env=dict(os.environ, PYTHONPATH=SRC_DIR))
@@ -0,0 +1,105 @@
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.downloader import FormatInfo
+from videodl.formats import (AUDIO_FORMATS, FormatProfile, FormatSelector, PROFILES,
+                             get_audio_format, get_profile, select_audio)
+
+
+def _fmt(itag, ext, height, vcodec, acodec, size=None, tbr=None, fps=None):
+    return FormatInfo(itag=itag, ext=ext, resolution=f'{height}p' if height else 'audio',
+                      fps=fps, vcodec=vcodec, acodec=acodec, filesize=size, note='',
+                      height=height, tbr=tbr, protocol='https', duration=600)
+
+
+# grade parecida com a de um vídeo do YouTube
+FORMATS = [
+    _fmt('sb0', 'mhtml', None, 'none', 'none'),
+    _fmt('139', 'm4a', None, 'none', 'mp4a.40.5', size=3_000_000, tbr=48),
+    _fmt('140', 'm4a', None, 'none', 'mp4a.40.2', size=9_000_000, tbr=128),
+    _fmt('251', 'webm', None, 'none', 'opus', size=8_000_000, tbr=135),
+    _fmt('18', 'mp4', 360, 'avc1.42001E', 'mp4a.40.2', size=20_000_000, tbr=500),
+    _fmt('22', 'mp4', 720, 'avc1.64001F', 'mp4a.40.2', tbr=1500),
+    _fmt('136', 'mp4', 720, 'avc1.4d401f', 'none', size=60_000_000, tbr=900, fps=30),
+    _fmt('247', 'webm', 720, 'vp9', 'none', size=50_000_000, tbr=800, fps=30),
+    _fmt('137', 'mp4', 1080, 'avc1.640028', 'none', size=150_000_000, tbr=2500, fps=30),
+    _fmt('248', 'webm', 1080, 'vp9', 'none', size=120_000_000, tbr=2000, fps=30),
+]
+
+
+def test_quality_prefers_best_merge_when_no_comparable_progressive():
+    choice = FormatSelector(FormatProfile()).select(FORMATS)
+    assert choice.format_id == '137+140'  # mp4 + m4a do mesmo container
+    assert choice.needs_merge and choice.expected_bytes == 159_000_000
+    assert choice.format_spec.startswith('137+140/')
+
+
+def test_comparable_progressive_avoids_merge():
+    choice = FormatSelector(PROFILES['720p']).select(FORMATS)
+    # 22 é progressivo na mesma altura que 136+140: sem merge
+    assert choice.format_id == '22' and not choice.needs_merge
+    # tamanho estimado por bitrate x duração
+    assert choice.expected_bytes == 1500 * 1000 // 8 * 600
+
+
+def test_codec_preference_and_height_limit():
+    profile = FormatProfile('vp9', max_height=1080, video_codecs=('vp9',), prefer_progressive=False)
+    assert FormatSelector(profile).select(FORMATS).format_id == '248+251'
+
+
+def test_budget_and_smallest_objectives():
+    budget = FormatSelector(FormatProfile(max_bytes=80_000_000)).select(FORMATS)
+    # 22 (~112 MB pelo bitrate) e os 1080p estouram o orçamento
+    assert budget.format_id == '136+140' and budget.expected_bytes == 69_000_000
+    smallest = FormatSelector(PROFILES['data-saver']).select(FORMATS)
+    assert smallest.format_id == '18'
+    no_merge = FormatSelector(PROFILES['no-merge']).rank(FORMATS)
+    assert all(not c.needs_merge for c in no_merge)
+
+
+def test_fastest_counts_merge_cost():
+    profile = FormatProfile(objective='fastest', max_height=720)
+    ranked = FormatSelector(profile).rank(FORMATS)
+    assert ranked[0].format_id == '18'
+    assert ranked[0].estimated_seconds == pytest.approx(20_000_000 / profile.bandwidth)
+
+
+def test_rank_is_memoized_per_format_set():
+    selector = FormatSelector('1080p')
+    first = selector.rank(FORMATS)
+    assert selector.rank(list(FORMATS)) == first
+    assert len(selector._memo) == 1
+    assert [f.itag for f in selector.sort_formats(FORMATS)][:2] == ['137', '140']
+
+
+def test_profile_validation_and_fallback_spec():
+    with pytest.raises(ValueError):
+        get_profile('inexistente')
+    with pytest.raises(ValueError):
+        FormatProfile(objective='rapido')
+    assert PROFILES['720p'].fallback_spec() == 'bv*[height<=?720]+ba/b[height<=?720]/best'
+    assert PROFILES['no-merge'].fallback_spec() == 'b[vcodec!=none][acodec!=none]/b/best'
+
+
+def test_audio_selection_prefers_stream_copy():
+    # best: maior bitrate, qualquer codec (opus vira .opus sem recodificar)
+    assert select_audio(FORMATS).itag == '251'
+    m4a = select_audio(FORMATS, 'm4a')
+    assert m4a.itag == '140' and AUDIO_FORMATS['m4a'].copies(m4a)
+    assert not AUDIO_FORMATS['ogg'].copies(select_audio(FORMATS, 'ogg'))  # sem vorbis: recodifica
+    assert not AUDIO_FORMATS['mp3'].copies(m4a) and AUDIO_FORMATS['best'].copies(m4a)
+    assert select_audio([f for f in FORMATS if f.vcodec != 'none']) is None
+    # link direto (podcast): sem codec, vale a extensão
+    direct = FormatInfo(itag='mp3', ext='mp3', resolution='audio only', fps=None, vcodec='none',
+                        acodec='none', filesize=None, note='')
+    assert select_audio([direct], 'mp3') is direct and AUDIO_FORMATS['mp3'].copies(direct)
+    assert get_audio_format('opus').spec() == 'bestaudio[acodec^=opus]/bestaudio/best'
+    with pytest.raises(ValueError):
+        select_audio(FORMATS, 'wma')
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.fragments import FragmentTiming, fragment_stats
+
+
+def test_fragment_stats():
+    timings = [FragmentTiming(i, elapsed=i / 10, bytes=100, retries=i % 2) for i in range(1, 21)]
+    stats = fragment_stats(timings)
+    assert stats['fragments'] == 20
+    assert stats['bytes'] == 2000
+    assert stats['retries'] == 10
+    assert stats['p50'] == 1.1
+    assert stats['p95'] == 2.0
+    assert fragment_stats([]) == {'fragments': 0}
+
+
+@pytest.fixture
+def hls_server(tmp_path, http_server):
+    segments = []
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:2', '#EXT-X-MEDIA-SEQUENCE:0']
+    for i in range(12):
+        data = bytes([0x47]) + os.urandom(4999)
+        (tmp_path / f'seg{i}.ts').write_bytes(data)
+        segments.append(data)
+        lines += ['#EXTINF:2.0,', f'seg{i}.ts']
+    lines.append('#EXT-X-ENDLIST')
+    (tmp_path / 'index.m3u8').write_text('\n'.join(lines) + '\n')
+    return f'{http_server(tmp_path)}/index.m3u8', b''.join(segments)
+
+
+def test_windowed_fragments_keep_order(hls_server, tmp_path):
+    pytest.importorskip('yt_dlp')
+    from videodl.downloader import VideoDownloader
+
+    url, expected = hls_server
+    out = tmp_path / 'out'
+    timings = []
+    VideoDownloader().download(url, str(out), '0', False, fragment_workers=4, fragment_buffer=5,
+                               progress_cb=lambda d: timings.extend(d.get('fragment_timings') or []))
+    files = list(out.iterdir())
+    assert len(files) == 1
+    assert files[0].read_bytes() == expected
+    assert sorted(t['index'] for t in timings) == list(range(1, 13))
@@ -0,0 +1,80 @@
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.downloader import DownloadCancelled
+from videodl.jobs import DownloadQueue, JobState
+
+
+class FakeDownloader:
+    """Substitui VideoDownloader: registra chamadas e bloqueia até ser liberado."""
+
+    def __init__(self, fail_urls=()):
+        self.calls = []
+        self.release = threading.Event()
+        self.fail_urls = set(fail_urls)
+        self._lock = threading.Lock()
+
+    def download(self, url, output_dir, format_id, only_audio, progress_cb=None,
+                 cancel_event=None, **kwargs):
+        with self._lock:
+            self.calls.append(url)
+        if progress_cb:
+            progress_cb({'status': 'downloading', 'downloaded_bytes': 1, 'total_bytes': 2})
+        while not self.release.wait(0.01):
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled("cancelado")
+        if url in self.fail_urls:
+            raise RuntimeError("falhou")
+
+
+def test_queue_runs_jobs_and_reports_states():
+    fake = FakeDownloader(fail_urls={'http://b'})
+    q = DownloadQueue(concurrency=2, downloader=fake)
+    a = q.submit('http://a', '/tmp')
+    b = q.submit('http://b', '/tmp')
+    fake.release.set()
+    assert q.join(timeout=5)
+    assert a.state == JobState.DONE
+    assert b.state == JobState.FAILED and b.error == 'falhou'
+    q.shutdown()
+
+
+def test_queue_respects_priority():
+    fake = FakeDownloader()
+    q = DownloadQueue(concurrency=1, downloader=fake)
+    q.submit('http://blocker', '/tmp')
+    q.submit('http://low', '/tmp', priority=5)
+    q.submit('http://high', '/tmp', priority=1)
+    fake.release.set()
+    assert q.join(timeout=5)
+    assert fake.calls == ['http://blocker', 'http://high', 'http://low']
+    q.shutdown()
+
+
+def test_cancel_is_per_job():
+    fake = FakeDownloader()
+    states = []
+    q = DownloadQueue(concurrency=2, downloader=fake, on_state=lambda j: states.append((j.id, j.state)))
+    a = q.submit('http://a', '/tmp')
+    b = q.submit('http://b', '/tmp')
+    pending = q.submit('http://c', '/tmp')
+    while q.active_count < 2:
+        time.sleep(0.005)
+    assert q.cancel(a.id)
+    assert q.cancel(pending.id)
+    assert q.join(timeout=0.2) is False  # b continua rodando
+    fake.release.set()
+    assert q.join(timeout=5)
+    assert a.state == JobState.CANCELLED
+    assert pending.state == JobState.CANCELLED
+    assert b.state == JobState.DONE
+    assert 'http://c' not in fake.calls
+    assert not q.cancel(b.id)
+    q.shutdown()
@@ -0,0 +1,54 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.journal import JobJournal
+
+
+def _progress(entry, status, downloaded=0, filename=None):
+    return {'status': status, 'info_dict': {'id': entry}, 'filename': filename or f'{entry}.mp4',
+            'downloaded_bytes': downloaded, 'total_bytes': 1000}
+
+
+def test_journal_replay_after_crash(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = JobJournal(path, progress_interval=0)
+    done_key = journal.start_job('https://done', str(tmp_path), {'only_audio': True})
+    journal.finish_job(done_key, 'done')
+    key = journal.start_job('https://playlist', str(tmp_path), {'playlist_mode': True})
+    journal.entry_progress(key, _progress('a', 'finished', 1000))
+    journal.entry_done(key, 'a', 'a.mp4')
+    journal.entry_progress(key, _progress('b', 'downloading', 400))
+    journal.entry_progress(key, _progress('c', 'finished', 1000))  # arquivo pronto, pós pendente
+    journal.close()  # "queda"
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"type": "entry", "job"')  # linha truncada
+
+    pending = JobJournal(path).pending()
+    assert [j.key for j in pending] == [key]
+    job = pending[0]
+    assert job.finished_entries == {'a'}
+    assert job.partial_bytes == 400
+    assert job.entries['c'].status == 'downloaded'
+    assert job.download_kwargs() == {'playlist_mode': True, 'resume_key': key}
+
+
+def test_journal_throttles_progress_and_compacts(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = JobJournal(path, progress_interval=60)
+    key = journal.start_job('https://x', str(tmp_path), {})
+    for i in range(100):
+        journal.entry_progress(key, _progress('x', 'downloading', i))
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 2  # job + 1 progresso
+    other = journal.start_job('https://y', str(tmp_path), {})
+    journal.finish_job(other, 'done')
+    journal.compact()
+    journal.entry_progress(key, _progress('x', 'finished', 100))
+    loaded = journal.load()
+    assert set(loaded) == {key}
+    assert loaded[key].entries['x'].status == 'downloaded'
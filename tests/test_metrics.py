@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.metrics import JobMetrics, MetricsRegistry
+
+
+def test_registry_aggregates_and_exports(tmp_path):
+    registry = MetricsRegistry(jsonl_path=str(tmp_path / 'm.jsonl'),
+                               prometheus_path=str(tmp_path / 'm.prom'))
+    metrics = registry.start(7, 'http://x', queue_wait=0.3)
+    metrics.add_span('extraction', 10.0, 11.5, extractor='Generic')
+    metrics.add_span('download', 11.5, 12.0)
+    metrics.add_span('download', 11.6, 12.0)
+    metrics.add_span('postprocess', 12.0, 14.0, postprocessor='FFmpegExtractAudio')
+    metrics.on_progress({'status': 'downloading', 'filename': 'a', 'downloaded_bytes': 10})
+    metrics.on_progress({'status': 'finished', 'filename': 'a', 'total_bytes': 40})
+    metrics.on_progress({'status': 'finished', 'filename': 'b', 'total_bytes': 2})
+    metrics.incr('http_retries', 2)
+    registry.finish(metrics, 'done')
+
+    record = json.loads((tmp_path / 'm.jsonl').read_text())
+    assert record['stages'] == pytest.approx({'extraction': 1.5, 'download': 0.9,
+                                              'postprocess': 2.0})
+    assert record['counters'] == {'bytes': 42, 'http_retries': 2}
+    assert record['queue_wait'] == 0.3 and len(record['spans']) == 4
+    prom = (tmp_path / 'm.prom').read_text()
+    assert 'videodl_jobs_total{state="done"} 1' in prom
+    assert 'videodl_stage_seconds_bucket{stage="extraction",le="2.5"} 1' in prom
+    assert 'videodl_stage_seconds_bucket{stage="extraction",le="1"} 0' in prom
+    assert 'videodl_postprocessor_seconds_total{postprocessor="FFmpegExtractAudio"} 2.000000' in prom
+    assert 'videodl_retries_total{kind="http"} 2' in prom
+    assert registry.get(7) is metrics
+
+
+def test_span_records_errors():
+    metrics = JobMetrics()
+    with pytest.raises(ValueError):
+        with metrics.span('download', filename='x'):
+            raise ValueError()
+    assert metrics.spans[0].attrs == {'filename': 'x', 'error': 'ValueError'}
+
+
+@pytest.fixture
+def media_server(tmp_path, http_server):
+    (tmp_path / 'clip.mp4').write_bytes(os.urandom(50_000))
+    return f'{http_server(tmp_path)}/clip.mp4'
+
+
+def test_queue_records_job_spans(media_server, tmp_path):
+    pytest.importorskip('yt_dlp')
+    from videodl.jobs import DownloadQueue, JobState
+
+    registry = MetricsRegistry()
+    queue = DownloadQueue(concurrency=1, metrics=registry)
+    job = queue.submit(media_server, str(tmp_path / 'out'), format_id='mp4', ensure_audio=False)
+    queue.join()
+    queue.shutdown()
+    assert job.state == JobState.DONE
+    data = job.to_dict()['metrics']
+    assert data['state'] == JobState.DONE
+    assert set(data['stages']) >= {'extraction', 'format_selection', 'download', 'move'}
+    assert data['counters']['bytes'] == 50_000
+    download = [s for s in job.metrics.spans if s.name == 'download']
+    assert download[0].attrs['format_id'] == 'mp4'
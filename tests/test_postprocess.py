@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+pytest.importorskip('yt_dlp')
+
+from videodl.postprocess import PostProcessPipeline, postprocess_options
+
+
+def _item(tmp_path, name):
+    raw = tmp_path / 'tmp' / name
+    raw.parent.mkdir(exist_ok=True)
+    raw.write_bytes(b'x')
+    info = {'id': name, 'title': name, 'ext': 'mp4', '__finaldir': str(tmp_path / 'final')}
+    return str(raw), info
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="Exec usa o shell POSIX")
+def test_pipeline_moves_file_and_runs_after_move(tmp_path):
+    opts = postprocess_options({'postprocessors': [{'key': 'Exec', 'exec_cmd': ['true']}],
+                                'outtmpl': 'ignored', 'format': 'ignored'})
+    assert 'format' not in opts and opts['ignoreerrors'] is False
+    pipeline = PostProcessPipeline(workers=1, max_pending=1, use_processes=False)
+    done = []
+    try:
+        filename, info = _item(tmp_path, 'a.mp4')
+        fut = pipeline.submit(opts, filename, info, [], {},
+                              on_done=lambda final: done.append(final['id']) or final)
+        final = fut.result(timeout=30)
+    finally:
+        pipeline.shutdown()
+    assert final['filepath'] == str(tmp_path / 'final' / 'a.mp4')
+    assert os.path.exists(final['filepath'])
+    assert done == ['a.mp4']
+    assert final['__postprocess_elapsed'] >= 0
+    # threads: o CPU do item já conta no do processo
+    assert '__postprocess_cpu' not in final and pipeline.cpu_seconds == 0.0
+    spans = {(s['name'], s.get('postprocessor')) for s in final['__postprocess_spans']}
+    assert spans == {('postprocess', 'Exec'), ('move', None)}
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="Exec usa o shell POSIX")
+def test_pipeline_backpressure(tmp_path):
+    opts = postprocess_options({'postprocessors': [{'key': 'Exec', 'exec_cmd': ['sleep 0.3; true']}]})
+    pipeline = PostProcessPipeline(workers=1, max_pending=1, use_processes=False)
+    try:
+        first = pipeline.submit(opts, *_item(tmp_path, 'a.mp4'), [], {})
+        submitted = threading.Event()
+
+        def _second():
+            pipeline.submit(opts, *_item(tmp_path, 'b.mp4'), [], {})
+            submitted.set()
+
+        threading.Thread(target=_second, daemon=True).start()
+        # a fila está cheia: o segundo envio espera o primeiro terminar
+        assert not submitted.wait(0.1)
+        first.result(timeout=30)
+        assert submitted.wait(30)
+    finally:
+        pipeline.shutdown()
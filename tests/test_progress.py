@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.progress import PlaylistProgress, ProgressBus
+
+
+def test_playlist_progress_out_of_order():
+    p = PlaylistProgress(4)
+    assert p.update(3, {'status': 'finished'}) == 25.0
+    assert p.update(1, {'status': 'downloading', 'downloaded_bytes': 50, 'total_bytes': 100}) == 37.5
+    # item 2 começa depois do 3 ter terminado: o global não regride
+    assert p.update(2, {'status': 'downloading', 'downloaded_bytes': 0, 'total_bytes': 100}) == 37.5
+    p.update(1, {'status': 'finished'})
+    assert p.completed == 2
+    assert p.percent() == 50.0
+
+
+def test_playlist_progress_merged_files_do_not_regress():
+    p = PlaylistProgress(2)
+    video = {'filename': 'v.f137.mp4', 'total_bytes': 100}
+    assert p.update(1, dict(video, status='downloading', downloaded_bytes=90)) == 45.0
+    assert p.update(1, dict(video, status='finished', downloaded_bytes=100)) == 50.0
+    # a trilha de áudio começa sob o mesmo índice: o item não volta para trás
+    audio = {'filename': 'v.f140.m4a', 'total_bytes': 10}
+    assert p.update(1, dict(audio, status='downloading', downloaded_bytes=0)) == 50.0
+    assert p.update(1, dict(audio, status='finished', downloaded_bytes=10)) == 50.0
+
+    # com os tamanhos dos requested_formats, o vídeo pronto ainda não é o item inteiro
+    info = {'requested_formats': [{'filesize': 100}, {'filesize_approx': 100}]}
+    video = dict(video, info_dict=info)
+    assert p.update(2, dict(video, status='downloading', downloaded_bytes=50)) == 62.5
+    assert p.update(2, dict(video, status='finished', downloaded_bytes=100)) == 75.0
+    audio = {'filename': 'v.f140.m4a', 'total_bytes': 100, 'info_dict': info}
+    assert p.update(2, dict(audio, status='downloading', downloaded_bytes=50)) == 87.5
+    assert p.completed == 1
+    assert p.update(2, dict(audio, status='finished', downloaded_bytes=100)) == 100.0
+
+
+def test_playlist_progress_ignores_unknown_total():
+    p = PlaylistProgress(2)
+    assert p.update(1, {'status': 'downloading', 'downloaded_bytes': 10}) == 0.0
+
+
+def test_progress_bus_coalesces_and_aggregates():
+    bus = ProgressBus()
+    for i in range(1, 101):
+        bus.publish(1, {'status': 'downloading', 'filename': 'a', 'downloaded_bytes': i,
+                        'total_bytes': 200, 'speed': 10.0})
+    bus.publish(2, {'status': 'downloading', 'filename': 'b', 'downloaded_bytes': 50,
+                    'total_bytes': 100, 'speed': 30.0})
+    snap = bus.poll()
+    assert snap.jobs[1].downloaded_bytes == 100  # último valor vence
+    assert snap.active == 2
+    assert snap.percent == 50.0
+    assert snap.speed == 40.0
+    assert snap.eta == (300 - 150) / 40.0
+    assert bus.poll() is None  # nada mudou
+    bus.finish(1)
+    snap = bus.poll()
+    assert snap.active == 1 and snap.jobs[1].percent == 100.0
+
+
+def test_progress_bus_merge_files_and_rate_limit():
+    bus = ProgressBus(max_rate=1.0)
+    emitted = []
+    bus.subscribe(emitted.append)
+    bus.publish('j', {'status': 'finished', 'filename': 'v.mp4', 'total_bytes': 300})
+    bus.publish('j', {'status': 'downloading', 'filename': 'a.m4a', 'downloaded_bytes': 0,
+                      'total_bytes': 100})
+    bus.publish('j', {'status': 'downloading', 'filename': 'a.m4a', 'downloaded_bytes': 50,
+                      'total_bytes': 100})
+    assert len(emitted) == 1  # demais coalescidos pelo limite de taxa
+    assert bus.snapshot().jobs['j'].percent == 87.5
+    bus.finish('j', 'failed')
+    assert len(emitted) == 2  # fim sempre emite
+
+
+def test_progress_bus_emits_trailing_update():
+    bus = ProgressBus(max_rate=4.0)
+    emitted = []
+    bus.subscribe(emitted.append)
+    for n in range(1, 6):
+        bus.publish('j', {'status': 'downloading', 'filename': 'a', 'downloaded_bytes': n * 10,
+                          'total_bytes': 100})
+    assert [s.jobs['j'].downloaded_bytes for s in emitted] == [10]
+    deadline = time.monotonic() + 2.0
+    while emitted[-1].jobs['j'].downloaded_bytes != 50 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    # as publicações contidas pelo limite saem numa única emissão atrasada
+    assert [s.jobs['j'].downloaded_bytes for s in emitted] == [10, 50]
@@ -0,0 +1,167 @@
+import os
+import random
+import sys
+import threading
+from collections import Counter
+
+import pytest
+from conftest import QuietHandler
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.retry import (FailureReport, RetryPolicies, RetryPolicy, classify, FORBIDDEN,
+                           HTTP_5XX, NETWORK, NOT_FOUND, OTHER, TIMEOUT, UNAVAILABLE)
+
+
+class FakeHTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(f'HTTP Error {status}')
+        self.status = status
+
+
+class Wrapped(Exception):
+    """Como o DownloadError do yt-dlp: a causa fica em exc_info."""
+
+    def __init__(self, msg, cause):
+        super().__init__(msg)
+        self.exc_info = (type(cause), cause, None)
+
+
+def test_classify_unwraps_and_falls_back_to_message():
+    assert classify(Wrapped('x', FakeHTTPError(503))) == HTTP_5XX
+    assert classify(Wrapped('x', FakeHTTPError(403))) == FORBIDDEN
+    assert classify(TimeoutError()) == TIMEOUT
+    assert classify(ConnectionResetError()) == NETWORK
+    assert classify(None, 'ERROR: Unable to download webpage: HTTP Error 404: Not Found') == NOT_FOUND
+    expected = RuntimeError('Video unavailable')
+    assert classify(expected) == UNAVAILABLE
+    assert classify(ValueError('boom')) == OTHER
+
+
+def test_policy_backoff_with_jitter():
+    policy = RetryPolicy(retries=5, base=1.0, cap=8.0, jitter=0.5)
+    rng = random.Random(1)
+    for attempt, full in ((1, 1.0), (2, 2.0), (4, 8.0), (9, 8.0)):
+        assert full / 2 <= policy.delay(attempt, rng) <= full
+    assert RetryPolicies().with_retries(0).get(HTTP_5XX).retries == 0
+    assert RetryPolicies().get(NOT_FOUND).retries == 0
+
+
+# ---------------- Downloads com falhas simuladas -----------------
+@pytest.fixture
+def flaky_server(tmp_path, http_server, write_feed):
+    """Servidor local: status[path] = [códigos] devolvidos (em ordem) antes
+    de servir o arquivo; hits conta os pedidos por caminho."""
+    root = tmp_path / 'www'
+    root.mkdir()
+    for name in ('a.mp4', 'b.mp4'):
+        (root / name).write_bytes(os.urandom(20_000))
+    (root / 'lo').mkdir()
+    (root / 'hi').mkdir()
+    for variant in ('lo', 'hi'):
+        (root / variant / 'seg0.ts').write_bytes(b'\x47' + os.urandom(9_999))
+        (root / variant / 'index.m3u8').write_text(
+            '#EXTM3U\n#EXT-X-TARGETDURATION:2\n#EXTINF:2.0,\nseg0.ts\n#EXT-X-ENDLIST\n')
+    (root / 'master.m3u8').write_text(
+        '#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=500000,RESOLUTION=640x360\nlo/index.m3u8\n'
+        '#EXT-X-STREAM-INF:BANDWIDTH=2000000,RESOLUTION=1280x720\nhi/index.m3u8\n')
+    status = {}
+    hits = Counter()
+    lock = threading.Lock()
+
+    class Handler(QuietHandler):
+        def _fail(self):
+            path = self.path.split('?')[0]
+            with lock:
+                hits[path] += 1
+                codes = status.get(path)
+                code = codes.pop(0) if codes else None
+            if code:
+                self.send_error(code)
+                return True
+            return False
+
+        def do_GET(self):
+            if not self._fail():
+                super().do_GET()
+
+        def do_HEAD(self):
+            if not self._fail():
+                super().do_HEAD()
+
+    base = http_server(root, Handler)
+    write_feed(root / 'feed.xml', base, ('a', 'missing', 'b'))
+    return base, status, hits
+
+
+def _fast_policies():
+    return RetryPolicies({k: RetryPolicy(p.retries, base=0.0, failover=p.failover)
+                          for k, p in RetryPolicies().policies.items()})
+
+
+def test_transient_5xx_is_retried(flaky_server, tmp_path):
+    pytest.importorskip('yt_dlp')
+    from videodl.downloader import VideoDownloader
+
+    base, status, hits = flaky_server
+    status['/a.mp4'] = [503, 503]
+    report = FailureReport()
+    VideoDownloader().download(f'{base}/a.mp4', str(tmp_path / 'out'), None, False,
+                               ensure_audio=False, retry_policies=_fast_policies(),
+                               failure_report=report)
+    assert os.path.getsize(tmp_path / 'out' / 'a.mp4') == 20_000
+    [failure] = report.failures()
+    assert failure.status == 'recovered' and failure.errors == [HTTP_5XX, HTTP_5XX]
+    assert report.retries == 2
+
+
+def test_missing_playlist_entry_is_skipped_and_reported(flaky_server, tmp_path):
+    pytest.importorskip('yt_dlp')
+    from videodl.downloader import VideoDownloader
+
+    base, status, hits = flaky_server
+    for workers in (1, 2):
+        out = tmp_path / f'out{workers}'
+        report = FailureReport()
+        VideoDownloader().download(f'{base}/feed.xml', str(out), None, False, ensure_audio=False,
+                                   playlist_mode=True, playlist_workers=workers,
+                                   retry_policies=_fast_policies(), failure_report=report)
+        assert len(os.listdir(out)) == 2
+        [failure] = report.skipped
+        assert failure.playlist_index == 2 and failure.error_class == NOT_FOUND
+        assert failure.to_dict()['url'] == f'{base}/missing.mp4' and failure.attempts == 1
+
+
+def test_single_video_failure_raises(flaky_server, tmp_path):
+    pytest.importorskip('yt_dlp')
+    from videodl.downloader import VideoDownloader
+
+    base, status, hits = flaky_server
+    status['/a.mp4'] = [503] * 10
+    report = FailureReport()
+    with pytest.raises(Exception):
+        VideoDownloader().download(f'{base}/a.mp4', str(tmp_path / 'out'), None, False,
+                                   ensure_audio=False,
+                                   retry_policies=_fast_policies().with_retries(2),
+                                   failure_report=report)
+    [failure] = report.failures()
+    assert failure.status == 'fatal' and failure.attempts == 3
+
+
+def test_forbidden_format_fails_over_to_next(flaky_server, tmp_path):
+    pytest.importorskip('yt_dlp')
+    from videodl.downloader import VideoDownloader
+
+    base, status, hits = flaky_server
+    status['/hi/index.m3u8'] = [403] * 10
+    report = FailureReport()
+    VideoDownloader().download(f'{base}/master.m3u8', str(tmp_path / 'out'), None, False,
+                               ensure_audio=False, retry_policies=_fast_policies(),
+                               failure_report=report)
+    [failure] = report.failures()
+    assert failure.status == 'recovered' and failure.error_class == FORBIDDEN
+    assert failure.excluded_formats and hits['/lo/seg0.ts'] == 1
+    assert os.listdir(tmp_path / 'out')
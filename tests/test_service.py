@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.downloader import DownloadCancelled
+from videodl.journal import JobJournal
+from videodl.service import ApiServer
+
+
+class BlockingDownloader:
+    """Publica progresso e bloqueia até release (ou cancelamento)."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def download(self, url, output_dir, format_id, only_audio, progress_cb=None,
+                 cancel_event=None, **kwargs):
+        self.calls.append((url, output_dir, kwargs))
+        progress_cb({'status': 'downloading', 'filename': 'f', 'downloaded_bytes': 5,
+                     'total_bytes': 10})
+        while not self.release.wait(0.01):
+            if cancel_event.is_set():
+                raise DownloadCancelled("cancelado")
+        progress_cb({'status': 'finished', 'filename': 'f', 'total_bytes': 10})
+
+
+class Client:
+    """Cliente HTTP/1.1 mínimo sobre uma única conexão keep-alive."""
+
+    def __init__(self, port, token=None):
+        self.port = port
+        self.token = token
+
+    async def __aenter__(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.writer.close()
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        auth = f'Authorization: Bearer {self.token}\r\n' if self.token else ''
+        self.writer.write(f'{method} {path} HTTP/1.1\r\nHost: x\r\n{auth}'
+                          f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode()
+        status = int(head.split()[1])
+        headers = dict(line.split(': ', 1) for line in head.strip().split('\r\n')[1:])
+        data = await self.reader.readexactly(int(headers['Content-Length']))
+        return status, json.loads(data)
+
+
+def test_submit_status_cancel_over_one_connection(tmp_path):
+    fake = BlockingDownloader()
+
+    async def main():
+        server = await ApiServer(str(tmp_path), concurrency=1, downloader=fake, port=0).start()
+        try:
+            async with Client(server.port) as c:
+                status, job = await c.request('POST', '/jobs', {'url': 'http://a', 'output_dir': 'sub',
+                                                                'connections': 2})
+                assert status == 201 and job['id'] == 1
+                status, jobs = await c.request('POST', '/jobs', [{'url': 'http://b'}])
+                assert status == 201 and jobs[0]['state'] == 'pending'
+                assert (await c.request('POST', '/jobs', {'url': 'x', 'bogus': 1}))[0] == 400
+                assert (await c.request('POST', '/jobs', {'url': 'x', 'output_dir': '../up'}))[0] == 400
+                assert (await c.request('GET', '/jobs/99'))[0] == 404
+                assert (await c.request('PUT', '/jobs'))[0] == 405
+
+                status, job = await c.request('DELETE', '/jobs/2')
+                assert status == 202 and job['state'] == 'cancelled'
+                assert (await c.request('DELETE', '/jobs/2'))[0] == 409
+                while (await c.request('GET', '/jobs/1'))[1].get('progress') is None:
+                    await asyncio.sleep(0.02)
+                status, job = await c.request('GET', '/jobs/1')
+                assert job['state'] == 'running' and job['progress']['percent'] == 50.0
+                fake.release.set()
+                while (await c.request('GET', '/jobs/1'))[1]['state'] != 'done':
+                    await asyncio.sleep(0.02)
+                status, jobs = await c.request('GET', '/jobs?state=done')
+                assert [j['id'] for j in jobs] == [1]
+        finally:
+            await server.close()
+        [(url, output_dir, kwargs)] = fake.calls
+        assert (url, output_dir, kwargs['connections']) == ('http://a', str(tmp_path / 'sub'), 2)
+
+    asyncio.run(main())
+
+
+def test_token_and_job_event_stream(tmp_path):
+    fake = BlockingDownloader()
+
+    async def main():
+        server = await ApiServer(str(tmp_path), downloader=fake, port=0, token='t').start()
+        try:
+            async with Client(server.port) as c:
+                assert (await c.request('GET', '/jobs'))[0] == 401
+            async with Client(server.port, token='t') as c:
+                assert (await c.request('GET', '/health'))[0] == 200
+                _, job = await c.request('POST', '/jobs', {'url': 'http://a'})
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            writer.write(f'GET /jobs/{job["id"]}/events HTTP/1.1\r\n'
+                         'Authorization: Bearer t\r\n\r\n'.encode())
+            head = await reader.readuntil(b'\r\n\r\n')
+            assert b'text/event-stream' in head
+            await asyncio.sleep(0.1)
+            fake.release.set()
+            # o stream de um job termina depois do estado final
+            events = [json.loads(line[6:]) for line in
+                      (await asyncio.wait_for(reader.read(), 5)).decode().splitlines()
+                      if line.startswith('data: ')]
+            writer.close()
+            assert events[-1]['state'] == 'done'
+            assert events[-1]['progress']['percent'] == 100.0
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+
+
+class JournalingDownloader(BlockingDownloader):
+    """Registra o job no journal como VideoDownloader.download."""
+
+    def __init__(self, journal):
+        super().__init__()
+        self.journal = journal
+        self.started = threading.Event()
+
+    def download(self, url, output_dir, format_id, only_audio, progress_cb=None,
+                 cancel_event=None, **kwargs):
+        key = self.journal.start_job(url, output_dir, {'format_id': format_id})
+        self.started.set()
+        try:
+            super().download(url, output_dir, format_id, only_audio, progress_cb, cancel_event,
+                             **kwargs)
+        except DownloadCancelled:
+            self.journal.finish_job(key, 'cancelled')
+            raise
+        self.journal.finish_job(key, 'done')
+
+
+def test_shutdown_keeps_running_jobs_resumable(tmp_path):
+    journal = JobJournal(str(tmp_path / 'journal.jsonl'))
+    fake = JournalingDownloader(journal)
+
+    async def main():
+        server = await ApiServer(str(tmp_path), concurrency=1, downloader=fake, port=0).start()
+        server.submit({'url': 'http://a'})
+        await asyncio.get_running_loop().run_in_executor(None, fake.started.wait, 5)
+        # encerramento gracioso (SIGTERM) com o download em andamento
+        await server.close()
+
+    asyncio.run(main())
+    assert [j.url for j in JobJournal(str(tmp_path / 'journal.jsonl')).pending()] == ['http://a']
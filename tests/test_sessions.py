@@ -0,0 +1,107 @@
+import os
+import sys
+
+import pytest
+from conftest import QuietHandler
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.sessions import SessionPool, options_key
+
+
+class FakeYDL:
+    def __init__(self, params):
+        self.params = params
+        self._pps = {'post_process': ['base'], 'after_move': []}
+        self._progress_hooks = list(params.get('progress_hooks') or [])
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_pool_reuses_by_options_and_swaps_per_job_state():
+    clock = Clock()
+    pool = SessionPool(max_idle=3, max_idle_per_key=1, idle_timeout=60, max_uses=3, clock=clock)
+    report = object()
+    with pool.lease(FakeYDL, {'outtmpl': 'a', 'failure_report': report,
+                              'progress_hooks': [print]}) as first:
+        assert first.params['failure_report'] is report and first._progress_hooks == [print]
+        first._pps['after_move'].append('archive')
+    # estado do job descartado na devolução
+    assert 'failure_report' not in first.params and first._pps['after_move'] == []
+    with pool.lease(FakeYDL, {'outtmpl': 'a'}) as again:
+        assert again is first and again._progress_hooks == []
+        with pool.lease(FakeYDL, {'outtmpl': 'a'}) as busy:
+            assert busy is not first  # emprestada: nunca compartilhada
+    assert pool.stats() == {'idle': 1, 'leased': 0, 'created': 2, 'reused': 1, 'closed': 1}
+    assert busy.closed and not first.closed  # limite por chave
+
+    with pool.lease(FakeYDL, {'outtmpl': 'b'}) as other:
+        assert other is not first
+    with pytest.raises(RuntimeError):
+        with pool.lease(FakeYDL, {'outtmpl': 'a'}) as failed:
+            raise RuntimeError('x')
+    assert failed is first and first.closed  # exceção: fechada, não devolvida
+
+    clock.now += 61
+    assert pool.evict_idle() == 1 and other.closed
+    with pool.lease(FakeYDL, {'outtmpl': 'c'}) as s:
+        pass
+    for _ in range(2):
+        with pool.lease(FakeYDL, {'outtmpl': 'c'}) as reused:
+            assert reused is s
+    assert s.closed and pool.stats()['idle'] == 0  # max_uses
+    assert options_key({'a': [1, {'b': 2}], 'job_metrics': object()}) == options_key({'a': [1, {'b': 2}]})
+
+
+@pytest.fixture
+def keepalive_server(tmp_path, http_server):
+    root = tmp_path / 'srv'
+    root.mkdir()
+    for n in range(3):
+        (root / f'{n}.mp4').write_bytes(os.urandom(20_000))
+    peers = set()
+
+    class Handler(QuietHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def handle(self):
+            peers.add(self.client_address)
+            super().handle()
+
+    return http_server(root, Handler), peers
+
+
+def test_downloads_reuse_connections_across_jobs(keepalive_server, tmp_path):
+    pytest.importorskip('yt_dlp')
+    from videodl.downloader import VideoDownloader
+
+    base, peers = keepalive_server
+    connections = {}
+    pool = SessionPool()
+    for name, sessions in (('new', None), ('pooled', pool)):
+        peers.clear()
+        downloader = VideoDownloader(sessions=sessions)
+        for n in range(3):
+            downloader.download(f'{base}/{n}.mp4', str(tmp_path / name), 'mp4', False,
+                                ensure_audio=False)
+        assert sorted(os.listdir(tmp_path / name)) == ['0.mp4', '1.mp4', '2.mp4']
+        connections[name] = len(peers)
+    stats = pool.stats()
+    assert stats['created'] == 1 and stats['reused'] == 2 and stats['leased'] == 0
+    # a conexão keep-alive do download serve à extração do job seguinte
+    assert connections['pooled'] <= connections['new'] - 2
+    pool.close()
+    assert pool.stats()['idle'] == 0
@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.downloader import DownloadCancelled
+from videodl.storage import InsufficientSpace, StorageManager, item_bytes
+
+
+class FakeDisk:
+    def __init__(self, free):
+        self.free = free
+
+    def __call__(self, path):
+        return self.free
+
+
+def test_reserve_waits_for_other_jobs_and_rejects_what_never_fits(tmp_path):
+    disk = FakeDisk(1000)
+    storage = StorageManager(min_free=100, poll=0.05, disk_free=disk)
+    first = storage.reserve(str(tmp_path), 600)
+    assert storage.headroom(str(tmp_path)) == 300
+    # não cabe nem sem as outras reservas: rejeitado na hora
+    with pytest.raises(InsufficientSpace) as exc:
+        storage.reserve(str(tmp_path), 1000)
+    assert exc.value.errno == 28 and exc.value.needed == 1000
+
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(storage.reserve(str(tmp_path), 500)))
+    waiter.start()
+    time.sleep(0.2)
+    assert not got  # adiado enquanto a primeira reserva existe
+    first.release()
+    waiter.join(2)
+    assert got and got[0].nbytes == 500
+    # o próprio job não conta contra si na verificação por item
+    got[0].check_item(800)
+    with pytest.raises(InsufficientSpace):
+        got[0].check_item(901)
+
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    with pytest.raises(DownloadCancelled):
+        storage.reserve(str(tmp_path), 500, cancel_event=cancel)
+    report = storage.report()
+    assert report[0]['reserved'] == 500 and report[0]['headroom'] == 400
+
+
+def test_merge_needs_twice_and_scratch_subdir(tmp_path):
+    storage = StorageManager(scratch_dir=str(tmp_path / 'scratch'), disk_free=FakeDisk(10 ** 9))
+    out = str(tmp_path / 'out')
+    temp = storage.temp_dir(out)
+    assert temp.startswith(str(tmp_path / 'scratch')) and temp == storage.temp_dir(out)
+    # mesmo sistema de arquivos: só o temporário conta (o final é um rename)
+    assert [n for _, n in storage.needs(out, 100, merge=True).values()] == [200]
+    assert item_bytes({'requested_formats': [{'filesize': 10}, {'filesize_approx': 5}]}) == (15, True)
+    assert item_bytes({'tbr': 8, 'duration': 10}) == (10_000, False)
+    assert item_bytes({'filesize': None}) == (None, False)
+
+
+@pytest.fixture
+def media_server(tmp_path, http_server):
+    root = tmp_path / 'srv'
+    root.mkdir()
+    (root / 'clip.mp4').write_bytes(os.urandom(60_000))
+    return f'{http_server(root)}/clip.mp4'
+
+
+def test_scratch_dir_holds_temp_files_and_final_file_moves(media_server, tmp_path):
+    pytest.importorskip('yt_dlp')
+    from videodl.downloader import VideoDownloader
+
+    storage = StorageManager(scratch_dir=str(tmp_path / 'scratch'))
+    downloader = VideoDownloader(storage=storage)
+    seen = []
+    out = tmp_path / 'out'
+    downloader.download(media_server, str(out), 'mp4', False, ensure_audio=False,
+                        progress_cb=lambda d: seen.append(d.get('tmpfilename') or d.get('filename')))
+    assert [p.name for p in out.iterdir()] == ['clip.mp4']
+    assert (out / 'clip.mp4').stat().st_size == 60_000
+    assert any(name and name.startswith(storage.temp_dir(str(out))) for name in seen)
+    assert not os.listdir(storage.temp_dir(str(out)))
+    assert storage.report([str(out)])[0]['reserved'] == 0
+
+
+def test_queue_fails_job_that_does_not_fit(media_server, tmp_path, monkeypatch):
+    pytest.importorskip('yt_dlp')
+    from videodl.downloader import VideoDownloader
+    from videodl.jobs import DownloadQueue, JobState
+
+    downloader = VideoDownloader(storage=StorageManager(min_free=0, disk_free=FakeDisk(10_000)))
+    monkeypatch.setattr(downloader, 'estimate_bytes', lambda *a, **k: (60_000, False))
+    queue = DownloadQueue(concurrency=1, downloader=downloader)
+    job = queue.submit(media_server, str(tmp_path / 'out'), format_id='mp4', ensure_audio=False)
+    assert queue.join(10)
+    queue.shutdown()
+    assert job.state == JobState.FAILED and 'Espaço insuficiente' in job.error
+    assert job.started_at is None
+    assert not (tmp_path / 'out').exists() or not os.listdir(tmp_path / 'out')
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+SRC_DIR = os.path.join(BASE_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from videodl.sync import NEWEST_FIRST, OLDEST_FIRST, SyncStore
+
+
+class CountingEntries:
+    """Entradas preguiçosas (como o generator do yt-dlp) contando o consumo."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.consumed = 0
+
+    def __iter__(self):
+        for entry in self.entries:
+            self.consumed += 1
+            yield entry
+
+
+def _channel(ids, start_date=20260101):
+    # newest-first: a data cai com a posição
+    return [{'id': i, 'url': f'https://x/{i}', 'upload_date': str(start_date + len(ids) - n)}
+            for n, i in enumerate(ids)]
+
+
+def test_newest_first_walk_stops_after_known_run(tmp_path):
+    store = SyncStore(str(tmp_path), stop_after=3)
+    url = 'https://x/channel'
+    first = store.plan(url, {'_type': 'playlist', 'entries': _channel([f'v{n}' for n in range(20)])},
+                       None)
+    assert first.full and len(first.new) == 20 and first.removed == []
+    snapshot = store.commit(url, None, first, failed={'v5'})
+    assert snapshot.order == NEWEST_FIRST and 'v5' not in snapshot.entries
+
+    entries = CountingEntries(_channel(['n1', 'n2'] + [f'v{n}' for n in range(20)], 20260110))
+    plan = store.plan(url, {'_type': 'playlist', 'entries': entries}, store.load(url))
+    # a falha anterior volta mesmo fora do trecho percorrido
+    assert [e['id'] for e in plan.new] == ['n1', 'n2', 'v5'] and not plan.full
+    assert plan.removed is None and entries.consumed == 5
+    assert plan.new[0]['playlist_index'] == 1 and plan.new[2]['playlist_index'] == 6
+
+    # percurso completo: acha os removidos
+    snapshot = store.commit(url, store.load(url), plan, failed=set())
+    assert 'v5' in snapshot.entries and not snapshot.failed
+    ids = ['n1', 'n2'] + [f'v{n}' for n in range(20) if n != 7]
+    full = store.plan(url, {'_type': 'playlist', 'entries': _channel(ids, 20260110)}, snapshot,
+                      full=True)
+    assert full.new == [] and full.removed == ['v7']
+    snapshot = store.commit(url, snapshot, full, failed=set())
+    assert 'v7' not in snapshot.entries and snapshot.last_sync['removed'] == 1
+    assert [s.url for s in store.sources()] == [url]
+
+
+def test_oldest_first_walks_only_the_tail(tmp_path):
+    store = SyncStore(str(tmp_path), stop_after=2)
+    url = 'https://x/playlist'
+    ids = [f'v{n}' for n in range(10)]
+    # sem datas: a ordem vem de onde os novos aparecem
+    snapshot = store.commit(url, None, store.plan(url, {'entries': [{'id': i} for i in ids]}, None),
+                            failed=set())
+    assert snapshot.order is None
+    plan = store.plan(url, {'entries': [{'id': i} for i in ids + ['v10']]}, snapshot)
+    assert plan.full and [e['id'] for e in plan.new] == ['v10']
+    snapshot = store.commit(url, snapshot, plan, failed=set())
+    assert snapshot.order == OLDEST_FIRST
+
+    plan = store.plan(url, {'entries': [{'id': i} for i in ids + ['v10', 'v11']]}, snapshot)
+    assert not plan.full and plan.walked == 3
+    assert [(e['id'], e['playlist_index']) for e in plan.new] == [('v11', 12)]
+    # item removido antes do trecho: o fim não bate, percurso completo
+    plan = store.plan(url, {'entries': [{'id': i} for i in ids[1:] + ['v10', 'v11']]}, snapshot)
+    assert plan.full and plan.removed == ['v0']
+
+
+@pytest.fixture
+def feed_server(tmp_path, http_server, write_feed):
+    root = tmp_path / 'srv'
+    root.mkdir()
+    for name in 'abc':
+        (root / f'{name}.mp4').write_bytes(os.urandom(10_000))
+    base = http_server(root)
+
+    def publish(*names):
+        # o mais novo primeiro, como num canal
+        write_feed(root / 'feed.xml', base, names, {
+            n: time.strftime('%a, %d %b %Y %H:%M:%S +0000', time.gmtime(ord(n) * 86400))
+            for n in names})
+
+    return f'{base}/feed.xml', publish
+
+
+def test_sync_downloads_only_new_feed_items(feed_server, tmp_path):
+    pytest.importorskip('yt_dlp')
+    from videodl.downloader import VideoDownloader
+    from videodl.jobs import DownloadQueue, JobState
+
+    url, publish = feed_server
+    out = tmp_path / 'out'
+    downloader = VideoDownloader(sync_store=SyncStore(str(tmp_path / 'sync')))
+    publish('b', 'a')
+    first = downloader.download(url, str(out), 'mp4', False, ensure_audio=False, sync=True,
+                                playlist_workers=2)
+    assert len(os.listdir(out)) == 2 and first.last_sync['new'] == 2
+
+    publish('c', 'b', 'a')
+    seen = []
+    second = downloader.download(url, str(out), 'mp4', False, ensure_audio=False, sync=True,
+                                 progress_cb=seen.append)
+    assert second.last_sync['new'] == 1 and second.order == NEWEST_FIRST
+    assert {d['playlist_index'] for d in seen} == {1} and seen[-1]['playlist_count'] == 3
+    assert len(os.listdir(out)) == 3
+
+    publish('c', 'a')
+    queue = DownloadQueue(concurrency=1, downloader=downloader)
+    job = queue.submit(url, str(out), format_id='mp4', ensure_audio=False, sync=True,
+                       sync_full=True)
+    assert queue.join(10)
+    queue.shutdown()
+    assert job.state == JobState.DONE
+    assert job.sync['new'] == 0 and job.sync['removed'] == 1 and job.sync['full']
+    assert job.to_dict()['sync'] == job.sync
+
+    with pytest.raises(ValueError):
+        VideoDownloader().download(url, str(out), 'mp4', False, sync=True)